@@ -0,0 +1,231 @@
+"""
+Сравнение загрузчиков таблиц script.py с прежней построчной версией (iterrows)
+
+Запуск:
+  python bench_loaders.py [строк]   - синтетические таблицы (по умолчанию 200000 строк)
+  python bench_loaders.py real      - последние файлы из папок проекта
+
+Проверяет, что таблицы (в виде словарей) совпадают, и выводит время обеих версий.
+"""
+import sys
+import math
+import time
+import random
+
+import numpy as np
+import pandas as pd
+
+import script
+
+
+# ===== Прежние построчные загрузчики (эталон) =====
+
+def legacy_mark(df_mark):
+    mark_data = {}
+    for idx, row in df_mark.iterrows():
+        if idx >= 9:
+            sku = row[3] if len(row) > 3 else None
+            if pd.notna(sku):
+                sku = str(sku).strip()
+                col_a_value = row[0] if 0 in row else None
+                cost_value = row[15] if len(row) > 15 else None
+                mark_data[sku] = {'col_a': col_a_value, 'col_p': cost_value}
+    return mark_data
+
+
+def legacy_analytics(frames):
+    all_analytics_data = {}
+    for df_analytics in frames:
+        for idx, row in df_analytics.iterrows():
+            if idx >= 13:
+                sku = row[7] if len(row) > 7 else None
+                if pd.isna(sku):
+                    continue
+                sku = str(sku).strip()
+                avg_price = row[63] if len(row) > 63 else None
+                total_ddr = row[69] if len(row) > 69 else None
+                if sku not in all_analytics_data:
+                    all_analytics_data[sku] = {'bl': avg_price, 'br': total_ddr}
+                else:
+                    if avg_price is not None:
+                        all_analytics_data[sku]['bl'] = avg_price
+                    if total_ddr is not None:
+                        all_analytics_data[sku]['br'] = total_ddr
+    return all_analytics_data
+
+
+def legacy_dimensions(df_dimensions):
+    dimensions_data = {}
+    for idx, row in df_dimensions.iterrows():
+        if idx >= 1:
+            sku = row[0] if 0 in row else None
+            if pd.notna(sku):
+                sku = str(sku).strip()
+                dimensions_data[sku] = {
+                    'length': row[5] if len(row) > 5 else None,
+                    'width': row[3] if len(row) > 3 else None,
+                    'height': row[4] if len(row) > 4 else None,
+                    'col_g': script.divide_by_100(row[6] if len(row) > 6 else None),
+                    'col_h': script.divide_by_100(row[7] if len(row) > 7 else None),
+                }
+    return dimensions_data
+
+
+def legacy_prices(df_prices):
+    prices_data = {}
+    for idx, row in df_prices.iterrows():
+        if idx >= 1:
+            sku = row[0] if 0 in row else None
+            if pd.notna(sku):
+                sku = str(sku).strip()
+                prices_data[sku] = row[2] if len(row) > 2 else None
+    return prices_data
+
+
+# ===== Таблицы script.py в виде прежних словарей =====
+
+def table_mark(df_mark):
+    return script.load_source_table(df_mark, 'mark').to_dict('index')
+
+
+def table_analytics(frames):
+    """process_analytics_files без чтения файлов"""
+    tables = [script.load_source_table(df_analytics, 'analytics') for df_analytics in frames]
+    return script.merge_source_tables(tables, 'analytics').to_dict('index')
+
+
+def table_dimensions(df_dimensions):
+    return script.load_source_table(df_dimensions, 'dimensions').to_dict('index')
+
+
+def table_prices(df_prices):
+    return script.load_source_table(df_prices, 'prices')['price'].to_dict()
+
+
+# ===== Данные =====
+
+def _header(rows, width):
+    return [[f"Заголовок {r}.{c}" if c % 5 == 0 else np.nan for c in range(width)] for r in range(rows)]
+
+
+def _skus(count, unique):
+    """SKU вперемешку: числа, числа с плавающей точкой, строки с пробелами, пропуски"""
+    values = []
+    for _ in range(count):
+        sku = random.randint(100000000, 100000000 + unique)
+        kind = random.random()
+        if kind < 0.6:
+            values.append(sku)
+        elif kind < 0.8:
+            values.append(f" {sku} ")
+        elif kind < 0.95:
+            values.append(float(sku))
+        else:
+            values.append(np.nan)
+    return values
+
+
+def _numbers(count, empty_share=0.1):
+    return [np.nan if random.random() < empty_share else round(random.uniform(1, 50000), 2) for _ in range(count)]
+
+
+def synthetic_tables(rows):
+    """Таблицы в том виде, в каком их возвращает read_excel(header=None): пустые ячейки - NaN"""
+    random.seed(1)
+    unique = rows // 2
+
+    mark = _header(9, 16)
+    for sku, a, p in zip(_skus(rows // 10, unique), _numbers(rows // 10), _numbers(rows // 10)):
+        row = [np.nan] * 16
+        row[0], row[3], row[15] = f"Товар {a}", sku, p
+        mark.append(row)
+
+    analytics = []
+    for _ in range(2):
+        table = _header(13, 70)
+        for sku, bl, br in zip(_skus(rows, unique), _numbers(rows), _numbers(rows)):
+            row = [np.nan] * 70
+            row[7], row[63], row[69] = sku, bl, br
+            table.append(row)
+        analytics.append(pd.DataFrame(table))
+
+    dimensions = _header(1, 8)
+    for sku in _skus(rows // 10, unique):
+        row = [sku] + [np.nan] * 7
+        row[3:8] = _numbers(5)
+        if random.random() < 0.01:
+            row[6] = 'н/д'
+        dimensions.append(row)
+
+    prices = [['SKU', 'Название', 'Цена с соинвестом', 'URL продавца', 'URL товара']]
+    for sku, price in zip(_skus(rows // 10, unique), _numbers(rows // 10)):
+        price = np.nan if math.isnan(price) else str(int(price))
+        prices.append([sku, 'Товар', price, 'https://www.ozon.ru/seller/x-1/', ''])
+
+    return pd.DataFrame(mark), analytics, pd.DataFrame(dimensions), pd.DataFrame(prices)
+
+
+def real_tables():
+    base_dir = script.BASE_DIR
+    read = script.read_excel_with_error_handling
+    mark = read(script.find_latest_files(base_dir / "MARK_ozon_report"))
+    analytics = [read(path) for path in script.find_latest_files(base_dir / "analytics_report", count=2)]
+    dimensions = read(script.find_latest_files(base_dir / "ozon_dimensions"))
+    prices = read(script.find_latest_files(base_dir / "prices_with_co-investment"))
+    return mark, analytics, dimensions, prices
+
+
+# ===== Сравнение =====
+
+def same_value(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_value(a[k], b[k]) for k in a)
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return len(a) == len(b) and all(same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, (np.generic, float, int)) and isinstance(b, (np.generic, float, int)):
+        return a == b
+    return type(a) == type(b) and a == b
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'real':
+        tables = real_tables()
+    else:
+        rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+        print(f"Синтетические таблицы: {rows} строк analytics x 2 файла")
+        tables = synthetic_tables(rows)
+    mark, analytics, dimensions, prices = tables
+
+    cases = [
+        ('MARK', legacy_mark, table_mark, mark),
+        ('analytics', legacy_analytics, table_analytics, analytics),
+        ('dimensions', legacy_dimensions, table_dimensions, dimensions),
+        ('prices', legacy_prices, table_prices, prices),
+    ]
+
+    print(f"\n{'Таблица':<12}{'SKU':>9}{'iterrows, с':>14}{'новая, с':>12}{'ускорение':>12}  совпадение")
+    all_same = True
+    for name, legacy, vectorized, table in cases:
+        expected, legacy_time = timed(legacy, table)
+        result, new_time = timed(vectorized, table)
+        same = list(expected) == list(result) and same_value(expected, result)
+        all_same = all_same and same
+        print(f"{name:<12}{len(result):>9}{legacy_time:>14.2f}{new_time:>12.3f}"
+              f"{legacy_time / max(new_time, 1e-9):>11.0f}x  {'✓' if same else '✗'}")
+
+    if not all_same:
+        print("\n✗ Результаты отличаются от построчной версии")
+        sys.exit(1)
+    print("\n✓ Результаты совпадают")
+
+
+if __name__ == "__main__":
+    main()
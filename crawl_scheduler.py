@@ -0,0 +1,358 @@
+"""
+Асинхронный планировщик обхода Ozon с постоянной очередью URL
+
+Очередь (frontier) хранится в SQLite в папке результатов, поэтому прерванный
+обход продолжается с того же места. Задачи двух видов - страница продавца
+и карточка товара - выдаются свободным браузерным воркерам по приоритету.
+Страница продавца листается бесконечной прокруткой, поэтому все ссылки на
+товары собираются с неё за одну задачу. Между запросами к одному хосту соблюдается пауза,
+которая ожидается асинхронно, а не блокирует весь обход, поэтому сбор
+ссылок следующего продавца идёт параллельно с парсингом товаров текущего.
+"""
+import os
+import time
+import random
+import asyncio
+import sqlite3
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from parser import OzonSellerParser, product_key
+
+FRONTIER_FILE = 'frontier.sqlite'
+
+# Меньшее значение - раньше в очереди
+PRIORITIES = {
+    'seller': 0,
+    'product': 1,
+}
+
+RETRY_BASE_DELAY = 60
+
+
+class UrlFrontier:
+    """Постоянная очередь URL на SQLite"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                host TEXT NOT NULL,
+                seller_url TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                added REAL NOT NULL,
+                error TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                seller_url TEXT,
+                sku TEXT,
+                name TEXT,
+                price TEXT
+            )
+        """)
+        # Все продавцы, у которых встретился товар
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS product_sellers (
+                key TEXT NOT NULL,
+                seller_url TEXT NOT NULL,
+                PRIMARY KEY (key, seller_url)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (status, priority, not_before)")
+        # Задачи, прерванные при прошлом запуске, возвращаются в очередь
+        self.conn.execute("UPDATE tasks SET status = 'pending' WHERE status = 'in_progress'")
+        self.conn.commit()
+
+    def add(self, url, kind, seller_url=None, priority=None):
+        """
+        Добавление URL, уже известные URL не дублируются
+
+        Товары ключуются по id товара, поэтому разные slug одного товара и
+        один товар у нескольких продавцов дают одну задачу
+        """
+        if priority is None:
+            priority = PRIORITIES[kind]
+        key = product_key(url) if kind == 'product' else url
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO tasks (key, url, kind, priority, host, seller_url, added) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, url, kind, priority, urlsplit(url).netloc, seller_url, time.time())
+        )
+        if kind == 'product' and seller_url:
+            self.conn.execute("INSERT OR IGNORE INTO product_sellers (key, seller_url) VALUES (?, ?)", (key, seller_url))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def claim(self):
+        """Выдача следующей готовой задачи или None"""
+        row = self.conn.execute(
+            "SELECT key, url, kind, host, seller_url, attempts FROM tasks "
+            "WHERE status = 'pending' AND not_before <= ? "
+            "ORDER BY priority, added LIMIT 1",
+            (time.time(),)
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("UPDATE tasks SET status = 'in_progress' WHERE key = ?", (row[0],))
+        self.conn.commit()
+        return {'key': row[0], 'url': row[1], 'kind': row[2], 'host': row[3], 'seller_url': row[4], 'attempts': row[5]}
+
+    def complete(self, key):
+        self.conn.execute("UPDATE tasks SET status = 'done', error = NULL WHERE key = ?", (key,))
+        self.conn.commit()
+
+    def release(self, key):
+        """Возврат задачи в очередь без учёта попытки (страница не загружалась из-за капчи)"""
+        self.conn.execute("UPDATE tasks SET status = 'pending' WHERE key = ? AND status = 'in_progress'", (key,))
+        self.conn.commit()
+
+    def retry(self, key, error, max_attempts):
+        """Возврат задачи в очередь с нарастающей задержкой"""
+        attempts = self.conn.execute("SELECT attempts FROM tasks WHERE key = ?", (key,)).fetchone()[0] + 1
+        if attempts >= max_attempts:
+            self.conn.execute(
+                "UPDATE tasks SET status = 'failed', attempts = ?, error = ? WHERE key = ?",
+                (attempts, error, key)
+            )
+        else:
+            delay = RETRY_BASE_DELAY * 2 ** (attempts - 1)
+            self.conn.execute(
+                "UPDATE tasks SET status = 'pending', attempts = ?, error = ?, not_before = ? WHERE key = ?",
+                (attempts, error, time.time() + delay, key)
+            )
+        self.conn.commit()
+
+    def save_result(self, key, url, seller_url, product_data):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (key, url, seller_url, sku, name, price) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, url, seller_url, product_data.get('sku', ''), product_data.get('name', ''), product_data.get('price', ''))
+        )
+        self.conn.commit()
+
+    def results(self):
+        """Результаты в формате products_data; у товара перечислены все его продавцы"""
+        rows = self.conn.execute("""
+            SELECT r.sku, r.name, r.price, COALESCE(GROUP_CONCAT(ps.seller_url, '; '), r.seller_url), r.url
+            FROM results r LEFT JOIN product_sellers ps ON ps.key = r.key
+            GROUP BY r.key ORDER BY r.rowid
+        """).fetchall()
+        return [{'sku': r[0], 'name': r[1], 'price': r[2], 'seller_url': r[3], 'product_url': r[4]} for r in rows]
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def next_ready_time(self):
+        """Время, когда станет готова ближайшая отложенная задача"""
+        row = self.conn.execute("SELECT MIN(not_before) FROM tasks WHERE status = 'pending'").fetchone()
+        return row[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class BrowserWorker:
+    """Воркер с собственным браузером; блокирующие вызовы Selenium идут в потоке"""
+
+    def __init__(self, worker_id, output_folder, settings=None):
+        self.worker_id = worker_id
+        # У каждого воркера свой браузер, поэтому подключение к общему прогретому Chrome отключено.
+        # Список продавцов воркеру не нужен - задачи приходят из очереди
+        settings = dict(settings or {}, warm_browser=False)
+        if settings.get('browser_workers', 1) > 1 and settings.get('captcha_mode') != 'defer':
+            # Несколько браузеров не могут по очереди ждать Enter в одной консоли
+            if worker_id == 1:
+                print("⚠ Несколько браузеров: капча обрабатывается в режиме captcha_mode = defer")
+            settings['captcha_mode'] = 'defer'
+        self.parser = OzonSellerParser(None, output_folder=output_folder, trace=False, settings=settings)
+
+    async def start(self):
+        await asyncio.to_thread(self.parser.setup_driver)
+
+    async def enumerate_seller(self, seller_url):
+        def work():
+            self.parser.current_seller_url = seller_url
+            if not self.parser.safe_get(seller_url):
+                return None
+            seller_name = seller_url.rstrip('/').split('/')[-1]
+            return self.parser.load_all_products_humanlike(seller_name)
+        return await asyncio.to_thread(work)
+
+    async def parse_product(self, product_url, seller_url):
+        def work():
+            self.parser.current_seller_url = seller_url
+            return self.parser.parse_product_page(product_url)
+        return await asyncio.to_thread(work)
+
+    @property
+    def captcha_pending(self):
+        return self.parser.captcha_pending
+
+    async def wait_for_captcha(self):
+        """
+        Ожидание решения капчи в браузере воркера, задачи в это время не берутся.
+        False - капча не снята за captcha_max_wait секунд
+        """
+        settings = self.parser.settings
+        print(f"\n⏸ [воркер {self.worker_id}] Капча: задачи не берутся, пока она не решена в браузере")
+        # Отложенные парсером URL уже возвращены в очередь
+        self.parser.deferred_urls.clear()
+        self.parser.deferred_sellers.clear()
+        deadline = time.time() + settings['captcha_max_wait']
+        while not await asyncio.to_thread(self.parser._captcha_cleared):
+            if time.time() >= deadline:
+                print(f"⚠ [воркер {self.worker_id}] Капча не снята за {settings['captcha_max_wait']} с, воркер остановлен")
+                return False
+            await asyncio.sleep(settings['captcha_retry_interval'])
+        return True
+
+    async def stop(self):
+        if self.parser.driver:
+            await asyncio.to_thread(self.parser.driver.quit)
+
+
+class CrawlScheduler:
+    """Раздача задач из очереди свободным воркерам с паузами по хостам"""
+
+    def __init__(self, frontier, workers, politeness_delay=3.0, max_attempts=3):
+        self.frontier = frontier
+        self.workers = workers
+        self.politeness_delay = politeness_delay
+        self.max_attempts = max_attempts
+        self._host_next_time = {}
+        self._busy = 0
+        self._lock = asyncio.Lock()
+        self.processed = 0
+        self.started = time.time()
+
+    async def _wait_for_host(self, host):
+        """Асинхронное ожидание паузы вежливости для хоста"""
+        async with self._lock:
+            now = time.time()
+            start_at = max(now, self._host_next_time.get(host, 0))
+            delay = self.politeness_delay * random.uniform(0.8, 1.2)
+            self._host_next_time[host] = start_at + delay
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    async def _next_task(self):
+        """Следующая задача; None - очередь исчерпана и все воркеры свободны"""
+        while True:
+            task = self.frontier.claim()
+            if task is not None:
+                return task
+            if self._busy == 0:
+                next_ready = self.frontier.next_ready_time()
+                if next_ready is None:
+                    return None
+                await asyncio.sleep(max(0.5, min(next_ready - time.time(), 30)))
+            else:
+                await asyncio.sleep(0.5)
+
+    async def _handle(self, worker, task):
+        url, kind = task['url'], task['kind']
+
+        if kind == 'seller':
+            links = await worker.enumerate_seller(url)
+        else:
+            product_data = await worker.parse_product(url, task['seller_url'])
+            if product_data is None and worker.captcha_pending:
+                self.frontier.release(task['key'])
+                return
+            if product_data is None:
+                self.frontier.retry(task['key'], 'не удалось загрузить карточку', self.max_attempts)
+                return
+            self.frontier.save_result(task['key'], url, task['seller_url'], product_data)
+            self.frontier.complete(task['key'])
+            return
+
+        if not links and worker.captcha_pending:
+            self.frontier.release(task['key'])
+            return
+        if not links:
+            self.frontier.retry(task['key'], 'не найдено товаров', self.max_attempts)
+            return
+
+        added = sum(self.frontier.add(link, 'product', seller_url=task['seller_url'] or url) for link in links)
+        print(f"[очередь] {url[:60]}: найдено {len(links)}, новых {added}")
+        self.frontier.complete(task['key'])
+
+    async def _worker_loop(self, worker):
+        await worker.start()
+        try:
+            while True:
+                task = await self._next_task()
+                if task is None:
+                    break
+                self._busy += 1
+                try:
+                    await self._wait_for_host(task['host'])
+                    await self._handle(worker, task)
+                except Exception as e:
+                    print(f"[воркер {worker.worker_id}] Ошибка: {e}")
+                    self.frontier.retry(task['key'], str(e), self.max_attempts)
+                finally:
+                    self._busy -= 1
+
+                # Капча не решена: страницы не грузятся, задачи достанутся другим воркерам
+                if worker.captcha_pending and not await worker.wait_for_captcha():
+                    break
+
+                self.processed += 1
+                if self.processed % 10 == 0:
+                    elapsed = time.time() - self.started
+                    counts = self.frontier.counts()
+                    print(f"\n  [очередь] обработано {self.processed} задач за {elapsed/60:.1f} мин, "
+                          f"осталось {counts.get('pending', 0)}, ошибок {counts.get('failed', 0)}")
+        finally:
+            await worker.stop()
+
+    async def run(self):
+        await asyncio.gather(*(self._worker_loop(worker) for worker in self.workers))
+
+
+def run_scheduled(seller_urls, settings, output_folder='prices_with_co-investment'):
+    """Обход продавцов через очередь URL с несколькими браузерами"""
+    exporter = OzonSellerParser(seller_urls, output_folder=output_folder, trace=False)
+    exporter.create_output_folder()
+
+    print("=" * 70)
+    print("ПАРСЕР OZON - ПЛАНИРОВЩИК С ОЧЕРЕДЬЮ URL")
+    print("=" * 70)
+    print(f"Время начала: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Браузеров: {settings['browser_workers']}, пауза на хост: {settings['politeness_delay']} с")
+
+    frontier = UrlFrontier(os.path.join(output_folder, FRONTIER_FILE))
+    for seller_url in exporter.seller_urls:
+        frontier.add(seller_url, 'seller', seller_url=seller_url)
+    print(f"Очередь: {frontier.counts()}")
+
+    # В режиме captcha_mode = defer карточка с капчей уходит в очередь повторов, а не ждёт Enter
+    workers = [BrowserWorker(i + 1, output_folder, settings) for i in range(max(1, settings['browser_workers']))]
+    scheduler = CrawlScheduler(frontier, workers,
+                               politeness_delay=settings['politeness_delay'],
+                               max_attempts=settings['max_attempts'])
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        print("\n⚠ Обход прерван, очередь сохранена и продолжится при следующем запуске")
+    finally:
+        counts = frontier.counts()
+        exporter.products_data = frontier.results()
+        frontier.close()
+
+    print(f"\nИтог очереди: {counts}")
+    exporter.save_to_excel()
+
+    if not counts.get('pending') and not counts.get('in_progress'):
+        # Обход завершён - следующий запуск начнётся с чистой очереди
+        os.remove(os.path.join(output_folder, FRONTIER_FILE))
@@ -0,0 +1,482 @@
+"""
+Распределённый парсинг: координатор и воркеры с общей очередью
+
+Координатор открывает страницы продавцов и кладёт ссылки на товары
+в очередь, воркеры (на этой или других машинах) берут товары из очереди,
+парсят карточки и возвращают результаты. Итоговая выгрузка собирается
+из результатов всех воркеров.
+
+Очередь подключается через QueueBackend:
+  sqlite - файл SQLite (например, в общей сетевой папке)
+  redis  - Redis или совместимый сервер (нужен пакет redis)
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+from abc import ABC, abstractmethod
+
+from parser import OzonSellerParser, product_key
+
+# Через сколько секунд задача, взятая воркером, возвращается в очередь,
+# если воркер не прислал результат (упал или потерял связь)
+LEASE_SECONDS = 600
+IDLE_SLEEP = 10
+
+
+class QueueBackend(ABC):
+    """Интерфейс очереди товаров"""
+
+    @abstractmethod
+    def put_products(self, product_urls, seller_url):
+        """Добавление товаров продавца; возвращает число новых товаров"""
+
+    @abstractmethod
+    def claim(self, worker_id):
+        """Задача {'key', 'url', 'seller_url'} для воркера или None"""
+
+    @abstractmethod
+    def complete(self, task, product_data, worker_id):
+        """Результат задачи"""
+
+    @abstractmethod
+    def fail(self, task, error, max_attempts):
+        """Неудачная попытка: задача возвращается в очередь или, после max_attempts, считается проваленной"""
+
+    @abstractmethod
+    def release(self, task):
+        """Возврат задачи в очередь без учёта попытки (карточка не загружалась, например из-за капчи)"""
+
+    @abstractmethod
+    def set_enumeration_done(self, done=True):
+        """Отметка, что координатор собрал ссылки всех продавцов"""
+
+    @abstractmethod
+    def is_enumeration_done(self):
+        """Собраны ли ссылки всех продавцов"""
+
+    @abstractmethod
+    def stats(self):
+        """Число задач по статусам: pending, in_progress, done, failed.
+        Задачи с истёкшей арендой (воркер пропал) снова считаются pending"""
+
+    @abstractmethod
+    def results(self):
+        """Результаты в формате products_data"""
+
+    @abstractmethod
+    def clear(self):
+        """Удаление задач, результатов и отметок прошлого обхода"""
+
+    def close(self):
+        pass
+
+
+class SQLiteQueue(QueueBackend):
+    """Очередь в файле SQLite; задачи выдаются в транзакции BEGIN IMMEDIATE"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout = 60000")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                seller_url TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS product_sellers (
+                key TEXT NOT NULL,
+                seller_url TEXT NOT NULL,
+                PRIMARY KEY (key, seller_url)
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                sku TEXT,
+                name TEXT,
+                price TEXT,
+                worker TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def put_products(self, product_urls, seller_url):
+        added = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for url in product_urls:
+                key = product_key(url)
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO tasks (key, url, seller_url) VALUES (?, ?, ?)",
+                    (key, url, seller_url)
+                )
+                added += cursor.rowcount
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO product_sellers (key, seller_url) VALUES (?, ?)",
+                    (key, seller_url)
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, worker_id):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT key, url, seller_url FROM tasks "
+                "WHERE status = 'pending' OR (status = 'in_progress' AND lease_until < ?) "
+                "ORDER BY rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'in_progress', worker = ?, lease_until = ? WHERE key = ?",
+                    (worker_id, now + LEASE_SECONDS, row[0])
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return {'key': row[0], 'url': row[1], 'seller_url': row[2]}
+
+    def complete(self, task, product_data, worker_id):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, url, sku, name, price, worker) VALUES (?, ?, ?, ?, ?, ?)",
+                (task['key'], task['url'], product_data.get('sku', ''), product_data.get('name', ''),
+                 product_data.get('price', ''), worker_id)
+            )
+            self.conn.execute("UPDATE tasks SET status = 'done', error = NULL WHERE key = ?", (task['key'],))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def fail(self, task, error, max_attempts):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE tasks SET attempts = attempts + 1, error = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE key = ?",
+                (error, max_attempts, task['key'])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def release(self, task):
+        self.conn.execute(
+            "UPDATE tasks SET status = 'pending', worker = NULL, lease_until = 0 "
+            "WHERE key = ? AND status = 'in_progress'",
+            (task['key'],)
+        )
+
+    def set_enumeration_done(self, done=True):
+        self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('enumeration_done', ?)",
+                          ('1' if done else '0',))
+
+    def is_enumeration_done(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'enumeration_done'").fetchone()
+        return bool(row and row[0] == '1')
+
+    def stats(self):
+        # Аренда истекла - воркер пропал, задача снова ждёт в очереди
+        self.conn.execute("UPDATE tasks SET status = 'pending', worker = NULL "
+                          "WHERE status = 'in_progress' AND lease_until < ?", (time.time(),))
+        counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ('pending', 'in_progress', 'done', 'failed')}
+
+    def results(self):
+        rows = self.conn.execute("""
+            SELECT r.sku, r.name, r.price, GROUP_CONCAT(ps.seller_url, '; '), r.url
+            FROM results r LEFT JOIN product_sellers ps ON ps.key = r.key
+            GROUP BY r.key ORDER BY r.rowid
+        """).fetchall()
+        return [{'sku': r[0], 'name': r[1], 'price': r[2], 'seller_url': r[3] or '', 'product_url': r[4]}
+                for r in rows]
+
+    def clear(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ('tasks', 'product_sellers', 'results', 'meta'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        self.conn.close()
+
+
+# Выдача задачи и её аренда - одной командой: если воркер упадёт сразу после
+# выдачи, задача останется в аренде и вернётся в очередь по её истечении
+REDIS_CLAIM = """
+local key = redis.call('LPOP', KEYS[1])
+if key then
+    redis.call('HSET', KEYS[2], key, ARGV[1])
+end
+return key
+"""
+
+# Задача возвращается в начало очереди, только если аренда ещё не снята
+REDIS_RELEASE = """
+if redis.call('HDEL', KEYS[1], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+end
+"""
+
+REDIS_REQUEUE_EXPIRED = """
+local leases = redis.call('HGETALL', KEYS[1])
+for i = 1, #leases, 2 do
+    if tonumber(leases[i + 1]) < tonumber(ARGV[1]) then
+        redis.call('HDEL', KEYS[1], leases[i])
+        redis.call('RPUSH', KEYS[2], leases[i])
+    end
+end
+"""
+
+
+class RedisQueue(QueueBackend):
+    """Очередь в Redis (или совместимом сервере); ключи с префиксом prefix"""
+
+    def __init__(self, redis_url, prefix='ozon_parser'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Для queue_backend = redis установите пакет: pip install redis")
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+        self._claim = self.client.register_script(REDIS_CLAIM)
+        self._requeue = self.client.register_script(REDIS_REQUEUE_EXPIRED)
+        self._release = self.client.register_script(REDIS_RELEASE)
+
+    def _key(self, name):
+        return f"{self.prefix}:{name}"
+
+    def put_products(self, product_urls, seller_url):
+        added = 0
+        for url in product_urls:
+            key = product_key(url)
+            self.client.sadd(self._key(f"sellers:{key}"), seller_url)
+            if self.client.hsetnx(self._key('tasks'), key, json.dumps({'url': url, 'seller_url': seller_url})):
+                self.client.rpush(self._key('pending'), key)
+                added += 1
+        return added
+
+    def _requeue_expired(self):
+        self._requeue(keys=[self._key('leases'), self._key('pending')], args=[time.time()])
+
+    def claim(self, worker_id):
+        self._requeue_expired()
+        key = self._claim(keys=[self._key('pending'), self._key('leases')], args=[time.time() + LEASE_SECONDS])
+        if key is None:
+            return None
+        task = json.loads(self.client.hget(self._key('tasks'), key))
+        return {'key': key, 'url': task['url'], 'seller_url': task['seller_url']}
+
+    def complete(self, task, product_data, worker_id):
+        result = {field: product_data.get(field, '') for field in ('sku', 'name', 'price')}
+        result.update(url=task['url'], worker=worker_id)
+        pipe = self.client.pipeline()
+        pipe.hset(self._key('results'), task['key'], json.dumps(result, ensure_ascii=False))
+        pipe.rpush(self._key('results_order'), task['key'])
+        pipe.hdel(self._key('leases'), task['key'])
+        pipe.execute()
+
+    def fail(self, task, error, max_attempts):
+        attempts = self.client.hincrby(self._key('attempts'), task['key'], 1)
+        pipe = self.client.pipeline()
+        pipe.hdel(self._key('leases'), task['key'])
+        if attempts >= max_attempts:
+            pipe.hset(self._key('failed'), task['key'], error)
+        else:
+            pipe.rpush(self._key('pending'), task['key'])
+        pipe.execute()
+
+    def release(self, task):
+        self._release(keys=[self._key('leases'), self._key('pending')], args=[task['key']])
+
+    def set_enumeration_done(self, done=True):
+        self.client.hset(self._key('meta'), 'enumeration_done', '1' if done else '0')
+
+    def is_enumeration_done(self):
+        return self.client.hget(self._key('meta'), 'enumeration_done') == '1'
+
+    def stats(self):
+        self._requeue_expired()
+        return {
+            'pending': self.client.llen(self._key('pending')),
+            'in_progress': self.client.hlen(self._key('leases')),
+            'done': self.client.hlen(self._key('results')),
+            'failed': self.client.hlen(self._key('failed')),
+        }
+
+    def results(self):
+        rows = []
+        seen = set()
+        for key in self.client.lrange(self._key('results_order'), 0, -1):
+            if key in seen:
+                continue
+            seen.add(key)
+            result = json.loads(self.client.hget(self._key('results'), key))
+            sellers = sorted(self.client.smembers(self._key(f"sellers:{key}")))
+            rows.append({'sku': result['sku'], 'name': result['name'], 'price': result['price'],
+                         'seller_url': '; '.join(sellers), 'product_url': result['url']})
+        return rows
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self._key('*')))
+        if keys:
+            self.client.delete(*keys)
+
+
+def open_queue(settings, output_folder):
+    """Очередь по настройкам queue_backend / queue_path / redis_url"""
+    if settings['queue_backend'] == 'redis':
+        return RedisQueue(settings['redis_url'])
+    return SQLiteQueue(settings['queue_path'] or os.path.join(output_folder, 'distributed_queue.sqlite'))
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_coordinator(seller_urls, settings, output_folder='prices_with_co-investment'):
+    """Сбор ссылок всех продавцов в очередь, ожидание воркеров и сборка выгрузки"""
+    parser = OzonSellerParser(seller_urls, output_folder=output_folder, settings=settings)
+    queue = open_queue(settings, output_folder)
+    # Задачи и результаты прошлого обхода не должны попасть в эту выгрузку
+    queue.clear()
+    queue.set_enumeration_done(False)
+
+    print("=" * 70)
+    print("КООРДИНАТОР: сбор ссылок продавцов в очередь")
+    print("=" * 70)
+
+    try:
+        parser.setup_driver()
+        for seller_idx, seller_url in enumerate(parser.seller_urls, 1):
+            parser.enumerate_seller(seller_idx, seller_url)
+            # Товары, уже встреченные у других продавцов, тоже передаём: очередь
+            # не создаст для них новых задач, но запомнит продавца для выгрузки
+            seller_links = [parser.product_index.urls[key]
+                            for key, sellers in parser.product_index.sellers.items() if seller_url in sellers]
+            added = queue.put_products(seller_links, seller_url)
+            print(f"✓ В очередь добавлено {added} товаров продавца {seller_url}, очередь: {queue.stats()}")
+        queue.set_enumeration_done(True)
+    finally:
+        parser.close_driver()
+
+    print("\nСбор ссылок завершён, ожидание воркеров...")
+    while True:
+        stats = queue.stats()
+        if stats['pending'] == 0 and stats['in_progress'] == 0:
+            break
+        print(f"  Очередь: {stats}")
+        time.sleep(IDLE_SLEEP * 3)
+
+    merge_results(settings, output_folder, queue)
+
+
+def wait_for_captcha(parser, worker_id):
+    """
+    Ожидание решения капчи в браузере воркера: новые задачи не берутся, пока
+    она не снята. False - капча не снята за captcha_max_wait секунд
+    """
+    print(f"\n⏸ [{worker_id}] Капча: задачи не берутся, пока она не решена в браузере")
+    deadline = time.time() + parser.settings['captcha_max_wait']
+    while not parser._captcha_cleared():
+        if time.time() >= deadline:
+            print(f"⚠ [{worker_id}] Капча не снята за {parser.settings['captcha_max_wait']} с, воркер остановлен")
+            return False
+        time.sleep(parser.settings['captcha_retry_interval'])
+    return True
+
+
+def run_worker(settings, output_folder='prices_with_co-investment'):
+    """Парсинг карточек из общей очереди до её исчерпания"""
+    worker_id = worker_name()
+    queue = open_queue(settings, output_folder)
+    parser = OzonSellerParser(None, output_folder=output_folder, trace=False, settings=settings)
+
+    print("=" * 70)
+    print(f"ВОРКЕР {worker_id}")
+    print("=" * 70)
+
+    processed = 0
+    started = time.time()
+    try:
+        parser.setup_driver()
+        while True:
+            task = queue.claim(worker_id)
+            if task is None:
+                stats = queue.stats()
+                if queue.is_enumeration_done() and stats['pending'] == 0 and stats['in_progress'] == 0:
+                    break
+                time.sleep(IDLE_SLEEP)
+                continue
+
+            parser.current_seller_url = task['seller_url']
+            parser.maybe_recycle_driver()
+            product_data = parser.parse_product_page(task['url'])
+            if product_data is None and parser.captcha_pending:
+                # Карточка не загружалась - попытка не считается, задачу возьмёт этот или другой воркер
+                parser.deferred_urls.pop(task['url'], None)
+                queue.release(task)
+                if not wait_for_captcha(parser, worker_id):
+                    break
+            elif product_data is None:
+                queue.fail(task, 'не удалось загрузить карточку', settings['max_attempts'])
+            else:
+                queue.complete(task, product_data, worker_id)
+                processed += 1
+
+            if processed and processed % 10 == 0:
+                elapsed = time.time() - started
+                print(f"\n  [{worker_id}] обработано {processed}, {processed / (elapsed / 60):.1f} товаров/мин, "
+                      f"очередь: {queue.stats()}")
+    finally:
+        parser.close_driver()
+        queue.close()
+
+    print(f"\n✓ Воркер {worker_id} завершил работу, обработано товаров: {processed}")
+
+
+def merge_results(settings, output_folder='prices_with_co-investment', queue=None):
+    """Сборка результатов всех воркеров в одну выгрузку"""
+    queue = queue or open_queue(settings, output_folder)
+    exporter = OzonSellerParser(None, output_folder=output_folder, trace=False, settings=settings)
+    try:
+        exporter.products_data = queue.results()
+        stats = queue.stats()
+
+        print(f"\nИтог очереди: {stats}")
+        exporter.save_to_excel()
+
+        if stats['pending'] == 0 and stats['in_progress'] == 0:
+            # Обход завершён - следующий начнётся с чистой очереди, а воркеры,
+            # запущенные раньше координатора, будут ждать его, а не завершатся
+            queue.clear()
+    finally:
+        queue.close()
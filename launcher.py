@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 
 def clear():
     os.system("cls" if os.name == "nt" else "clear")
@@ -41,6 +42,30 @@ def run_unit_update():
         print(f"Ошибка запуска unit_update: {e}")
     pause()
 
+def run_unit_batch_update():
+    clear()
+    print("ЗАПУСК: Обновление всех Unit-файлов\n")
+    try:
+        from script import update_unit_files
+        success = update_unit_files()
+        if success:
+            print("\n✓ Все файлы обновлены")
+        else:
+            print("\n✗ Обновление завершилось с ошибками")
+    except Exception as e:
+        print(f"Ошибка запуска unit_update: {e}")
+    pause()
+
+def run_unit_watch():
+    clear()
+    print("ЗАПУСК: Автообновление Unit-файла по новым отчётам\n")
+    try:
+        from script import watch_unit_updates
+        watch_unit_updates()
+    except Exception as e:
+        print(f"Ошибка запуска unit_watch: {e}")
+    pause()
+
 # ========== ДОБАВЛЕНА НОВАЯ ФУНКЦИЯ ==========
 def run_full_pipeline():
     clear()
@@ -98,6 +123,8 @@ def main_menu():
         print("2. Получить габариты товаров (Ozon API)")
         print("3. Обновить Unit-файл (Excel)")
         print("4. 🚀 Полная цепочка (API → Парсинг → Unit)")
+        print("5. Обновить все Unit-файлы из unit_folder (Excel)")
+        print("6. Следить за папками отчётов и обновлять Unit-файл")
         print("0. Выход")
         print("=" * 60)
 
@@ -111,6 +138,10 @@ def main_menu():
             run_unit_update()
         elif choice == "4":  # НОВЫЙ ПУНКТ
             run_full_pipeline()
+        elif choice == "5":
+            run_unit_batch_update()
+        elif choice == "6":
+            run_unit_watch()
         elif choice == "0":
             print("\nВыход.")
             sys.exit(0)
@@ -119,4 +150,6 @@ def main_menu():
             pause()
 
 if __name__ == "__main__":
+    # Процессы-воркеры в собранном exe (PyInstaller) запускаются через тот же exe
+    multiprocessing.freeze_support()
     main_menu()
\ No newline at end of file
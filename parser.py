@@ -1,6 +1,14 @@
 import os
 import time
+import json
+import shutil
+import hashlib
 import random
+import functools
+import subprocess
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
 import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -8,22 +16,560 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import re
 from datetime import datetime
+from urllib.parse import urlsplit
+
+try:
+    import psutil
+except ImportError:
+    # Без psutil память браузера не измеряется, перезапуск только по числу страниц
+    psutil = None
+
+
+# Сколько карточек загружает одна фоновая вкладка до пересоздания
+PREFETCH_TAB_MAX_USES = 20
+
+# Раз в сколько загруженных страниц замерять память браузера
+RSS_SAMPLE_EVERY = 10
+
+FINGERPRINTS_FILE = 'seller_fingerprints.json'
+
+# Navigation Timing и Resource Timing загруженной страницы (время в мс от начала навигации)
+PAGE_METRICS_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+if (!nav) { return null; }
+var resources = performance.getEntriesByType('resource');
+var bytes = nav.transferSize || 0;
+resources.forEach(function (entry) { bytes += entry.transferSize || 0; });
+return {
+    ttfb: nav.responseStart,
+    dom_content_loaded: nav.domContentLoadedEventEnd,
+    load: nav.loadEventEnd,
+    bytes: bytes,
+    requests: resources.length + 1
+};
+"""
+
+# По умолчанию браузер хранит только 250 записей о ресурсах, у карточек Ozon их больше
+RESOURCE_BUFFER_JS = "performance.setResourceTimingBufferSize(5000);"
+
+# Селекторы полей карточки товара: primary - классы текущей вёрстки Ozon,
+# fallback - data-widget и поиск по тексту на случай смены классов (медленнее)
+PRODUCT_SELECTORS = {
+    'sku': {
+        'primary': [(By.CSS_SELECTOR, "div.ga5_3_11-a2.tsBodyControl400Small")],
+        'fallback': [(By.CSS_SELECTOR, "[data-widget='webDetailSKU']"),
+                     (By.XPATH, "//*[contains(., 'Артикул')]")],
+    },
+    'name': {
+        'primary': [(By.CSS_SELECTOR, "h1.pdp_gb9.tsHeadline550Medium")],
+        'fallback': [(By.CSS_SELECTOR, "[data-widget='webProductHeading'] h1"),
+                     (By.CSS_SELECTOR, "h1")],
+    },
+    'price': {
+        'primary': [(By.CSS_SELECTOR, "span.tsHeadline600Large")],
+        'fallback': [(By.CSS_SELECTOR, "[data-widget='webPrice'] span"),
+                     (By.XPATH, "//*[contains(., '₽')]")],
+    },
+}
+
+
+def _parse_sku(text):
+    if 'Артикул' in text:
+        numbers = re.findall(r'\d+', text)
+        if numbers:
+            return numbers[-1]
+    return ''
+
+
+def _parse_name(text):
+    return text
+
+
+def _parse_name_fallback(text):
+    # Запасной селектор - любой h1, короткий текст там обычно не название товара
+    return text if len(text) > 3 else ''
+
+
+def _parse_price(text):
+    return ''.join(re.findall(r'\d+', text))
+
+
+FIELD_PARSERS = {'sku': _parse_sku, 'name': _parse_name, 'price': _parse_price}
+# Разбор значения для запасных селекторов, если он строже основного
+FALLBACK_PARSERS = {'name': _parse_name_fallback}
+
+# Ссылки на товары первой страницы продавца и цена из плитки каждого товара
+FIRST_PAGE_TILES_JS = """
+var result = [];
+document.querySelectorAll("a[href*='/product/']").forEach(function (link) {
+    var node = link, price = '';
+    for (var depth = 0; depth < 6 && node; depth++, node = node.parentElement) {
+        var match = (node.innerText || '').match(/\\d[\\d\\s]*₽/);
+        if (match) { price = match[0].replace(/\\s/g, ''); break; }
+    }
+    result.push([link.href, price]);
+});
+return result;
+"""
+
+
+class PhaseTracer:
+    """
+    Учёт времени по фазам работы парсера (навигация, капча, извлечение, паузы)
+    
+    Каждая завершённая фаза пишется строкой в trace-файл (JSON lines).
+    Вложенные фазы учитываются отдельно: у родительской фазы считается
+    только собственное время (self), поэтому сумма по фазам не превышает
+    общего времени работы.
+    """
+    
+    def __init__(self):
+        self.trace_path = None
+        self._file = None
+        self._stack = []
+        self._started = time.time()
+        self.seller = None
+        self.product = None
+        self._product_phases = {}
+        self.phase_totals = {}
+        self.seller_totals = {}
+        self.products_count = 0
+    
+    def open(self, trace_path):
+        """Открытие trace-файла для записи событий"""
+        self.trace_path = trace_path
+        self._file = open(trace_path, 'w', encoding='utf-8')
+        self._started = time.time()
+    
+    def write_event(self, event):
+        """Запись одного события в trace-файл"""
+        if self._file:
+            self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self._file.flush()
+    
+    def begin_seller(self, seller_url):
+        self.seller = seller_url
+        self.seller_totals.setdefault(seller_url, {})
+    
+    def begin_product(self, product_url):
+        self.product = product_url
+        self._product_phases = {}
+    
+    def end_product(self):
+        """Итоговое событие по товару: время каждой фазы"""
+        if self.product is None:
+            return
+        self.products_count += 1
+        self.write_event({
+            'type': 'product',
+            'seller': self.seller,
+            'product': self.product,
+            'phases': {k: round(v, 3) for k, v in self._product_phases.items()},
+            'total': round(sum(self._product_phases.values()), 3),
+        })
+        self.product = None
+        self._product_phases = {}
+    
+    @contextmanager
+    def phase(self, name):
+        """Контекст для замера фазы"""
+        start = time.time()
+        frame = {'name': name, 'children': 0.0}
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            self._stack.pop()
+            own = max(duration - frame['children'], 0.0)
+            if self._stack:
+                self._stack[-1]['children'] += duration
+            
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + own
+            if self.seller is not None:
+                seller_phases = self.seller_totals.setdefault(self.seller, {})
+                seller_phases[name] = seller_phases.get(name, 0.0) + own
+            if self.product is not None:
+                self._product_phases[name] = self._product_phases.get(name, 0.0) + own
+            
+            self.write_event({
+                'type': 'phase',
+                'phase': name,
+                'seller': self.seller,
+                'product': self.product,
+                'start': round(start, 3),
+                'duration': round(duration, 3),
+                'self': round(own, 3),
+                'depth': len(self._stack),
+            })
+    
+    def close(self):
+        """Итоговая разбивка времени по фазам и закрытие trace-файла"""
+        wall_time = time.time() - self._started
+        other = max(wall_time - sum(self.phase_totals.values()), 0.0)
+        
+        self.write_event({
+            'type': 'summary',
+            'wall_time': round(wall_time, 3),
+            'products': self.products_count,
+            'phases': {k: round(v, 3) for k, v in self.phase_totals.items()},
+            'other': round(other, 3),
+            'sellers': {
+                seller: {k: round(v, 3) for k, v in phases.items()}
+                for seller, phases in self.seller_totals.items()
+            },
+        })
+        
+        print(f"\n" + "="*70)
+        print("РАЗБИВКА ВРЕМЕНИ ПО ФАЗАМ")
+        print("="*70)
+        print(f"Общее время: {wall_time/60:.1f} мин, товаров: {self.products_count}")
+        rows = sorted(self.phase_totals.items(), key=lambda x: x[1], reverse=True)
+        rows.append(('other', other))
+        for name, seconds in rows:
+            share = seconds / wall_time * 100 if wall_time > 0 else 0
+            print(f"  {name:<12} {seconds/60:8.1f} мин  ({share:5.1f}%)")
+        
+        if self.products_count:
+            per_product = (wall_time - other) / self.products_count
+            print(f"  В среднем на товар: {per_product:.1f} с")
+        
+        for seller, phases in self.seller_totals.items():
+            if not phases:
+                continue
+            parts = ', '.join(f"{k} {v/60:.1f}" for k, v in
+                              sorted(phases.items(), key=lambda x: x[1], reverse=True))
+            print(f"  {seller}: {parts} (мин)")
+        
+        if self._file:
+            self._file.close()
+            self._file = None
+            print(f"Trace-файл: {self.trace_path}")
+
+
+class PacingController:
+    """
+    Адаптивный темп запросов
+    
+    Все паузы парсера умножаются на factor. Капча и ошибки загрузки
+    увеличивают множитель, медленные страницы - немного увеличивают,
+    серия чистых загрузок - постепенно уменьшает. Каждое изменение
+    пишется в trace-файл и выводится в консоль.
+    """
+    
+    def __init__(self, enabled=False, min_factor=0.3, max_factor=5.0, log_event=None):
+        self.enabled = enabled
+        self.factor = 1.0
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.log_event = log_event
+        self.load_times = deque(maxlen=20)
+        self.clean_streak = 0
+        self.pages = 0
+        self.captchas = 0
+        self.errors = 0
+        self.adjustments = 0
+        self.started = time.time()
+    
+    def scale(self, seconds):
+        return seconds * self.factor if self.enabled else seconds
+    
+    def _adjust(self, multiplier, reason):
+        old = self.factor
+        self.factor = min(self.max_factor, max(self.min_factor, self.factor * multiplier))
+        if self.factor == old:
+            return
+        self.adjustments += 1
+        print(f"  [темп] {reason}: множитель пауз {old:.2f} → {self.factor:.2f}")
+        if self.log_event:
+            self.log_event({
+                'type': 'pacing',
+                'time': round(time.time(), 3),
+                'reason': reason,
+                'factor_old': round(old, 3),
+                'factor_new': round(self.factor, 3),
+                'pages_per_min': round(self.pages_per_minute(), 2),
+            })
+    
+    def observe(self, load_time=None, captcha=False, error=False):
+        """Учёт результата загрузки одной страницы"""
+        self.pages += 1
+        if captcha:
+            self.captchas += 1
+        if error:
+            self.errors += 1
+        if not self.enabled:
+            return
+        
+        if captcha:
+            self.clean_streak = 0
+            self._adjust(2.0, "капча")
+            return
+        if error:
+            self.clean_streak = 0
+            self._adjust(1.5, "ошибка загрузки")
+            return
+        
+        if load_time is not None:
+            recent = sorted(self.load_times)
+            self.load_times.append(load_time)
+            if len(recent) >= 5 and load_time > 2 * recent[len(recent) // 2]:
+                self.clean_streak = 0
+                self._adjust(1.2, f"медленная загрузка {load_time:.1f} с")
+                return
+        
+        self.clean_streak += 1
+        if self.clean_streak >= 10:
+            self.clean_streak = 0
+            self._adjust(0.85, "10 чистых загрузок подряд")
+    
+    def pages_per_minute(self):
+        elapsed = time.time() - self.started
+        return self.pages / (elapsed / 60) if elapsed > 0 else 0.0
+    
+    def report(self):
+        """Итог темпа за запуск"""
+        summary = {
+            'type': 'pacing_summary',
+            'enabled': self.enabled,
+            'pages': self.pages,
+            'pages_per_min': round(self.pages_per_minute(), 2),
+            'captchas': self.captchas,
+            'errors': self.errors,
+            'adjustments': self.adjustments,
+            'final_factor': round(self.factor, 3),
+        }
+        if self.log_event:
+            self.log_event(summary)
+        
+        print(f"\nТемп: {summary['pages_per_min']} стр/мин, страниц {self.pages}, "
+              f"капч {self.captchas}, ошибок {self.errors}")
+        if self.enabled:
+            print(f"  Изменений темпа: {self.adjustments}, итоговый множитель пауз: {self.factor:.2f}")
+
+
+def _page_type(url):
+    path = urlsplit(url).path
+    if '/product/' in path:
+        return 'product'
+    if '/seller/' in path:
+        return 'seller'
+    return 'other'
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class PageMetrics:
+    """
+    Метрики загрузки страниц из браузера по продавцам и типам страниц
+    
+    ttfb - первый байт ответа, dom_content_loaded и load - окончание событий,
+    всё в мс от начала навигации; bytes - переданные байты документа и ресурсов
+    (ресурсы других доменов без Timing-Allow-Origin дают 0, поэтому это нижняя
+    оценка); requests - число запросов
+    """
+    
+    FIELDS = ('ttfb', 'dom_content_loaded', 'load', 'bytes', 'requests')
+    
+    def __init__(self, enabled=False, log_event=None):
+        self.enabled = enabled
+        self.log_event = log_event
+        # (продавец, тип страницы) -> список замеров
+        self.samples = {}
+    
+    def collect(self, driver, url, seller_url):
+        """Замер только что загруженной страницы"""
+        if not self.enabled:
+            return None
+        try:
+            metrics = driver.execute_script(PAGE_METRICS_JS)
+        except:
+            return None
+        if not metrics:
+            return None
+        
+        metrics = {field: round(float(metrics.get(field) or 0), 1) for field in self.FIELDS}
+        page_type = _page_type(url)
+        self.samples.setdefault((seller_url or '', page_type), []).append(dict(metrics, url=url))
+        if self.log_event:
+            self.log_event(dict(metrics, type='page_metrics', url=url, seller=seller_url, page_type=page_type))
+        return metrics
+    
+    def _summary(self, samples):
+        loads = [item['load'] for item in samples]
+        return {
+            'pages': len(samples),
+            'ttfb_median': _percentile([item['ttfb'] for item in samples], 0.5),
+            'dcl_median': _percentile([item['dom_content_loaded'] for item in samples], 0.5),
+            'load_median': _percentile(loads, 0.5),
+            'load_p95': _percentile(loads, 0.95),
+            'kb_avg': sum(item['bytes'] for item in samples) / len(samples) / 1024,
+            'requests_avg': sum(item['requests'] for item in samples) / len(samples),
+        }
+    
+    def report(self):
+        """Итог по типам страниц, продавцам и самым медленным страницам"""
+        if not self.samples:
+            return
+        
+        by_type = {}
+        for (seller_url, page_type), samples in self.samples.items():
+            by_type.setdefault(page_type, []).extend(samples)
+        
+        groups = [(page_type, '', samples) for page_type, samples in sorted(by_type.items())]
+        groups += [(page_type, seller_url, samples)
+                   for (seller_url, page_type), samples in sorted(self.samples.items(), key=lambda x: x[0][::-1])]
+        
+        print(f"\n" + "="*70)
+        print("МЕТРИКИ ЗАГРУЗКИ СТРАНИЦ (мс, медиана / p95)")
+        print("="*70)
+        print(f"  {'тип':<8}{'стр':>6}{'TTFB':>8}{'DCL':>8}{'load':>8}{'p95':>8}{'КБ':>8}{'запр':>6}  продавец")
+        for page_type, seller_url, samples in groups:
+            summary = self._summary(samples)
+            if self.log_event:
+                self.log_event(dict(summary, type='page_metrics_summary', page_type=page_type, seller=seller_url))
+            print(f"  {page_type:<8}{summary['pages']:>6}{summary['ttfb_median']:>8.0f}"
+                  f"{summary['dcl_median']:>8.0f}{summary['load_median']:>8.0f}{summary['load_p95']:>8.0f}"
+                  f"{summary['kb_avg']:>8.0f}{summary['requests_avg']:>6.0f}  {seller_url or 'все'}")
+        
+        slowest = sorted((item for samples in by_type.values() for item in samples),
+                         key=lambda item: item['load'], reverse=True)[:5]
+        print("  Самые медленные страницы:")
+        for item in slowest:
+            print(f"    {item['load']:>8.0f} мс  {item['url'][:80]}")
+
+
+def _to_weight(value):
+    """Числовой вес приоритета из значения отчёта (пусто/текст -> 0)"""
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return weight if weight == weight else 0.0
+
+
+def canonical_product_id(url):
+    """
+    Числовой id товара Ozon из URL
+    
+    Один товар встречается под разными slug: /product/nazvanie-123456789/,
+    /product/123456789/ - id в конце пути у них общий
+    """
+    match = re.search(r'/product/(?:[^/?#]*-)?(\d+)/?(?:[?#]|$)', url)
+    return match.group(1) if match else None
+
+
+def product_key(url):
+    """Ключ дедупликации товара: id товара, а если его нет - URL без параметров"""
+    return canonical_product_id(url) or url.split('?')[0].split('#')[0]
+
+
+def field_looks_valid(field, value, product_url):
+    """Правдоподобность значения поля для проверки селекторов"""
+    if field == 'sku':
+        # Артикул Ozon совпадает с id товара в URL
+        product_id = canonical_product_id(product_url)
+        return value.isdigit() and (not product_id or value == product_id)
+    if field == 'name':
+        return 3 < len(value) < 500
+    return value.isdigit() and 0 < int(value) < 100000000
+
+
+class ProductIndex:
+    """Общий индекс товаров за запуск: каждый id загружается один раз, продавцы копятся"""
+    
+    def __init__(self):
+        self.urls = {}
+        self.sellers = {}
+        self.fetched = set()
+    
+    def add(self, url, seller_url):
+        """Регистрация ссылки продавца; True - товар встретился впервые"""
+        key = product_key(url)
+        is_new = key not in self.urls
+        if is_new:
+            self.urls[key] = url
+        sellers = self.sellers.setdefault(key, [])
+        if seller_url and seller_url not in sellers:
+            sellers.append(seller_url)
+        return is_new
+    
+    def sellers_for(self, url):
+        return self.sellers.get(product_key(url), [])
+
+
+def traced(phase_name):
+    """Декоратор: время выполнения метода учитывается в фазе phase_name"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.phase(phase_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class OzonSellerParser:
-    def __init__(self, seller_urls, output_folder='prices_with_co-investment'):
+    def __init__(self, seller_urls, output_folder='prices_with_co-investment', trace=True, settings=None):
         """
         Инициализация парсера
         
         Args:
             seller_urls: Список URL продавцов на Ozon или путь к файлу с URL
+                (None - без списка продавцов, URL передаются напрямую в методы)
             output_folder: Папка для сохранения Excel файла
+            trace: Записывать время по фазам в trace-файл в output_folder
+            settings: Настройки из parser_settings.txt (по умолчанию DEFAULT_SETTINGS)
         """
-        self.seller_urls = self._parse_input_urls(seller_urls)
+        self.seller_urls = self._parse_input_urls(seller_urls) if seller_urls is not None else []
         self.output_folder = output_folder
         self.driver = None
+        self.current_seller_url = None
         self.products_data = []
-        self.visited_urls = set()
+        self.product_index = ProductIndex()
+        # Приоритет товаров (id -> вес) и бюджет времени
+        self.priority_map = {}
+        self.deadline = None
+        self.planned_products = 0
+        self.planned_weight = 0.0
+        # Товары, данные которых извлечены в этом запуске (перенесённые из прошлой выгрузки не входят)
+        self.parsed_keys = set()
+        self.coverage = {}
+        # Режим обновления цен: id товара -> строка прошлой выгрузки
+        self.known_products = {}
+        # Отпечатки каталогов продавцов: новые за этот запуск и ожидаемые цены выборочной проверки
+        self.new_fingerprints = {}
+        self.unchanged_sellers = []
+        self.sample_expected = {}
+        self._previous_rows = None
+        # Уровни селекторов по полям; проверка селекторов может оставить только запасные
+        self.selector_levels = {field: ['primary', 'fallback'] for field in PRODUCT_SELECTORS}
+        self.trace = trace
+        self.tracer = PhaseTracer()
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.attached_to_browser = False
+        self.startup_time = None
+        self._startup_recorded = False
+        self.captcha_count = 0
+        self.captcha_pending = False
+        # Окно, в котором ждёт решения отложенная капча, и открыто ли оно предзагрузкой
+        self.captcha_handle = None
+        self.captcha_tab_owned = False
+        self.deferred_urls = {}
+        self.deferred_sellers = []
+        self._retrying_deferred = False
+        # Перезапуск браузера: счётчики страниц и замеры памяти
+        self.pages_loaded = 0
+        self.pages_since_recycle = 0
+        self.recycles = 0
+        self.rss_samples = []
+        self.pacing = PacingController(enabled=self.settings['adaptive_pacing'],
+                                       log_event=self.tracer.write_event)
+        self.page_metrics = PageMetrics(enabled=self.settings['page_metrics'],
+                                        log_event=self.tracer.write_event)
         
     def _parse_input_urls(self, input_data):
         """
@@ -58,8 +604,8 @@ class OzonSellerParser:
         
         return valid_urls
     
-    def setup_driver(self):
-        """Настройка драйвера Selenium"""
+    def _build_chrome_options(self):
+        """Параметры запуска Chrome"""
         options = webdriver.ChromeOptions()
         
         # Основные настройки
@@ -76,11 +622,274 @@ class OzonSellerParser:
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         
-        self.driver = webdriver.Chrome(options=options)
+        # Постоянный профиль: куки, согласия и "история" сохраняются между запусками
+        if self.settings['chrome_profile_dir']:
+            options.add_argument(f"--user-data-dir={os.path.abspath(self.settings['chrome_profile_dir'])}")
+        
+        return options
+    
+    def setup_driver(self):
+        """Настройка драйвера Selenium"""
+        started = time.time()
+        
+        if self.settings['warm_browser']:
+            self._attach_warm_browser()
+        else:
+            options = self._build_chrome_options()
+            self.driver = webdriver.Chrome(options=options)
         
         # Выполняем скрипты для сокрытия автоматизации
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        
+        if self.page_metrics.enabled:
+            try:
+                self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': RESOURCE_BUFFER_JS})
+            except Exception as e:
+                print(f"⚠ Не удалось увеличить буфер Resource Timing: {e}")
+        
+        self.startup_time = time.time() - started
+        print(f"✓ Браузер готов за {self.startup_time:.1f} с ({self._startup_mode()})")
+    
+    def _startup_mode(self):
+        if self.settings['warm_browser']:
+            return 'warm'
+        if self.settings['chrome_profile_dir']:
+            return 'profile'
+        return 'cold'
+    
+    def _debugger_available(self, port):
+        """Проверка, что Chrome с отладочным портом уже запущен"""
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/version", timeout=1):
+                return True
+        except Exception:
+            return False
+    
+    def _find_chrome_binary(self):
+        """Поиск исполняемого файла Chrome"""
+        if self.settings['chrome_binary']:
+            return self.settings['chrome_binary']
+        
+        candidates = [
+            os.path.expandvars(r"%ProgramFiles%\Google\Chrome\Application\chrome.exe"),
+            os.path.expandvars(r"%ProgramFiles(x86)%\Google\Chrome\Application\chrome.exe"),
+            os.path.expandvars(r"%LocalAppData%\Google\Chrome\Application\chrome.exe"),
+            "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+        ]
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        
+        for name in ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome'):
+            path = shutil.which(name)
+            if path:
+                return path
+        
+        raise RuntimeError("Не найден Chrome, укажите путь в параметре chrome_binary")
+    
+    def _launch_warm_browser(self, port):
+        """Запуск Chrome, который продолжит работать после завершения парсера"""
+        profile_dir = os.path.abspath(self.settings['chrome_profile_dir'] or 'chrome_profile')
+        args = [
+            self._find_chrome_binary(),
+            f"--remote-debugging-port={port}",
+            f"--user-data-dir={profile_dir}",
+            '--start-maximized',
+            '--no-first-run',
+            '--no-default-browser-check',
+            '--disable-blink-features=AutomationControlled',
+        ]
+        
+        print(f"Запуск Chrome с отладочным портом {port}, профиль: {profile_dir}")
+        if os.name == 'nt':
+            flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+            subprocess.Popen(args, creationflags=flags, close_fds=True)
+        else:
+            subprocess.Popen(args, start_new_session=True, close_fds=True,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            if self._debugger_available(port):
+                return
+            time.sleep(0.5)
+        raise RuntimeError(f"Chrome не открыл отладочный порт {port}")
+    
+    def _attach_warm_browser(self):
+        """Подключение к уже запущенному Chrome (или запуск нового) по отладочному порту"""
+        port = self.settings['debugger_port']
+        
+        if self._debugger_available(port):
+            print(f"Подключение к запущенному Chrome на порту {port}")
+        else:
+            self._launch_warm_browser(port)
+        
+        options = webdriver.ChromeOptions()
+        options.debugger_address = f"127.0.0.1:{port}"
+        self.driver = webdriver.Chrome(options=options)
+        self.attached_to_browser = True
+    
+    def close_driver(self):
+        """Закрытие браузера; прогретый браузер остаётся работать"""
+        if not self.driver:
+            return
+        self.driver.quit()
+        self.driver = None
+        if self.attached_to_browser:
+            print("\n✓ Отключено от браузера, Chrome оставлен открытым для следующего запуска")
+        else:
+            print("\n✓ Браузер закрыт")
+    
+    def browser_rss_mb(self):
+        """Суммарная память (RSS) chromedriver и всех процессов Chrome, МБ"""
+        if psutil is None or not self.driver or self.attached_to_browser:
+            return None
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except Exception:
+            return None
+        
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except Exception:
+                continue
+        return total / 1024 / 1024
+    
+    def _count_page(self):
+        """Учёт загруженной страницы и периодический замер памяти браузера"""
+        self.pages_loaded += 1
+        self.pages_since_recycle += 1
+        if self.pages_loaded % RSS_SAMPLE_EVERY != 0:
+            return
+        
+        rss = self.browser_rss_mb()
+        if rss is None:
+            return
+        self.rss_samples.append((self.pages_loaded, rss))
+        self.tracer.write_event({
+            'type': 'rss',
+            'time': round(time.time(), 3),
+            'pages': self.pages_loaded,
+            'rss_mb': round(rss, 1),
+            'recycles': self.recycles,
+        })
+    
+    def recycle_reason(self):
+        """Причина перезапуска браузера, если он нужен (recycle_after_pages или recycle_rss_mb), иначе None"""
+        if not self.driver or self.attached_to_browser:
+            return None
+        
+        reason = None
+        after_pages = self.settings['recycle_after_pages']
+        if after_pages and self.pages_since_recycle >= after_pages:
+            reason = f"{self.pages_since_recycle} страниц"
+        elif self.settings['recycle_rss_mb'] and self.rss_samples:
+            last_pages, last_rss = self.rss_samples[-1]
+            if last_rss >= self.settings['recycle_rss_mb'] and last_pages > self.pages_loaded - self.pages_since_recycle:
+                reason = f"память {last_rss:.0f} МБ"
+        return reason
+    
+    def maybe_recycle_driver(self):
+        """Перезапуск браузера после recycle_after_pages страниц или при превышении recycle_rss_mb"""
+        reason = self.recycle_reason()
+        if reason is None:
+            return False
+        
+        self.recycle_driver(reason)
+        return True
+    
+    def recycle_driver(self, reason):
+        """Перезапуск Chrome с переносом куки сессии"""
+        rss_before = self.browser_rss_mb()
+        print(f"\n♻ Перезапуск браузера ({reason}"
+              + (f", память {rss_before:.0f} МБ" if rss_before else "") + ")...")
+        
+        try:
+            current_url = self.driver.current_url
+            cookies = self.driver.get_cookies()
+        except Exception:
+            current_url, cookies = None, []
+        
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self.setup_driver()
+        
+        # Куки можно выставить только на странице их домена
+        if current_url and current_url.startswith('http'):
+            parts = urlsplit(current_url)
+            try:
+                self.driver.get(f"{parts.scheme}://{parts.netloc}/")
+                for cookie in cookies:
+                    if cookie.get('sameSite') not in ('Strict', 'Lax', 'None'):
+                        cookie.pop('sameSite', None)
+                    try:
+                        self.driver.add_cookie(cookie)
+                    except Exception:
+                        continue
+            except Exception as e:
+                print(f"⚠ Не удалось перенести куки: {e}")
+        
+        self.recycles += 1
+        self.pages_since_recycle = 0
+        self.tracer.write_event({
+            'type': 'recycle',
+            'time': round(time.time(), 3),
+            'pages': self.pages_loaded,
+            'reason': reason,
+            'rss_before_mb': round(rss_before, 1) if rss_before else None,
+            'cookies': len(cookies),
+        })
+    
+    def report_browser_memory(self):
+        """Итог по памяти браузера за запуск"""
+        if not self.rss_samples:
+            if psutil is None:
+                print("\nПамять браузера не измерялась (не установлен psutil)")
+            return
+        
+        values = [rss for _, rss in self.rss_samples]
+        print(f"\nПамять браузера: мин {min(values):.0f} МБ, средн {sum(values) / len(values):.0f} МБ, "
+              f"макс {max(values):.0f} МБ, перезапусков: {self.recycles}")
+        step = max(1, len(self.rss_samples) // 10)
+        points = ', '.join(f"{pages}: {rss:.0f}" for pages, rss in self.rss_samples[::step])
+        print(f"  страниц: МБ -> {points}")
+    
+    def record_startup_stats(self, first_page_captcha):
+        """Запись времени запуска и капчи на первой странице, сравнение режимов запуска"""
+        self.create_output_folder()
+        stats_path = os.path.join(self.output_folder, 'startup_stats.jsonl')
+        
+        entry = {
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'mode': self._startup_mode(),
+            'startup_sec': round(self.startup_time or 0, 2),
+            'first_page_captcha': bool(first_page_captcha),
+        }
+        with open(stats_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        
+        history = {}
+        with open(stats_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                history.setdefault(item['mode'], []).append(item)
+        
+        print("\nСтатистика запусков браузера:")
+        for mode, items in history.items():
+            avg_startup = sum(i['startup_sec'] for i in items) / len(items)
+            captcha_rate = sum(1 for i in items if i['first_page_captcha']) / len(items) * 100
+            print(f"  {mode:<8} запусков: {len(items):3d}, старт {avg_startup:5.1f} с, "
+                  f"капча на первой странице: {captcha_rate:.0f}%")
     
+    @traced('captcha')
     def check_and_solve_captcha(self, require_solution=True):
         """
         Проверка наличия капчи и запрос на ручное решение
@@ -96,6 +905,8 @@ class OzonSellerParser:
             title = self.driver.title.lower()
             if 'antibot captcha' in title or 'капча' in title:
                 print("⚠ Обнаружена капча по заголовку страницы")
+                if require_solution:
+                    self.captcha_count += 1
                 return self._handle_captcha_page(require_solution)
         except:
             pass
@@ -197,6 +1008,8 @@ class OzonSellerParser:
             print(f"Тип: {captcha_type}")
             print(f"{'='*60}")
             
+            if require_solution:
+                self.captcha_count += 1
             return self._handle_captcha_page(require_solution)
         
         print("✓ Капча не обнаружена")
@@ -213,6 +1026,11 @@ class OzonSellerParser:
         except:
             pass
         
+        if require_solution and self.settings['captcha_mode'] == 'defer':
+            # Не останавливаем обход: URL откладывается, капча решается в браузере в любой момент
+            self._set_captcha_pending(True)
+            return False
+        
         if require_solution:
             print("\nИнструкция по решению капчи:")
             print("1. Посмотрите на страницу браузера")
@@ -238,20 +1056,172 @@ class OzonSellerParser:
             print("⚠ Капча обнаружена, но решение не требуется в данном контексте")
             return True
     
+    def _set_captcha_pending(self, pending):
+        """Обновление файла-уведомления о капче в папке результатов"""
+        was_pending = self.captcha_pending
+        self.captcha_pending = pending
+        
+        if pending and not was_pending:
+            try:
+                self.captcha_handle = self.driver.current_window_handle
+            except Exception:
+                self.captcha_handle = None
+            self.captcha_tab_owned = False
+        elif not pending:
+            self.captcha_handle = None
+            self.captcha_tab_owned = False
+        
+        if pending and not was_pending:
+            print("\a⚠ Капча! URL отложен, обход продолжается. Решите капчу в окне браузера.")
+        elif was_pending and not pending:
+            print("✓ Капча снята, отложенные URL будут повторены")
+        
+        status = {
+            'pending': pending,
+            'updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'current_url': self.driver.current_url if self.driver and pending else None,
+            'screenshot': os.path.join(self.output_folder, "captcha_screenshot.png") if pending else None,
+            'deferred_products': len(self.deferred_urls),
+            'deferred_sellers': len(self.deferred_sellers),
+        }
+        try:
+            self.create_output_folder()
+            with open(os.path.join(self.output_folder, 'captcha_pending.json'), 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False, indent=2)
+        except Exception:
+            pass
+    
+    def _captcha_on_page(self):
+        """Быстрая проверка текущей вкладки на капчу, без скриншота и сообщений"""
+        title = self.driver.title.lower()
+        if 'antibot captcha' in title or 'капча' in title:
+            return True
+        for element_id in ('captcha-container', 'captcha', 'slider-background'):
+            if any(element.is_displayed() for element in self.driver.find_elements(By.ID, element_id)):
+                return True
+        return False
+    
+    def _captcha_cleared(self):
+        """
+        Снята ли отложенная капча
+        
+        Окно с капчей только проверяется, без перехода на другие страницы, чтобы
+        капчу можно было решить в браузере. Если окно закрыто, капча считается
+        снятой - при следующей загрузке она будет обнаружена заново
+        """
+        if not self.captcha_pending:
+            return True
+        
+        try:
+            current = self.driver.current_window_handle
+            if self.captcha_handle in self.driver.window_handles:
+                if self.captcha_handle != current:
+                    self.driver.switch_to.window(self.captcha_handle)
+                if self._captcha_on_page():
+                    self.driver.switch_to.window(current)
+                    return False
+                if self.captcha_tab_owned and self.captcha_handle != current:
+                    # Вкладка предзагрузки, оставленная ради капчи, больше не нужна
+                    self.driver.close()
+                self.driver.switch_to.window(current)
+        except Exception:
+            return False
+        
+        self._set_captcha_pending(False)
+        return True
+    
+    def defer_url(self, product_url):
+        """Откладывание карточки товара до снятия капчи"""
+        self.deferred_urls[product_url] = self.current_seller_url
+        print(f"  ⏸ Отложено из-за капчи (всего отложено: {len(self.deferred_urls)})")
+    
+    def retry_deferred(self, wait=False):
+        """
+        Повтор отложенных из-за капчи продавцов и товаров
+        
+        Args:
+            wait: Ждать снятия капчи (до captcha_max_wait), проверяя повторной загрузкой
+                каждые captcha_retry_interval секунд. Без ожидания повтор идёт, только
+                если капча уже снята
+        """
+        if self._retrying_deferred:
+            return
+        self._retrying_deferred = True
+        deadline = time.time() + self.settings['captcha_max_wait']
+        
+        try:
+            while self.deferred_urls or self.deferred_sellers:
+                if self.budget_exhausted():
+                    break
+                if self.captcha_pending:
+                    if not wait or time.time() >= deadline:
+                        break
+                    print(f"\n⏳ Ожидание снятия капчи: отложено товаров {len(self.deferred_urls)}, "
+                          f"продавцов {len(self.deferred_sellers)}")
+                    time.sleep(self.settings['captcha_retry_interval'])
+                    if not self._captcha_cleared():
+                        continue
+                
+                sellers, self.deferred_sellers = self.deferred_sellers, []
+                urls, self.deferred_urls = self.deferred_urls, {}
+                print(f"\nПовтор отложенных: продавцов {len(sellers)}, товаров {len(urls)}")
+                
+                for seller_idx, seller_url in sellers:
+                    if self.captcha_pending:
+                        self.deferred_sellers.append((seller_idx, seller_url))
+                        continue
+                    self.process_seller(seller_idx, seller_url)
+                
+                for product_url, seller_url in urls.items():
+                    if self.captcha_pending:
+                        self.deferred_urls[product_url] = seller_url
+                        continue
+                    self.current_seller_url = seller_url
+                    self.parse_product_page(product_url)
+        finally:
+            self._retrying_deferred = False
+        
+        # Актуализируем файл-уведомление (число отложенных URL)
+        self._set_captcha_pending(self.captcha_pending)
+        
+        if wait and (self.deferred_urls or self.deferred_sellers):
+            print(f"\n⚠ Капча не снята за {self.settings['captcha_max_wait']} с: "
+                  f"не обработано товаров {len(self.deferred_urls)}, продавцов {len(self.deferred_sellers)}")
+            for product_url, seller_url in self.deferred_urls.items():
+                self.products_data.append({'sku': '', 'name': '', 'price': '', 'seller_url': seller_url,
+                                           'product_url': product_url})
+    
+    @traced('navigation')
     def safe_get(self, url, max_retries=3):
         """
         Безопасный переход по URL с обработкой капчи
+        
+        Пока отложенная капча не решена, страницы Ozon не открываются: окно
+        с капчей остаётся на месте, а URL откладывается вызывающим кодом
         """
+        if not self._captcha_cleared():
+            return False
+        
         for attempt in range(max_retries):
             try:
                 print(f"Переход по URL (попытка {attempt + 1}/{max_retries}): {url[:80]}...")
+                load_started = time.time()
                 self.driver.get(url)
+                load_time = time.time() - load_started
+                self._count_page()
+                self.page_metrics.collect(self.driver, url, self.current_seller_url)
                 
                 # Ждем загрузки страницы
-                time.sleep(random.uniform(2, 4))
+                self.human_like_pause(2, 4)
                 
                 # Проверяем капчу с требованием решения
-                if not self.check_and_solve_captcha(require_solution=True):
+                captchas_before = self.captcha_count
+                captcha_solved = self.check_and_solve_captcha(require_solution=True)
+                self.pacing.observe(load_time=load_time, captcha=self.captcha_count > captchas_before)
+                if not captcha_solved:
+                    if self.captcha_pending:
+                        # Режим defer: повторять бессмысленно, пока капча не снята
+                        return False
                     print("⚠ Не удалось решить капчу, пробуем еще раз...")
                     continue
                 
@@ -260,6 +1230,8 @@ class OzonSellerParser:
                     WebDriverWait(self.driver, 10).until(
                         EC.presence_of_element_located((By.TAG_NAME, "body"))
                     )
+                    if self.captcha_pending:
+                        self._set_captcha_pending(False)
                     return True
                 except:
                     print(f"Страница не загрузилась полностью, пробуем еще раз...")
@@ -267,11 +1239,13 @@ class OzonSellerParser:
                     
             except Exception as e:
                 print(f"Ошибка при загрузке страницы: {e}")
-                time.sleep(random.uniform(3, 5))
+                self.pacing.observe(error=True)
+                self.human_like_pause(3, 5)
         
         print(f"Не удалось загрузить страницу после {max_retries} попыток")
         return False
     
+    @traced('pause')
     def human_like_scroll(self, scroll_distance=None, scroll_duration=1.0):
         """Имитация человеческой прокрутки"""
         if scroll_distance is None:
@@ -284,11 +1258,12 @@ class OzonSellerParser:
                 }});
             """)
         
-        time.sleep(scroll_duration + random.uniform(0.2, 0.5))
+        time.sleep(self.pacing.scale(scroll_duration + random.uniform(0.2, 0.5)))
     
+    @traced('pause')
     def human_like_pause(self, min_time=0.5, max_time=2.0):
-        """Случайная пауза как у человека"""
-        pause_time = random.uniform(min_time, max_time)
+        """Случайная пауза как у человека (с учётом адаптивного темпа)"""
+        pause_time = self.pacing.scale(random.uniform(min_time, max_time))
         time.sleep(pause_time)
     
     def get_total_products_count(self):
@@ -328,6 +1303,7 @@ class OzonSellerParser:
         
         return total_count
     
+    @traced('enumeration')
     def load_all_products_humanlike(self, seller_name):
         """Загрузка ВСЕХ товаров с имитацией человеческого поведения"""
         print(f"\n" + "="*60)
@@ -339,7 +1315,8 @@ class OzonSellerParser:
             print("⚠ Не удалось решить капчу, пропускаем этого продавца")
             return []
         
-        all_product_urls = set()
+        # id товара -> первый встреченный URL, чтобы варианты slug не считались разными товарами
+        all_product_urls = {}
         last_url_count = 0
         same_count_iterations = 0
         max_same_count = 8
@@ -400,7 +1377,8 @@ class OzonSellerParser:
                         continue
                 
                 before_count = len(all_product_urls)
-                all_product_urls.update(new_urls)
+                for url in new_urls:
+                    all_product_urls.setdefault(product_key(url), url)
                 after_count = len(all_product_urls)
                 new_items = after_count - before_count
                 
@@ -443,7 +1421,8 @@ class OzonSellerParser:
             self.human_like_pause(1.0, 2.0)
         
         final_urls = self.collect_all_product_urls()
-        all_product_urls.update(final_urls)
+        for url in final_urls:
+            all_product_urls.setdefault(product_key(url), url)
         
         print(f"\n✓ Загрузка завершена")
         print(f"✓ Всего собрано уникальных товаров: {len(all_product_urls)}")
@@ -452,7 +1431,7 @@ class OzonSellerParser:
             percentage = len(all_product_urls) / total_expected * 100
             print(f"✓ Прогресс: {percentage:.1f}% от ожидаемых {total_expected} товаров")
         
-        return list(all_product_urls)
+        return list(all_product_urls.values())
     
     def try_click_show_more(self):
         """Попытка кликнуть на кнопку 'Показать ещё'"""
@@ -549,114 +1528,117 @@ class OzonSellerParser:
         
         return all_urls
     
-    def parse_product_page(self, product_url):
-        """Парсинг данных с карточки товара"""
-        if product_url in self.visited_urls:
-            return
+    def _extract_field(self, field, levels=None):
+        """
+        Значение поля с открытой карточки товара
+        
+        Селекторы перебираются по уровням levels (по умолчанию - выбранным
+        проверкой селекторов), возвращается первое непустое значение
+        """
+        for level in levels or self.selector_levels[field]:
+            parse = FIELD_PARSERS[field]
+            if level == 'fallback':
+                parse = FALLBACK_PARSERS.get(field, parse)
+            for by, selector in PRODUCT_SELECTORS[field][level]:
+                try:
+                    elements = self.driver.find_elements(by, selector)
+                except:
+                    continue
+                for element in elements:
+                    try:
+                        value = parse(element.text.strip())
+                        if value:
+                            return value
+                    except:
+                        continue
+        return ''
+    
+    def _extract_sku(self):
+        """Артикул с открытой карточки товара"""
+        return self._extract_field('sku')
+    
+    def _extract_name(self):
+        """Название с открытой карточки товара"""
+        return self._extract_field('name')
+    
+    def _extract_price(self):
+        """Цена с открытой карточки товара"""
+        return self._extract_field('price')
+    
+    @traced('extraction')
+    def _extract_product_data(self):
+        """Извлечение артикула, названия и цены с открытой карточки товара"""
+        return {
+            'sku': self._extract_sku(),
+            'name': self._extract_name(),
+            'price': self._extract_price(),
+            'seller_url': self.current_seller_url,
+        }
+    
+    @traced('extraction')
+    def _extract_price_only(self, known):
+        """Режим обновления цен: артикул и название берутся из прошлой выгрузки"""
+        return {
+            'sku': known['sku'],
+            'name': known['name'],
+            'price': self._extract_price(),
+            'seller_url': known['seller_url'],
+        }
+    
+    def parse_product_page(self, product_url, navigate=None):
+        """
+        Парсинг данных с карточки товара
+        
+        Args:
+            navigate: Функция открытия страницы (по умолчанию safe_get);
+                в режиме предзагрузки - переключение на уже загруженную вкладку
+        
+        Возвращает словарь с данными товара или None, если страницу не удалось обработать
+        """
+        key = product_key(product_url)
+        if key in self.product_index.fetched:
+            return None
+        self.product_index.add(product_url, self.current_seller_url)
+        empty_row = {'sku': '', 'name': '', 'price': '', 'seller_url': self.current_seller_url,
+                     'product_url': product_url}
+        known = self.known_products.get(key)
+        if known:
+            empty_row.update(sku=known['sku'], name=known['name'], seller_url=known['seller_url'])
         
         print(f"Парсинг: {product_url[:70]}...")
+        self.tracer.begin_product(product_url)
         
         try:
             # Используем безопасный переход с обработкой капчи
-            if not self.safe_get(product_url):
+            navigate = navigate or self.safe_get
+            if not navigate(product_url):
+                if self.captcha_pending:
+                    self.defer_url(product_url)
+                    return None
                 print(f"  ⚠ Не удалось загрузить страницу товара")
-                self.products_data.append({'sku': '', 'name': '', 'price': '', 'seller_url': self.current_seller_url})
-                return
-            
-            self.visited_urls.add(product_url)
+                self.products_data.append(dict(empty_row))
+                return None
             
             # Проверяем капчу на странице товара с требованием решения
             if not self.check_and_solve_captcha(require_solution=True):
+                if self.captcha_pending:
+                    self.defer_url(product_url)
+                    return None
                 print(f"  ⚠ Не удалось решить капчу на странице товара")
-                self.products_data.append({'sku': '', 'name': '', 'price': '', 'seller_url': self.current_seller_url})
-                return
+                self.products_data.append(dict(empty_row))
+                return None
             
-            product_data = {'sku': '', 'name': '', 'price': '', 'seller_url': self.current_seller_url}
-            
-            # Артикул
-            try:
-                sku_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.ga5_3_11-a2.tsBodyControl400Small")
-                for element in sku_elements:
-                    try:
-                        text = element.text.strip()
-                        if 'Артикул' in text:
-                            numbers = re.findall(r'\d+', text)
-                            if numbers:
-                                product_data['sku'] = numbers[-1]
-                                break
-                    except:
-                        continue
-                
-                if not product_data['sku']:
-                    sku_elements = self.driver.find_elements(By.XPATH, "//*[contains(., 'Артикул')]")
-                    for element in sku_elements:
-                        try:
-                            text = element.text.strip()
-                            if 'Артикул' in text:
-                                numbers = re.findall(r'\d+', text)
-                                if numbers:
-                                    product_data['sku'] = numbers[-1]
-                                    break
-                        except:
-                            continue
-            except:
-                pass
-            
-            # Название
-            try:
-                name_elements = self.driver.find_elements(By.CSS_SELECTOR, "h1.pdp_gb9.tsHeadline550Medium")
-                for element in name_elements:
-                    try:
-                        name = element.text.strip()
-                        if name:
-                            product_data['name'] = name
-                            break
-                    except:
-                        continue
-                
-                if not product_data['name']:
-                    name_elements = self.driver.find_elements(By.CSS_SELECTOR, "h1")
-                    for element in name_elements:
-                        try:
-                            name = element.text.strip()
-                            if name and len(name) > 3:
-                                product_data['name'] = name
-                                break
-                        except:
-                            continue
-            except:
-                pass
-            
-            # Цена
-            try:
-                price_elements = self.driver.find_elements(By.CSS_SELECTOR, "span.tsHeadline600Large")
-                for element in price_elements:
-                    try:
-                        text = element.text.strip()
-                        if text:
-                            numbers = re.findall(r'\d+', text)
-                            if numbers:
-                                product_data['price'] = ''.join(numbers)
-                                break
-                    except:
-                        continue
-                
-                if not product_data['price']:
-                    price_elements = self.driver.find_elements(By.XPATH, "//*[contains(., '₽')]")
-                    for element in price_elements:
-                        try:
-                            text = element.text.strip()
-                            if text and any(c.isdigit() for c in text):
-                                numbers = re.findall(r'\d+', text)
-                                if numbers:
-                                    product_data['price'] = ''.join(numbers)
-                                    break
-                        except:
-                            continue
-            except:
-                pass
+            if known:
+                product_data = self._extract_price_only(known)
+            else:
+                product_data = self._extract_product_data()
+            product_data['product_url'] = product_url
             
             self.products_data.append(product_data)
+            # Загруженным товар считается только после сохранения строки: после ошибки его можно повторить
+            self.product_index.fetched.add(key)
+            if product_data['price'] or (product_data['sku'] and not known):
+                self.parsed_keys.add(key)
             
             status_icons = ["✓" if product_data[key] else "✗" for key in ['sku', 'name', 'price']]
             print(f"  Результат: SKU{status_icons[0]} Назв{status_icons[1]} Цена{status_icons[2]}")
@@ -667,9 +1649,14 @@ class OzonSellerParser:
             
             self.human_like_pause(1.0, 2.0)
             
+            return product_data
+            
         except Exception as e:
             print(f"  Ошибка: {e}")
-            self.products_data.append({'sku': '', 'name': '', 'price': '', 'seller_url': self.current_seller_url})
+            self.products_data.append(dict(empty_row))
+            return None
+        finally:
+            self.tracer.end_product()
     
     def create_output_folder(self):
         """Создание папки для сохранения файлов"""
@@ -688,12 +1675,19 @@ class OzonSellerParser:
         filename = f"ozon_products_{timestamp}.xlsx"
         filepath = os.path.join(self.output_folder, filename)
         
-        df = pd.DataFrame(self.products_data, columns=['sku', 'name', 'price', 'seller_url'])
+        # Товар, найденный у нескольких продавцов, загружен один раз - указываем всех
+        for row in self.products_data:
+            sellers = self.product_index.sellers_for(row.get('product_url') or '')
+            if len(sellers) > 1:
+                row['seller_url'] = '; '.join(sellers)
+        
+        df = pd.DataFrame(self.products_data, columns=['sku', 'name', 'price', 'seller_url', 'product_url'])
         df = df.rename(columns={
             'sku': 'SKU',
             'name': 'Название',
             'price': 'Цена с соинвестом',
-            'seller_url': 'URL продавца'
+            'seller_url': 'URL продавца',
+            'product_url': 'URL товара'
         })
         
         try:
@@ -704,6 +1698,12 @@ class OzonSellerParser:
                 worksheet.column_dimensions['B'].width = 70
                 worksheet.column_dimensions['C'].width = 20
                 worksheet.column_dimensions['D'].width = 40
+                worksheet.column_dimensions['E'].width = 60
+                
+                if self.coverage:
+                    coverage_df = pd.DataFrame(list(self.coverage.items()), columns=['Показатель', 'Значение'])
+                    coverage_df.to_excel(writer, index=False, sheet_name='Покрытие')
+                    writer.sheets['Покрытие'].column_dimensions['A'].width = 30
             
             print(f"\n" + "="*60)
             print("РЕЗУЛЬТАТЫ СОХРАНЕНЫ")
@@ -724,102 +1724,730 @@ class OzonSellerParser:
         except Exception as e:
             print(f"Ошибка при сохранении: {e}")
     
-    def run(self):
-        """Основной метод запуска парсера"""
+    def parse_products(self, product_links):
+        """
+        Парсинг списка карточек товаров с выводом прогресса
+        
+        Args:
+            product_links: Список пар (URL товара, URL продавца)
+        """
+        start_time = time.time()
+        total_to_parse = len(product_links)
+        self.planned_products += total_to_parse
+        self.planned_weight += sum(self.product_priority(link) for link, _ in product_links)
+        
+        if self.settings['prefetch_tabs'] > 0:
+            self._parse_products_prefetched(product_links)
+            return
+        
+        for i, (link, seller_url) in enumerate(product_links, 1):
+            if self.budget_exhausted():
+                print(f"\n⏱ Бюджет времени исчерпан, не обработано товаров: {total_to_parse - i + 1}")
+                break
+            
+            self.maybe_recycle_driver()
+            self.current_seller_url = seller_url
+            print(f"\n[{i:3d}/{total_to_parse}] ", end="")
+            self.parse_product_page(link)
+            
+            if i % 10 == 0:
+                elapsed = time.time() - start_time
+                items_per_minute = i / (elapsed / 60)
+                print(f"\n  Прогресс: {i}/{total_to_parse} ({i/total_to_parse*100:.1f}%)")
+                print(f"  Скорость: {items_per_minute:.1f} товаров/мин")
+    
+    def _open_prefetch_tab(self, url):
+        """Открытие URL в фоновой вкладке без ожидания загрузки"""
+        before = set(self.driver.window_handles)
+        self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+        new_handles = set(self.driver.window_handles) - before
+        return new_handles.pop() if new_handles else None
+    
+    @traced('navigation')
+    def _activate_prefetched_tab(self, handle, url):
+        """Переход на вкладку, загружавшуюся в фоне, с проверкой загрузки и капчи"""
+        if not self._captcha_cleared():
+            return False
+        if handle is None:
+            return self.safe_get(url)
+        
+        self.driver.switch_to.window(handle)
+        self._count_page()
+        try:
+            WebDriverWait(self.driver, 20).until(
+                lambda d: d.execute_script("return document.readyState") == 'complete'
+            )
+        except:
+            print("Вкладка не загрузилась в фоне, загружаем заново...")
+            return self.safe_get(url)
+        self.page_metrics.collect(self.driver, url, self.current_seller_url)
+        
+        captchas_before = self.captcha_count
+        captcha_solved = self.check_and_solve_captcha(require_solution=True)
+        self.pacing.observe(captcha=self.captcha_count > captchas_before)
+        if not captcha_solved:
+            return False
+        if self.captcha_pending:
+            self._set_captcha_pending(False)
+        return True
+    
+    def _parse_products_prefetched(self, product_links):
+        """
+        Парсинг с предзагрузкой: следующие prefetch_tabs карточек грузятся
+        в фоновых вкладках, пока обрабатывается текущая
+        
+        Освободившаяся вкладка сразу получает следующий URL; после
+        PREFETCH_TAB_MAX_USES загрузок вкладка закрывается и открывается
+        новая, чтобы память браузера не росла. Когда нужен перезапуск
+        браузера, новые URL во вкладки не выдаются: открытые вкладки
+        дорабатываются, браузер перезапускается и предзагрузка продолжается
+        
+        При отложенной капче новые вкладки не открываются, оставшиеся URL
+        откладываются, а вкладка с капчей остаётся открытой до её решения
+        """
+        depth = self.settings['prefetch_tabs']
+        main_handle = self.driver.current_window_handle
+        queue = deque(pair for pair in product_links
+                      if product_key(pair[0]) not in self.product_index.fetched)
+        tabs = deque()
+        opened = set()
+        total_to_parse = len(queue)
+        start_time = time.time()
+        print(f"\nПредзагрузка: {depth} фоновых вкладок")
+        
+        def defer_rest():
+            rest = [(url, seller_url) for _, url, seller_url, _ in tabs] + list(queue)
+            tabs.clear()
+            queue.clear()
+            self.deferred_urls.update(rest)
+            print(f"\n⏸ Капча не решена, отложено товаров: {len(rest)} (всего отложено: {len(self.deferred_urls)})")
+        
+        def fill():
+            while queue and len(tabs) < depth:
+                url, seller_url = queue.popleft()
+                handle = self._open_prefetch_tab(url)
+                opened.add(handle)
+                tabs.append((handle, url, seller_url, 1))
+        
+        try:
+            if not self._captcha_cleared():
+                defer_rest()
+            fill()
+            
+            i = 0
+            while tabs:
+                if self.budget_exhausted():
+                    print(f"\n⏱ Бюджет времени исчерпан, не обработано товаров: {len(tabs) + len(queue)}")
+                    break
+                
+                handle, url, seller_url, uses = tabs.popleft()
+                i += 1
+                self.current_seller_url = seller_url
+                print(f"\n[{i:3d}/{total_to_parse}] ", end="")
+                self.parse_product_page(url, navigate=lambda u, h=handle: self._activate_prefetched_tab(h, u))
+                if self.captcha_pending:
+                    defer_rest()
+                    break
+                
+                # Освободившаяся вкладка загружает следующий URL, если не ждём перезапуска
+                refill = bool(queue) and self.recycle_reason() is None
+                if handle is not None:
+                    self.driver.switch_to.window(handle)
+                    if refill and uses < PREFETCH_TAB_MAX_USES:
+                        next_url, next_seller = queue.popleft()
+                        self.driver.execute_script("window.location.href = arguments[0];", next_url)
+                        tabs.append((handle, next_url, next_seller, uses + 1))
+                    else:
+                        self.driver.close()
+                        opened.discard(handle)
+                        self.driver.switch_to.window(main_handle)
+                if refill and len(tabs) < depth:
+                    next_url, next_seller = queue.popleft()
+                    self.driver.switch_to.window(main_handle)
+                    new_handle = self._open_prefetch_tab(next_url)
+                    opened.add(new_handle)
+                    tabs.append((new_handle, next_url, next_seller, 1))
+                
+                # Все вкладки закрыты - можно перезапустить браузер и набрать новую партию
+                if not tabs and queue:
+                    if self.maybe_recycle_driver():
+                        main_handle = self.driver.current_window_handle
+                        opened.clear()
+                    fill()
+                
+                if i % 10 == 0:
+                    elapsed = time.time() - start_time
+                    print(f"\n  Прогресс: {i}/{total_to_parse} ({i/total_to_parse*100:.1f}%)")
+                    print(f"  Скорость: {i / (elapsed / 60):.1f} товаров/мин")
+        finally:
+            # Закрываем только свои вкладки (в прогретом браузере могут быть чужие)
+            for handle in self.driver.window_handles:
+                if handle in opened:
+                    if self.captcha_pending and handle == self.captcha_handle:
+                        # Вкладка с капчей остаётся, её закроет _captcha_cleared после решения
+                        self.captcha_tab_owned = True
+                        continue
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+            self.driver.switch_to.window(main_handle)
+    
+    def enumerate_seller(self, seller_idx, seller_url):
+        """
+        Открытие страницы продавца и сбор ссылок на его товары
+        
+        Возвращает список новых (ещё не встречавшихся) URL товаров или None,
+        если страницу продавца не удалось открыть
+        """
+        print(f"\n" + "="*70)
+        print(f"ПРОДАВЕЦ {seller_idx}/{len(self.seller_urls)}")
+        print(f"URL: {seller_url}")
+        print("="*70)
+        
+        self.current_seller_url = seller_url
+        self.tracer.begin_seller(seller_url)
+        seller_name = seller_url.split('/')[-2] if seller_url.endswith('/') else seller_url.split('/')[-1]
+        
+        # Открываем страницу продавца с обработкой капчи
+        self.maybe_recycle_driver()
+        print(f"\nОткрываем страницу продавца...")
+        loaded = self.safe_get(seller_url)
+        if self.startup_time is not None and not self._startup_recorded:
+            self._startup_recorded = True
+            self.record_startup_stats(first_page_captcha=self.captcha_count > 0)
+        if not loaded:
+            if self.captcha_pending:
+                self.deferred_sellers.append((seller_idx, seller_url))
+                print(f"⏸ Продавец {seller_name} отложен до снятия капчи")
+                return None
+            print(f"⚠ Не удалось загрузить страницу продавца: {seller_name}")
+            return None
+        
+        # Принимаем куки (только для первого продавца)
+        if seller_idx == 1:
+            try:
+                cookie_selectors = [
+                    "//button[contains(., 'Принять')]",
+                    "//button[contains(., 'Согласен')]",
+                ]
+                
+                for selector in cookie_selectors:
+                    try:
+                        buttons = self.driver.find_elements(By.XPATH, selector)
+                        for button in buttons:
+                            if button.is_displayed():
+                                button.click()
+                                print("✓ Приняты куки")
+                                self.human_like_pause(1, 2)
+                                break
+                    except:
+                        continue
+            except:
+                pass
+        
+        # Каталог не изменился с прошлого запуска - товары берём из прошлой выгрузки
+        if self.settings['seller_fingerprint']:
+            sample_links = self.check_seller_unchanged(seller_url)
+            if sample_links is not None:
+                return sample_links
+        
+        # Загружаем товары
+        product_links = self.load_all_products_humanlike(seller_name)
+        
+        if not product_links:
+            print(f"\n⚠ Не найдено товаров у продавца: {seller_name}")
+            return []
+        
+        # Товары, уже встреченные у других продавцов, повторно не загружаем
+        found_count = len(product_links)
+        product_links = [link for link in product_links if self.product_index.add(link, seller_url)]
+        if len(product_links) < found_count:
+            print(f"\n  Уже загружены у других продавцов: {found_count - len(product_links)} "
+                  f"(продавец будет указан в выгрузке)")
+        return product_links
+    
+    def process_seller(self, seller_idx, seller_url):
+        """
+        Обработка одного продавца: сбор ссылок и парсинг карточек
+        
+        Возвращает False, если страницу продавца не удалось открыть
+        """
+        product_links = self.enumerate_seller(seller_idx, seller_url)
+        if product_links is None:
+            return False
+        if not product_links:
+            return True
+        
+        seller_name = seller_url.split('/')[-2] if seller_url.endswith('/') else seller_url.split('/')[-1]
+        print(f"\n" + "="*70)
+        print(f"НАЧИНАЕМ ПАРСИНГ {len(product_links)} ТОВАРОВ")
+        print("="*70)
+        
+        # Парсим каждый товар
+        self.parse_products([(link, seller_url) for link in product_links])
+        
+        print(f"\n✓ Продавец {seller_name} обработан")
+        print(f"✓ Товаров обработано: {len(product_links)}")
+        
+        # Если капча уже снята, сразу повторяем отложенное
+        self.retry_deferred()
+        return True
+    
+    def canary_sample(self):
+        """Первые canary_products товаров с первой страницы каждого продавца"""
+        sample_pages = []
+        for seller_url in self.seller_urls:
+            if not self.safe_get(seller_url) or not self.check_and_solve_captcha(require_solution=True):
+                print(f"⚠ Проверка селекторов: не удалось открыть продавца {seller_url}")
+                continue
+            links = {}
+            try:
+                for element in self.driver.find_elements(By.CSS_SELECTOR, "a[href*='/product/']"):
+                    href = element.get_attribute('href')
+                    if href:
+                        links.setdefault(product_key(href), href)
+                    if len(links) >= self.settings['canary_products']:
+                        break
+            except:
+                pass
+            sample_pages.extend((link, seller_url) for link in links.values())
+        return sample_pages
+    
+    def run_canary(self, sample_pages):
+        """
+        Проверка селекторов на нескольких карточках перед полным обходом
+        
+        Каждое поле извлекается отдельно основными и запасными селекторами.
+        Если основные перестали работать, а запасные справляются - дальше
+        используются только запасные. Возвращает False, если какое-то поле
+        не извлекается ничем (вёрстка Ozon изменилась)
+        """
+        print(f"\n" + "="*70)
+        print(f"ПРОВЕРКА СЕЛЕКТОРОВ: {len(sample_pages)} карточек")
+        print("="*70)
+        
+        stats = {field: {'primary': 0, 'fallback': 0} for field in PRODUCT_SELECTORS}
+        checked = 0
+        for product_url, seller_url in sample_pages:
+            self.current_seller_url = seller_url
+            if not self.safe_get(product_url) or not self.check_and_solve_captcha(require_solution=True):
+                continue
+            checked += 1
+            for field in PRODUCT_SELECTORS:
+                for level in ('primary', 'fallback'):
+                    if field_looks_valid(field, self._extract_field(field, [level]), product_url):
+                        stats[field][level] += 1
+        
+        if not checked:
+            print("✗ Не удалось открыть ни одной карточки для проверки")
+            return False
+        
+        min_rate = self.settings['canary_min_rate']
+        healthy = True
+        print(f"\n{'Поле':<8}{'Основные':>12}{'Запасные':>12}   Итог")
+        for field, counts in stats.items():
+            if counts['primary'] / checked >= min_rate:
+                verdict = "✓ OK"
+            elif counts['fallback'] / checked >= min_rate:
+                self.selector_levels[field] = ['fallback']
+                verdict = "⚠ ЗАПАСНЫЕ (основные селекторы устарели)"
+            else:
+                healthy = False
+                verdict = "✗ ОШИБКА"
+            print(f"{field:<8}{counts['primary']:>8}/{checked:<3}{counts['fallback']:>8}/{checked:<3}   {verdict}")
+        
+        print(f"\nПроверка селекторов: {'ПРОЙДЕНА' if healthy else 'НЕ ПРОЙДЕНА'}")
+        self.tracer.write_event({'type': 'canary', 'checked': checked, 'stats': stats, 'healthy': healthy})
+        return healthy
+    
+    def check_selectors(self):
+        """Отдельный запуск проверки селекторов без обхода"""
+        try:
+            self.setup_driver()
+            return self.run_canary(self.canary_sample())
+        finally:
+            self.close_driver()
+    
+    def find_previous_export(self):
+        """Самая свежая выгрузка парсера в папке результатов"""
+        if not os.path.exists(self.output_folder):
+            return None
+        files = [os.path.join(self.output_folder, f) for f in os.listdir(self.output_folder)
+                 if f.startswith('ozon_products_') and f.endswith('.xlsx')]
+        if not files:
+            return None
+        return max(files, key=os.path.getmtime)
+    
+    def load_previous_products(self, previous_file=None):
+        """
+        Чтение товаров из прошлой выгрузки для режима обновления цен
+        
+        Возвращает список URL товаров; артикул, название и продавцы
+        запоминаются в known_products
+        """
+        previous_file = previous_file or self.find_previous_export()
+        if not previous_file:
+            print(f"⚠ В папке {self.output_folder} нет прошлой выгрузки ozon_products_*.xlsx")
+            return []
+        
+        print(f"Прошлая выгрузка: {previous_file}")
+        df = pd.read_excel(previous_file, dtype=str).fillna('')
+        
+        product_urls = []
+        for _, row in df.iterrows():
+            sku = row.get('SKU', '').strip()
+            url = row.get('URL товара', '').strip()
+            if not url and sku.isdigit():
+                # В старых выгрузках нет URL товара; артикул Ozon совпадает с id товара в URL
+                url = f"https://www.ozon.ru/product/{sku}/"
+            if not url:
+                continue
+            
+            key = product_key(url)
+            if key in self.known_products:
+                continue
+            self.known_products[key] = {
+                'sku': sku,
+                'name': row.get('Название', ''),
+                'seller_url': row.get('URL продавца', ''),
+            }
+            product_urls.append(url)
+        
+        print(f"Товаров для обновления цен: {len(product_urls)}")
+        return product_urls
+    
+    def seller_fingerprint(self):
+        """
+        Отпечаток каталога по уже открытой странице продавца:
+        число товаров, id и цены товаров первой страницы
+        """
+        total = self.get_total_products_count()
+        try:
+            tiles = self.driver.execute_script(FIRST_PAGE_TILES_JS) or []
+        except:
+            tiles = []
+        
+        prices = {}
+        for href, price in tiles:
+            key = product_key(href)
+            if key not in prices or not prices[key]:
+                prices[key] = price
+        first_page = list(prices)
+        digest = hashlib.sha1(json.dumps([total, sorted(prices.items())]).encode('utf-8')).hexdigest()
+        return {
+            'total': total,
+            'first_page': first_page,
+            'hash': digest,
+            'checked': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+    
+    def load_fingerprints(self):
+        path = os.path.join(self.output_folder, FINGERPRINTS_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Не удалось прочитать {FINGERPRINTS_FILE}: {e}")
+            return {}
+    
+    def save_fingerprints(self):
+        """
+        Сохранение отпечатков после выгрузки
+        
+        Если обход прерван (бюджет времени, капча), товары изменившихся
+        продавцов могли попасть в выгрузку не полностью - для них отпечаток
+        не обновляется, и в следующий раз они будут обойдены полностью
+        """
+        if not self.new_fingerprints:
+            return
+        complete = not self.budget_exhausted() and not self.deferred_urls and not self.deferred_sellers
+        fingerprints = self.load_fingerprints()
+        for seller_url, fingerprint in self.new_fingerprints.items():
+            if fingerprint is None:
+                fingerprints.pop(seller_url, None)
+            elif complete or seller_url in self.unchanged_sellers:
+                fingerprints[seller_url] = fingerprint
+        
+        self.create_output_folder()
+        with open(os.path.join(self.output_folder, FINGERPRINTS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(fingerprints, f, ensure_ascii=False, indent=2)
+    
+    def previous_rows_for_seller(self, seller_url):
+        """
+        Строки прошлой выгрузки с товарами продавца
+        
+        None - если прошлой выгрузки нет или у продавца есть незаполненные строки
+        (такой каталог нужно обойти заново)
+        """
+        if self._previous_rows is None:
+            self._previous_rows = {}
+            previous_file = self.find_previous_export()
+            if previous_file:
+                df = pd.read_excel(previous_file, dtype=str).fillna('')
+                for _, row in df.iterrows():
+                    item = {
+                        'sku': row.get('SKU', '').strip(),
+                        'name': row.get('Название', ''),
+                        'price': row.get('Цена с соинвестом', ''),
+                        'product_url': row.get('URL товара', '').strip(),
+                    }
+                    for seller in row.get('URL продавца', '').split('; '):
+                        if seller:
+                            self._previous_rows.setdefault(seller, []).append(item)
+        
+        rows = self._previous_rows.get(seller_url)
+        if not rows or any(not row['product_url'] or not row['price'] for row in rows):
+            return None
+        return rows
+    
+    def check_seller_unchanged(self, seller_url):
+        """
+        Сравнение отпечатка каталога продавца с прошлым запуском
+        
+        Возвращает None, если каталог нужно обойти полностью. Иначе товары продавца
+        переносятся из прошлой выгрузки, а возвращается список URL для выборочной
+        проверки цен (пустой в режиме skip)
+        """
+        fingerprint = self.seller_fingerprint()
+        self.new_fingerprints[seller_url] = fingerprint
+        previous = self.load_fingerprints().get(seller_url)
+        if not fingerprint['first_page'] or not previous or previous.get('hash') != fingerprint['hash']:
+            if previous:
+                print(f"Каталог продавца изменился: товаров {previous.get('total')} -> {fingerprint['total']}")
+            return None
+        
+        rows = self.previous_rows_for_seller(seller_url)
+        if rows is None:
+            return None
+        
+        sample = []
+        if self.settings['seller_fingerprint'] == 'sample':
+            sample = random.sample(rows, min(self.settings['fingerprint_sample'], len(rows)))
+        
+        sample_links = []
+        carried = 0
+        for row in rows:
+            url = row['product_url']
+            key = product_key(url)
+            self.product_index.add(url, seller_url)
+            if key in self.product_index.fetched or key in self.known_products:
+                continue
+            if any(row is item for item in sample):
+                self.known_products[key] = {'sku': row['sku'], 'name': row['name'], 'seller_url': seller_url}
+                self.sample_expected[key] = (seller_url, row['price'])
+                sample_links.append(url)
+            else:
+                self.product_index.fetched.add(key)
+                self.products_data.append(dict(row, seller_url=seller_url))
+                carried += 1
+        
+        self.unchanged_sellers.append(seller_url)
+        print(f"✓ Каталог не изменился ({fingerprint['total']} товаров): перенесено из прошлой выгрузки "
+              f"{carried}, выборочная проверка цен: {len(sample_links)}")
+        return sample_links
+    
+    def verify_samples(self):
+        """Если выборочная проверка нашла новую цену, отпечаток продавца сбрасывается"""
+        for row in self.products_data:
+            expected = self.sample_expected.get(product_key(row.get('product_url') or ''))
+            if not expected or not row.get('price'):
+                continue
+            seller_url, old_price = expected
+            if row['price'] != old_price and self.new_fingerprints.get(seller_url):
+                print(f"⚠ Цена изменилась при неизменном каталоге ({old_price} -> {row['price']}), "
+                      f"продавец {seller_url} будет обойдён полностью в следующий раз")
+                self.new_fingerprints[seller_url] = None
+                self.unchanged_sellers.remove(seller_url)
+    
+    def load_priority_map(self):
+        """
+        Приоритет товаров по уже имеющимся данным: id товара (= SKU Ozon) -> вес
+        
+        analytics - выручка (столбец BR) из двух последних отчётов analytics_report,
+        unit - строки Unit-файла, вес - выручка из его столбца AH
+        """
+        source = self.settings['priority_source']
+        if not source:
+            return
+        
+        from script import BASE_DIR, find_latest_files, process_analytics_files
+        
+        if source == 'analytics':
+            analytics_files = find_latest_files(BASE_DIR / "analytics_report", count=2)
+            if not analytics_files:
+                print("⚠ Нет отчётов в analytics_report, приоритеты не используются")
+                return
+            for sku, total_ddr in process_analytics_files(analytics_files)['br'].items():
+                self.priority_map[sku] = _to_weight(total_ddr)
+        
+        elif source == 'unit':
+            from openpyxl import load_workbook
+            unit_file = find_latest_files(BASE_DIR / "unit_folder", '.xlsm') or \
+                find_latest_files(BASE_DIR / "unit_folder", '.xlsx')
+            if not unit_file:
+                print("⚠ Нет Unit-файла в unit_folder, приоритеты не используются")
+                return
+            wb = load_workbook(unit_file, read_only=True, data_only=True)
+            for row in wb.active.iter_rows(min_row=2, max_col=34, values_only=True):
+                sku = row[0] if row else None
+                if sku is None:
+                    continue
+                sku = str(int(sku)) if isinstance(sku, float) else str(sku).strip()
+                # Товары из Unit-файла важнее любых других, даже без выручки
+                self.priority_map[sku] = 1.0 + _to_weight(row[33] if len(row) > 33 else None)
+            wb.close()
+        
+        else:
+            print(f"⚠ Неизвестный источник приоритетов: {source}")
+            return
+        
+        print(f"Приоритеты товаров ({source}): {len(self.priority_map)} SKU")
+    
+    def product_priority(self, url):
+        return self.priority_map.get(canonical_product_id(url) or '', 0.0)
+    
+    def sort_by_priority(self, product_links):
+        """Пары (URL товара, URL продавца) по убыванию приоритета"""
+        return sorted(product_links, key=lambda pair: self.product_priority(pair[0]), reverse=True)
+    
+    def budget_exhausted(self):
+        return self.deadline is not None and time.time() >= self.deadline
+    
+    def _crawl_sellers(self):
+        """Обход продавцов: сбор ссылок и парсинг карточек"""
+        if not self.priority_map:
+            for seller_idx, seller_url in enumerate(self.seller_urls, 1):
+                if self.budget_exhausted():
+                    print(f"\n⏱ Бюджет времени исчерпан, не обработано продавцов: "
+                          f"{len(self.seller_urls) - seller_idx + 1}")
+                    break
+                self.process_seller(seller_idx, seller_url)
+            return
+        
+        # С приоритетами: сначала ссылки всех продавцов, затем карточки от важных к остальным
+        queue = []
+        for seller_idx, seller_url in enumerate(self.seller_urls, 1):
+            if self.budget_exhausted():
+                break
+            product_links = self.enumerate_seller(seller_idx, seller_url) or []
+            queue.extend((link, seller_url) for link in product_links)
+        
+        queue = self.sort_by_priority(queue)
+        print(f"\nОчередь товаров по приоритету: {len(queue)}, "
+              f"с известной выручкой: {sum(1 for url, _ in queue if self.product_priority(url) > 0)}")
+        self.parse_products(queue)
+    
+    def _refresh_prices(self, product_urls):
+        """Обход известных товаров без сбора ссылок у продавцов"""
+        queue = [(url, self.known_products[product_key(url)]['seller_url']) for url in product_urls]
+        if self.priority_map:
+            queue = self.sort_by_priority(queue)
+        self.parse_products(queue)
+    
+    def coverage_report(self):
+        """Покрытие обхода: сколько запланированных товаров и выручки обработано"""
+        # Строки с артикулом из прошлой выгрузки (неудачное обновление, перенос по отпечатку) не считаются
+        parsed = len(self.parsed_keys)
+        planned_weight = self.planned_weight
+        parsed_weight = sum(self.priority_map.get(key, 0) for key in self.parsed_keys)
+        
+        self.coverage = {
+            'Запланировано товаров': self.planned_products,
+            'Обработано товаров': parsed,
+            'Покрытие, %': round(parsed / self.planned_products * 100, 1) if self.planned_products else 0,
+            'Бюджет времени, мин': self.settings['time_budget_minutes'] or '-',
+            'Бюджет исчерпан': 'да' if self.budget_exhausted() else 'нет',
+        }
+        if self.priority_map:
+            self.coverage['Источник приоритетов'] = self.settings['priority_source']
+            self.coverage['Покрыто выручки, %'] = round(parsed_weight / planned_weight * 100, 1) if planned_weight else 0
+        
+        print("\nПОКРЫТИЕ:")
+        for key, value in self.coverage.items():
+            print(f"  {key}: {value}")
+    
+    def _run_session(self, title, description, crawl, canary_sample=None):
+        """Общий запуск: trace, браузер, проверка селекторов, обход, повтор отложенного, сохранение"""
         try:
             print("="*70)
-            print("ПАРСЕР OZON - С ОБЯЗАТЕЛЬНЫМ РЕШЕНИЕМ КАПЧИ")
+            print(title)
             print("="*70)
             print(f"Время начала: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Количество продавцов для обработки: {len(self.seller_urls)}")
+            print(description)
             print("="*70)
             
+            if self.trace:
+                self.create_output_folder()
+                trace_name = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+                self.tracer.open(os.path.join(self.output_folder, trace_name))
+            
+            self.load_priority_map()
+            if self.settings['time_budget_minutes'] > 0:
+                self.deadline = time.time() + self.settings['time_budget_minutes'] * 60
+                print(f"Бюджет времени: {self.settings['time_budget_minutes']} мин, "
+                      f"до {datetime.fromtimestamp(self.deadline).strftime('%H:%M')}")
+            
             # Настройка драйвера
             print("\nНастройка драйвера...")
             self.setup_driver()
             
-            # Обрабатываем каждого продавца
-            for seller_idx, seller_url in enumerate(self.seller_urls, 1):
-                print(f"\n" + "="*70)
-                print(f"ПРОДАВЕЦ {seller_idx}/{len(self.seller_urls)}")
-                print(f"URL: {seller_url}")
-                print("="*70)
-                
-                self.current_seller_url = seller_url
-                seller_name = seller_url.split('/')[-2] if seller_url.endswith('/') else seller_url.split('/')[-1]
-                
-                # Открываем страницу продавца с обработкой капчи
-                print(f"\nОткрываем страницу продавца...")
-                if not self.safe_get(seller_url):
-                    print(f"⚠ Не удалось загрузить страницу продавца: {seller_name}")
-                    continue
-                
-                # Принимаем куки (только для первого продавца)
-                if seller_idx == 1:
-                    try:
-                        cookie_selectors = [
-                            "//button[contains(., 'Принять')]",
-                            "//button[contains(., 'Согласен')]",
-                        ]
-                        
-                        for selector in cookie_selectors:
-                            try:
-                                buttons = self.driver.find_elements(By.XPATH, selector)
-                                for button in buttons:
-                                    if button.is_displayed():
-                                        button.click()
-                                        print("✓ Приняты куки")
-                                        self.human_like_pause(1, 2)
-                                        break
-                            except:
-                                continue
-                    except:
-                        pass
-                
-                # Загружаем товары
-                product_links = self.load_all_products_humanlike(seller_name)
-                
-                if not product_links:
-                    print(f"\n⚠ Не найдено товаров у продавца: {seller_name}")
-                    continue
-                
-                print(f"\n" + "="*70)
-                print(f"НАЧИНАЕМ ПАРСИНГ {len(product_links)} ТОВАРОВ")
-                print("="*70)
-                
-                # Парсим каждый товар
-                start_time = time.time()
-                total_to_parse = len(product_links)
-                
-                for i, link in enumerate(product_links, 1):
-                    print(f"\n[{i:3d}/{total_to_parse}] ", end="")
-                    self.parse_product_page(link)
-                    
-                    if i % 10 == 0:
-                        elapsed = time.time() - start_time
-                        items_per_minute = i / (elapsed / 60)
-                        print(f"\n  Прогресс: {i}/{total_to_parse} ({i/total_to_parse*100:.1f}%)")
-                        print(f"  Скорость: {items_per_minute:.1f} товаров/мин")
-                
-                print(f"\n✓ Продавец {seller_name} обработан")
-                print(f"✓ Товаров обработано: {total_to_parse}")
+            if self.settings['canary_products'] > 0 and canary_sample:
+                if not self.run_canary(canary_sample()) and self.settings['canary_abort']:
+                    print("\n✗ Обход остановлен: селекторы не извлекают данные с карточек")
+                    return
+            
+            crawl()
+            
+            # Отложенные из-за капчи URL: ждём снятия капчи и повторяем
+            self.retry_deferred(wait=not self.budget_exhausted())
+            
+            self.coverage_report()
             
             print(f"\n" + "="*70)
-            print("ВСЕ ПРОДАВЦЫ ОБРАБОТАНЫ!")
+            print("ОБХОД ЗАВЕРШЁН!")
             print(f"Время окончания: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             print("="*70)
             
             # Сохраняем результаты
+            self.verify_samples()
             self.save_to_excel()
+            self.save_fingerprints()
             
         except Exception as e:
             print(f"\nКРИТИЧЕСКАЯ ОШИБКА: {e}")
             import traceback
             traceback.print_exc()
         finally:
-            if self.driver:
-                self.driver.quit()
-                print("\n✓ Браузер закрыт")
+            self.pacing.report()
+            self.page_metrics.report()
+            self.report_browser_memory()
+            self.tracer.close()
+            self.close_driver()
+    
+    def run(self):
+        """Основной метод запуска парсера"""
+        self._run_session("ПАРСЕР OZON - С ОБЯЗАТЕЛЬНЫМ РЕШЕНИЕМ КАПЧИ",
+                          f"Количество продавцов для обработки: {len(self.seller_urls)}",
+                          self._crawl_sellers, self.canary_sample)
+    
+    def run_refresh(self, previous_file=None):
+        """
+        Обновление только цен для товаров из прошлой выгрузки
+        
+        Каталоги продавцов не перебираются; результат сохраняется
+        в том же формате, что и полный обход
+        """
+        product_urls = self.load_previous_products(previous_file)
+        if not product_urls:
+            return
+        canary_urls = random.sample(product_urls, min(len(product_urls), self.settings['canary_products']))
+        
+        self._run_session("ПАРСЕР OZON - ОБНОВЛЕНИЕ ЦЕН ИЗВЕСТНЫХ ТОВАРОВ",
+                          f"Товаров для обновления: {len(product_urls)}",
+                          lambda: self._refresh_prices(product_urls),
+                          lambda: [(url, self.known_products[product_key(url)]['seller_url'])
+                                   for url in canary_urls])
 
 
 def create_example_config():
@@ -846,24 +2474,161 @@ https://www.ozon.ru/seller/energy-strong-172995/
     return False
 
 
+SETTINGS_FILE = 'parser_settings.txt'
+
+# Значения по умолчанию; тип значения задаёт тип параметра в файле настроек
+DEFAULT_SETTINGS = {
+    # sequential - продавцы и товары по очереди в одном браузере
+    # scheduled - асинхронный планировщик с очередью URL (crawl_scheduler.py)
+    # refresh - только цены товаров из прошлой выгрузки, без обхода каталогов продавцов
+    # canary - только проверка селекторов на нескольких карточках каждого продавца
+    # coordinator / worker / merge - распределённый обход через общую очередь (distributed.py):
+    #   координатор собирает ссылки продавцов, воркеры парсят карточки, merge собирает выгрузку
+    'mode': 'sequential',
+    'browser_workers': 2,
+    'politeness_delay': 3.0,
+    'max_attempts': 3,
+    # Папка постоянного профиля Chrome (пусто - временный профиль)
+    'chrome_profile_dir': '',
+    # Держать Chrome запущенным между запусками и подключаться к нему по отладочному порту
+    'warm_browser': False,
+    'debugger_port': 9222,
+    'chrome_binary': '',
+    # Капча: wait - остановиться и ждать решения (Enter в консоли),
+    # defer - отложить URL, продолжить обход и повторить после снятия капчи
+    'captcha_mode': 'wait',
+    'captcha_retry_interval': 60,
+    'captcha_max_wait': 3600,
+    # Адаптивный темп: паузы растут при капче/ошибках/медленных страницах и сокращаются, когда всё чисто
+    'adaptive_pacing': False,
+    # Порядок обхода по важности товаров: '' - как на странице продавца,
+    # analytics - по выручке из analytics_report, unit - сначала товары Unit-файла
+    'priority_source': '',
+    # Ограничение времени обхода в минутах (0 - без ограничения); по истечении сохраняется то, что собрано
+    'time_budget_minutes': 0,
+    # Сколько следующих карточек грузить в фоновых вкладках, пока обрабатывается текущая (0 - выкл.)
+    'prefetch_tabs': 0,
+    # Перезапуск Chrome для ограничения памяти: после N страниц и/или при RSS выше порога, МБ (0 - выкл.)
+    'recycle_after_pages': 0,
+    'recycle_rss_mb': 0,
+    # Отпечаток каталога продавца (число товаров, id и цены первой страницы). Если он совпал с прошлым
+    # запуском: skip - товары продавца берутся из прошлой выгрузки, sample - то же, но цены
+    # fingerprint_sample случайных товаров проверяются заново; '' - всегда полный обход
+    'seller_fingerprint': '',
+    'fingerprint_sample': 5,
+    # Проверка селекторов перед обходом на canary_products карточках каждого продавца (0 - выкл.):
+    # поле считается рабочим, если извлекается не реже canary_min_rate; canary_abort - остановить
+    # обход, если поле не извлекается ни основными, ни запасными селекторами
+    'canary_products': 0,
+    'canary_min_rate': 0.8,
+    'canary_abort': True,
+    # Метрики загрузки каждой страницы (TTFB, DOMContentLoaded, load, байты, запросы) в итогах и trace
+    'page_metrics': False,
+    # Очередь распределённого обхода: sqlite - файл (пусто - в папке результатов), redis - сервер redis_url
+    'queue_backend': 'sqlite',
+    'queue_path': '',
+    'redis_url': 'redis://127.0.0.1:6379/0',
+}
+
+
+def load_parser_settings(settings_file=SETTINGS_FILE):
+    """
+    Чтение настроек парсера из файла вида "ключ = значение"
+    
+    Отсутствующие ключи берутся из DEFAULT_SETTINGS
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    
+    if not os.path.exists(settings_file):
+        return settings
+    
+    with open(settings_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = [part.strip() for part in line.split('=', 1)]
+            if key not in DEFAULT_SETTINGS:
+                print(f"⚠ Неизвестный параметр в {settings_file}: {key}")
+                continue
+            
+            default = DEFAULT_SETTINGS[key]
+            try:
+                if isinstance(default, bool):
+                    settings[key] = value.lower() in ('1', 'true', 'yes', 'да', 'on')
+                elif isinstance(default, int):
+                    settings[key] = int(value)
+                elif isinstance(default, float):
+                    settings[key] = float(value)
+                else:
+                    settings[key] = value
+            except ValueError:
+                print(f"⚠ Некорректное значение параметра {key}: {value}")
+    
+    return settings
+
+
+def create_example_settings():
+    """Создание файла настроек со значениями по умолчанию"""
+    if os.path.exists(SETTINGS_FILE):
+        return False
+    
+    lines = [
+        "# Настройки парсера Ozon",
+        "# Формат: ключ = значение. Закомментированные строки - значения по умолчанию",
+        "",
+    ]
+    for key, value in DEFAULT_SETTINGS.items():
+        if isinstance(value, bool):
+            value = int(value)
+        lines.append(f"# {key} = {value}")
+    
+    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"Создан файл настроек: {SETTINGS_FILE}")
+    return True
+
+
 def main():
     """Основная функция запуска парсера"""
     print("="*70)
     print("ПАРСЕР OZON - АВТОМАТИЧЕСКИЙ ЗАПУСК С КАПЧЕЙ")
     print("="*70)
     
-    # Проверяем наличие конфигурационного файла
-    config_file = 'sellers_list.txt'
-    
-    if not os.path.exists(config_file):
-        print(f"Конфигурационный файл '{config_file}' не найден.")
-        create_example_config()
-        return
-    
-    # Читаем файл
-    print(f"Чтение конфигурационного файла: {config_file}")
+    create_example_settings()
+    settings = load_parser_settings()
     
     try:
+        if settings['mode'] == 'refresh':
+            # Список продавцов не нужен: товары берутся из прошлой выгрузки
+            confirm = input("\nОбновить цены товаров из прошлой выгрузки? (y/n): ").strip().lower()
+            if confirm != 'y':
+                print("Парсинг отменен.")
+                return
+            parser = OzonSellerParser(None, output_folder='prices_with_co-investment', settings=settings)
+            parser.run_refresh()
+            return
+        
+        if settings['mode'] in ('worker', 'merge'):
+            # Воркеру и сборке нужна только общая очередь
+            import distributed
+            if settings['mode'] == 'worker':
+                distributed.run_worker(settings, output_folder='prices_with_co-investment')
+            else:
+                distributed.merge_results(settings, output_folder='prices_with_co-investment')
+            return
+        
+        # Проверяем наличие конфигурационного файла
+        config_file = 'sellers_list.txt'
+        
+        if not os.path.exists(config_file):
+            print(f"Конфигурационный файл '{config_file}' не найден.")
+            create_example_config()
+            return
+        
+        # Читаем файл
+        print(f"Чтение конфигурационного файла: {config_file}")
+        
         with open(config_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
@@ -896,8 +2661,21 @@ def main():
             return
         
         # Запускаем парсер
-        parser = OzonSellerParser(config_file, output_folder='prices_with_co-investment')
-        parser.run()
+        if settings['mode'] == 'scheduled':
+            from crawl_scheduler import run_scheduled
+            run_scheduled(config_file, settings, output_folder='prices_with_co-investment')
+        elif settings['mode'] == 'canary':
+            if settings['canary_products'] <= 0:
+                settings['canary_products'] = 3
+            parser = OzonSellerParser(config_file, output_folder='prices_with_co-investment', trace=False,
+                                      settings=settings)
+            parser.check_selectors()
+        elif settings['mode'] == 'coordinator':
+            from distributed import run_coordinator
+            run_coordinator(config_file, settings, output_folder='prices_with_co-investment')
+        else:
+            parser = OzonSellerParser(config_file, output_folder='prices_with_co-investment', settings=settings)
+            parser.run()
         
     except Exception as e:
         print(f"Ошибка при запуске парсера: {e}")
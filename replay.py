@@ -0,0 +1,575 @@
+"""
+Офлайн-стенд для парсера продавцов Ozon
+
+record - запись страниц продавцов и товаров (HTML + картинки и стили)
+serve  - локальный сервер, отдающий записанные страницы и капчу
+bench  - прогон парсера по локальному серверу: страниц/сек,
+         обращений к WebDriver на страницу и точность извлечения
+
+Эталон для точности не берётся из парсера: артикул - это id товара в URL,
+название и цена - из проверенной вручную таблицы (record --labels) в формате
+выгрузки парсера. Поля без эталона в точности не учитываются.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urljoin, urlsplit
+
+import pandas as pd
+
+from parser import OzonSellerParser, canonical_product_id, traced
+
+REPLAY_DIR = 'replay_data'
+MANIFEST_FILE = 'manifest.json'
+OZON_ORIGIN = 'https://www.ozon.ru'
+
+# Страница капчи в том виде, в котором её распознаёт check_and_solve_captcha
+CAPTCHA_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Antibot Captcha</title></head>
+<body>
+<div id="captcha-container" class="captcha-container">
+  <div id="captcha">
+    <div class="title">Подтвердите, что вы не бот</div>
+    <div id="slider-background"></div>
+    <p>Передвиньте ползунок, чтобы пазл попал в контур</p>
+  </div>
+</div>
+<input type="hidden" id="captcha-input" value="">
+</body>
+</html>
+"""
+
+ASSET_EXTENSIONS = ('.css', '.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg', '.woff', '.woff2')
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+}
+
+
+def page_key(url):
+    """Ключ страницы в манифесте: хост + путь без параметров"""
+    parts = urlsplit(url)
+    path = parts.path if parts.path.endswith('/') else parts.path + '/'
+    return f"/{parts.netloc}{path}"
+
+
+def replay_url(url, base_url):
+    """URL записанной страницы на локальном сервере"""
+    return base_url.rstrip('/') + page_key(url)
+
+
+def load_manifest(replay_dir=REPLAY_DIR):
+    manifest_path = os.path.join(replay_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {'pages': {}, 'captcha': []}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, replay_dir=REPLAY_DIR):
+    with open(os.path.join(replay_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+# Столбцы выгрузки парсера (save_to_excel) -> поля эталона
+LABEL_COLUMNS = {'SKU': 'sku', 'Название': 'name', 'Цена с соинвестом': 'price'}
+
+
+def load_labels(labels_file):
+    """
+    Эталонные значения из проверенной вручную таблицы в формате выгрузки
+    парсера (.xlsx или .csv): id товара -> {поле: значение}. Пустые ячейки
+    не считаются эталоном
+    """
+    if labels_file.lower().endswith('.csv'):
+        df = pd.read_csv(labels_file, dtype=str, sep=None, engine='python').fillna('')
+    else:
+        df = pd.read_excel(labels_file, dtype=str).fillna('')
+
+    labels = {}
+    for _, row in df.iterrows():
+        sku = row.get('SKU', '').strip()
+        product_id = canonical_product_id(row.get('URL товара', '').strip()) or (sku if sku.isdigit() else None)
+        if not product_id:
+            continue
+        labels[product_id] = {field: row[column].strip() for column, field in LABEL_COLUMNS.items()
+                              if column in row and row[column].strip()}
+    return labels
+
+
+def product_expected(url, labels=None):
+    """Эталон карточки: из разметки, а артикул без разметки - id товара в URL (у Ozon они совпадают)"""
+    product_id = canonical_product_id(url)
+    expected = {'sku': product_id} if product_id else {}
+    if labels and product_id in labels:
+        expected.update(labels[product_id])
+    return expected
+
+
+# ============================================
+# Запись страниц
+# ============================================
+
+class PageRecorder:
+    """
+    Сохранение отрисованных страниц из живого браузера парсера
+
+    labels - эталон из load_labels. Страницы, на которых при записи была
+    капча, и каждая captcha_every-я карточка (0 - нет) попадают в
+    manifest['captcha']: сервер отдаст на них капчу при первом запросе
+    """
+
+    def __init__(self, parser, replay_dir=REPLAY_DIR, labels=None, captcha_every=0):
+        self.parser = parser
+        self.replay_dir = replay_dir
+        self.labels = labels or {}
+        self.captcha_every = captcha_every
+        self.pages_dir = os.path.join(replay_dir, 'pages')
+        self.assets_dir = os.path.join(replay_dir, 'assets')
+        os.makedirs(self.pages_dir, exist_ok=True)
+        os.makedirs(self.assets_dir, exist_ok=True)
+        self.manifest = load_manifest(replay_dir)
+        self.manifest['expected_source'] = 'labels' if self.labels else 'url'
+        self._session = None
+
+    def _http_session(self):
+        """HTTP-сессия с куками браузера для скачивания ресурсов"""
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers['User-Agent'] = self.parser.driver.execute_script("return navigator.userAgent")
+        for cookie in self.parser.driver.get_cookies():
+            self._session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'))
+        return self._session
+
+    def _save_asset(self, asset_url):
+        """Скачивание ресурса, возвращает локальный путь для подстановки в HTML"""
+        name = hashlib.sha1(asset_url.encode('utf-8')).hexdigest()
+        ext = os.path.splitext(urlsplit(asset_url).path)[1].lower()
+        if ext not in ASSET_EXTENSIONS:
+            ext = ''
+        filename = name + ext
+        path = os.path.join(self.assets_dir, filename)
+
+        if not os.path.exists(path):
+            try:
+                response = self._http_session().get(asset_url, timeout=15)
+                if response.status_code != 200:
+                    return None
+                with open(path, 'wb') as f:
+                    f.write(response.content)
+            except Exception as e:
+                print(f"  ⚠ Не удалось скачать {asset_url[:80]}: {e}")
+                return None
+
+        return f"/assets/{filename}"
+
+    def _localize_assets(self, html, page_url):
+        """Скрипты удаляются (DOM уже отрисован), картинки и стили сохраняются локально"""
+        html = re.sub(r'<script\b[^>]*>.*?</script>', '', html, flags=re.S | re.I)
+        html = re.sub(r'<script\b[^>]*/>', '', html, flags=re.I)
+
+        def replace(match):
+            attr, quote, value = match.group(1), match.group(2), match.group(3)
+            asset_url = urljoin(page_url, value)
+            if not asset_url.startswith('http'):
+                return match.group(0)
+            local = self._save_asset(asset_url)
+            if not local:
+                return match.group(0)
+            return f'{attr}={quote}{local}{quote}'
+
+        html = re.sub(r'(<img\b[^>]*?\bsrc)=(["\'])([^"\']+)\2', replace, html, flags=re.I)
+        html = re.sub(r'(<link\b[^>]*?rel=["\']stylesheet["\'][^>]*?\bhref)=(["\'])([^"\']+)\2',
+                      replace, html, flags=re.I)
+        return html
+
+    def save_page(self, url, page_type, seller_url=None, expected=None, captcha=False):
+        """Сохранение текущей страницы браузера; captcha - отдавать на ней капчу при прогоне"""
+        key = page_key(url)
+        filename = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.html'
+        html = self._localize_assets(self.parser.driver.page_source, url)
+
+        with open(os.path.join(self.pages_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(html)
+
+        self.manifest['pages'][key] = {
+            'url': url,
+            'type': page_type,
+            'file': f"pages/{filename}",
+            'seller': seller_url,
+            'expected': expected,
+            'recorded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        captcha_pages = self.manifest.setdefault('captcha', [])
+        if captcha and key not in captcha_pages:
+            captcha_pages.append(key)
+        save_manifest(self.manifest, self.replay_dir)
+
+    def record_seller(self, seller_url, max_products=20):
+        """Запись страницы продавца и первых max_products карточек товаров"""
+        parser = self.parser
+        parser.current_seller_url = seller_url
+
+        captchas_before = parser.captcha_count
+        if not parser.safe_get(seller_url):
+            print(f"⚠ Не удалось загрузить страницу продавца: {seller_url}")
+            return 0
+
+        seller_name = seller_url.rstrip('/').split('/')[-1]
+        product_links = parser.load_all_products_humanlike(seller_name)
+        self.save_page(seller_url, 'seller', seller_url, expected={'products': sorted(product_links)},
+                       captcha=parser.captcha_count > captchas_before)
+
+        recorded = 0
+        for link in sorted(product_links)[:max_products]:
+            captchas_before = parser.captcha_count
+            if not parser.safe_get(link):
+                continue
+            captcha = parser.captcha_count > captchas_before or \
+                bool(self.captcha_every and (recorded + 1) % self.captcha_every == 0)
+            self.save_page(link, 'product', seller_url, expected=product_expected(link, self.labels), captcha=captcha)
+            recorded += 1
+            print(f"  ✓ Записано: {link[:70]} ({recorded}/{min(max_products, len(product_links))})")
+            parser.human_like_pause(1.0, 2.0)
+
+        return recorded
+
+
+def record(sellers_file, replay_dir=REPLAY_DIR, max_products=20, labels_file=None, captcha_every=0):
+    """Запись страниц всех продавцов из файла"""
+    labels = load_labels(labels_file) if labels_file else {}
+    if labels_file:
+        print(f"Эталон: {len(labels)} товаров из {labels_file}")
+    else:
+        print("Эталон: только артикулы из URL (название и цену можно задать через --labels)")
+    parser = OzonSellerParser(sellers_file, output_folder=replay_dir, trace=False)
+    try:
+        parser.setup_driver()
+        recorder = PageRecorder(parser, replay_dir, labels=labels, captcha_every=captcha_every)
+        for seller_url in parser.seller_urls:
+            count = recorder.record_seller(seller_url, max_products=max_products)
+            print(f"✓ Продавец {seller_url}: записано товаров {count}")
+        print(f"\n✓ Записи сохранены в {replay_dir}")
+    finally:
+        if parser.driver:
+            parser.driver.quit()
+
+
+# ============================================
+# Локальный сервер
+# ============================================
+
+class ReplayServer:
+    """
+    Статический сервер записанных страниц
+
+    Страница https://www.ozon.ru/product/x/ отдаётся по адресу
+    http://127.0.0.1:<port>/www.ozon.ru/product/x/, ссылки в HTML переписываются
+    на локальный адрес. Пути из manifest['captcha'] при первом запросе
+    отдают страницу капчи, при повторном - записанную страницу.
+    """
+
+    def __init__(self, replay_dir=REPLAY_DIR, host='127.0.0.1', port=0):
+        self.replay_dir = replay_dir
+        self.manifest = load_manifest(replay_dir)
+        self.captcha_pending = set(self.manifest.get('captcha', []))
+        self.captcha_served = 0
+        self.requests_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _rewrite_links(self, html):
+        local_origin = self.base_url + '/www.ozon.ru'
+        html = html.replace(OZON_ORIGIN, local_origin)
+        html = re.sub(r'href=(["\'])/(product|seller)/', rf'href=\1{local_origin}/\2/', html)
+        return html
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type='text/html; charset=utf-8'):
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests_count += 1
+                path = urlsplit(self.path).path
+
+                if path.startswith('/assets/'):
+                    asset_path = os.path.join(server.replay_dir, 'assets', os.path.basename(path))
+                    if not os.path.exists(asset_path):
+                        self._send(404, 'not found')
+                        return
+                    ext = os.path.splitext(asset_path)[1].lower()
+                    with open(asset_path, 'rb') as f:
+                        self._send(200, f.read(), CONTENT_TYPES.get(ext, 'application/octet-stream'))
+                    return
+
+                key = path if path.endswith('/') else path + '/'
+                with server._lock:
+                    if key in server.captcha_pending:
+                        server.captcha_pending.discard(key)
+                        server.captcha_served += 1
+                        self._send(200, CAPTCHA_PAGE)
+                        return
+
+                page = server.manifest['pages'].get(key)
+                if not page:
+                    self._send(404, '<html><head><title>404</title></head><body>Страница не записана</body></html>')
+                    return
+
+                with open(os.path.join(server.replay_dir, page['file']), 'r', encoding='utf-8') as f:
+                    html = f.read()
+                self._send(200, server._rewrite_links(html))
+
+        return Handler
+
+    def start(self):
+        """Запуск в фоновом потоке"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Работа в текущем потоке до Ctrl+C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ============================================
+# Бенчмарк
+# ============================================
+
+class ReplayParser(OzonSellerParser):
+    """
+    Парсер для прогона по локальному серверу: без пауз, капча
+    "решается" повторной загрузкой, считаются обращения к WebDriver
+    """
+
+    def __init__(self, seller_urls, output_folder, headless=True):
+        super().__init__(seller_urls, output_folder=output_folder, trace=False)
+        self.headless = headless
+        self.webdriver_calls = 0
+        self.captchas_seen = 0
+
+    def _build_chrome_options(self):
+        options = super()._build_chrome_options()
+        if self.headless:
+            options.add_argument('--headless=new')
+        return options
+
+    def setup_driver(self):
+        super().setup_driver()
+        execute = self.driver.execute
+
+        def counting_execute(driver_command, params=None):
+            self.webdriver_calls += 1
+            return execute(driver_command, params)
+
+        self.driver.execute = counting_execute
+
+    @traced('pause')
+    def human_like_pause(self, min_time=0.5, max_time=2.0):
+        pass
+
+    @traced('pause')
+    def human_like_scroll(self, scroll_distance=None, scroll_duration=1.0):
+        if scroll_distance is None:
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        else:
+            self.driver.execute_script(f"window.scrollBy(0, {scroll_distance});")
+
+    def _handle_captcha_page(self, require_solution):
+        self.captchas_seen += 1
+        self.driver.refresh()
+        return True
+
+
+def run_benchmark(replay_dir=REPLAY_DIR, headless=True):
+    """Прогон парсера по записанным страницам с отчётом о скорости и точности"""
+    manifest = load_manifest(replay_dir)
+    sellers = {k: v for k, v in manifest['pages'].items() if v['type'] == 'seller'}
+    products = {k: v for k, v in manifest['pages'].items() if v['type'] == 'product'}
+    if not sellers:
+        print(f"❌ В {replay_dir} нет записанных продавцов. Сначала выполните: python replay.py record")
+        return None
+    if 'expected_source' not in manifest:
+        print("⚠ Запись сделана старой версией: эталон в ней извлечён самим парсером, "
+              "точность не показательна. Перезапишите страницы: python replay.py record")
+
+    server = ReplayServer(replay_dir).start()
+    base_url = server.base_url
+    parser = ReplayParser([replay_url(p['url'], base_url) for p in sellers.values()],
+                          output_folder=os.path.join(replay_dir, 'bench_output'), headless=headless)
+
+    report = {
+        'started': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'sellers': len(sellers),
+        'products': len(products),
+        'captcha_expected': len(manifest.get('captcha', [])),
+        'expected_source': manifest.get('expected_source', 'parser'),
+    }
+    fields = ['sku', 'name', 'price']
+    correct = {field: 0 for field in fields}
+    # Карточки, для которых у поля есть эталон
+    labelled = {field: 0 for field in fields}
+    seller_calls = []
+    product_calls = []
+    enumeration_found = 0
+    enumeration_expected = 0
+
+    try:
+        parser.setup_driver()
+        started = time.time()
+
+        for seller_key, seller in sellers.items():
+            parser.current_seller_url = replay_url(seller['url'], base_url)
+
+            calls_before = parser.webdriver_calls
+            parser.safe_get(parser.current_seller_url)
+            found = parser.load_all_products_humanlike(seller_key)
+            seller_calls.append(parser.webdriver_calls - calls_before)
+
+            expected_ids = {canonical_product_id(u) for u in (seller.get('expected') or {}).get('products', [])} - {None}
+            found_ids = {canonical_product_id(u) for u in found or []}
+            enumeration_expected += len(expected_ids)
+            enumeration_found += len(expected_ids & found_ids)
+
+            for product_key, product in products.items():
+                if product.get('seller') != seller['url']:
+                    continue
+                calls_before = parser.webdriver_calls
+                result = parser.parse_product_page(replay_url(product['url'], base_url))
+                product_calls.append(parser.webdriver_calls - calls_before)
+
+                expected = product.get('expected') or {}
+                for field in fields:
+                    if field not in expected:
+                        continue
+                    labelled[field] += 1
+                    # None - карточку не удалось обработать, промах
+                    if result is not None and str(result.get(field, '')) == str(expected[field]):
+                        correct[field] += 1
+
+        elapsed = time.time() - started
+    finally:
+        if parser.driver:
+            parser.driver.quit()
+        server.stop()
+
+    pages = len(seller_calls) + len(product_calls)
+    report.update({
+        'elapsed_sec': round(elapsed, 2),
+        'pages_per_sec': round(pages / elapsed, 3) if elapsed > 0 else None,
+        'webdriver_calls_per_seller_page': round(sum(seller_calls) / len(seller_calls), 1) if seller_calls else None,
+        'webdriver_calls_per_product_page': round(sum(product_calls) / len(product_calls), 1) if product_calls else None,
+        'accuracy': {field: round(correct[field] / labelled[field], 3) if labelled[field] else None
+                     for field in fields},
+        'labelled': labelled,
+        'enumeration_recall': round(enumeration_found / enumeration_expected, 3) if enumeration_expected else None,
+        'captcha_served': server.captcha_served,
+        'captcha_detected': parser.captchas_seen,
+    })
+
+    print("\n" + "=" * 60)
+    print("РЕЗУЛЬТАТЫ БЕНЧМАРКА")
+    print("=" * 60)
+    print(f"Страниц: {pages} за {report['elapsed_sec']} с ({report['pages_per_sec']} стр/с)")
+    print(f"Обращений к WebDriver: продавец {report['webdriver_calls_per_seller_page']}, "
+          f"товар {report['webdriver_calls_per_product_page']} на страницу")
+    for field in fields:
+        value = report['accuracy'][field]
+        print(f"Точность {field}: {value * 100:.1f}% ({labelled[field]} с эталоном)" if value is not None
+              else f"Точность {field}: - (нет эталона)")
+    if report['enumeration_recall'] is not None:
+        print(f"Полнота сбора ссылок: {report['enumeration_recall'] * 100:.1f}%")
+    print(f"Капча: отдано {report['captcha_served']}, обнаружено {report['captcha_detected']}")
+
+    report_path = os.path.join(replay_dir, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчёт: {report_path}")
+
+    return report
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Офлайн-стенд парсера Ozon")
+    arg_parser.add_argument('--dir', default=REPLAY_DIR, help="Папка с записями")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    record_cmd = commands.add_parser('record', help="Записать страницы продавцов")
+    record_cmd.add_argument('sellers', nargs='?', default='sellers_list.txt')
+    record_cmd.add_argument('--products', type=int, default=20, help="Товаров на продавца")
+    record_cmd.add_argument('--labels', help="Проверенная таблица в формате выгрузки парсера (.xlsx/.csv) - эталон")
+    record_cmd.add_argument('--captcha-every', type=int, default=0,
+                            help="Отдавать капчу на каждой N-й карточке при прогоне (0 - только где была при записи)")
+
+    serve_cmd = commands.add_parser('serve', help="Запустить локальный сервер")
+    serve_cmd.add_argument('--port', type=int, default=8765)
+
+    bench_cmd = commands.add_parser('bench', help="Прогон парсера по записям")
+    bench_cmd.add_argument('--show-browser', action='store_true')
+
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'record':
+        record(args.sellers, args.dir, max_products=args.products,
+               labels_file=args.labels, captcha_every=args.captcha_every)
+    elif args.command == 'serve':
+        server = ReplayServer(args.dir, port=args.port)
+        print(f"Сервер записей: {server.base_url}/www.ozon.ru/...")
+        for key, page in server.manifest['pages'].items():
+            if page['type'] == 'seller':
+                print(f"  {server.base_url}{key}")
+        server.serve_forever()
+    elif args.command == 'bench':
+        report = run_benchmark(args.dir, headless=not args.show_browser)
+        if report is None:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
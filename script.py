@@ -1,11 +1,30 @@
 import os
+import re
+import json
+import pickle
+import hashlib
+from numbers import Number
+import numpy as np
 import pandas as pd
 import warnings
 from pathlib import Path
 import sys
+import time
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from xlsm_patch import patch_workbook, PatchNotSupported
+from pandas.io.parsers import TextParser
 from datetime import datetime
 
+try:
+    # Быстрый движок чтения xlsx для pandas
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
 # Отключаем предупреждения
 warnings.filterwarnings('ignore')
 
@@ -22,7 +41,8 @@ else:
 def find_latest_files(folder_path, extension='.xlsx', count=1):
     """Находит самые свежие файлы в папке по дате изменения"""
     folder = Path(folder_path)
-    files = list(folder.glob(f'*{extension}'))
+    # ~$... - временные файлы открытых в Excel книг
+    files = [f for f in folder.glob(f'*{extension}') if not f.name.startswith('~$')]
     if not files:
         return [] if count > 1 else None
     files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
@@ -39,51 +59,434 @@ def read_excel_with_error_handling(file_path, sheet_name=0, header=None):
         print(f"Ошибка при чтении файла {Path(file_path).name}: {e}")
         return None
 
+def _excel_cell_value(value):
+    """Значение ячейки так же, как его читает pandas (engine openpyxl)"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str) and value in ERROR_CODES:
+        # Ошибки формул (#DIV/0! и т.п.) pandas читает как пустые значения
+        return float('nan')
+    return value
+
+def _read_columns_streaming(file_path, columns):
+    """Потоковое чтение первого листа в режиме read_only, в памяти только столбцы columns"""
+    wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        data = []
+        width = 0
+        last_row = -1
+        for row_number, row in enumerate(ws.iter_rows(max_col=max(columns) + 1, values_only=True)):
+            # Ширина и последняя строка - по заполненным ячейкам, как у pandas
+            filled = len(row)
+            while filled and row[filled - 1] in (None, ''):
+                filled -= 1
+            if filled:
+                last_row = row_number
+                width = max(width, filled)
+            data.append([_excel_cell_value(row[col]) if col < filled else "" for col in columns])
+    finally:
+        wb.close()
+
+    present = [idx for idx, col in enumerate(columns) if col < width]
+    data = [[row[idx] for idx in present] for row in data[:last_row + 1]]
+    if not data or not present:
+        return pd.DataFrame()
+    df = TextParser(data, header=None, skip_blank_lines=False).read()
+    df.columns = [columns[idx] for idx in present]
+    return df
+
+def read_excel_columns(file_path, columns, start_row=0):
+    """
+    Чтение только нужных столбцов первого листа (номера столбцов с 0)
+
+    Результат - то же, что read_excel_with_error_handling(header=None), в котором
+    оставлены столбцы columns и строки начиная с start_row: метки строк и столбцов
+    исходные, столбцов, которых нет в файле, нет и в результате.
+    Если установлен python-calamine, файл читается им, иначе (или если calamine
+    не смог прочитать файл) - потоком через openpyxl
+    """
+    try:
+        df = None
+        if python_calamine is not None:
+            try:
+                df = pd.read_excel(file_path, header=None, engine='calamine', usecols=lambda col: col in columns)
+            except Exception as e:
+                print(f"⚠ calamine не прочитал {Path(file_path).name} ({e}), читаем через openpyxl")
+        if df is None:
+            df = _read_columns_streaming(file_path, sorted(columns))
+        return df[df.index >= start_row]
+    except Exception as e:
+        print(f"Ошибка при чтении файла {Path(file_path).name}: {e}")
+        return None
+
+# Суффикс обновлённой копии: _обновленный_ГГГГ-ММ-ДД_чч-мм-сс
+UPDATED_SUFFIX = re.compile(r'(_обновленный_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})+$')
+
 def create_backup_filename(original_path):
-    """Создает имя для резервной копии файла"""
+    """
+    Создает имя для резервной копии файла
+
+    Если файл сам является обновлённой копией (режим наблюдения обновляет
+    последнюю копию), прежний суффикс заменяется, а не наращивается
+    """
     original_path = Path(original_path)
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    new_name = f"{original_path.stem}_обновленный_{timestamp}{original_path.suffix}"
+    stem = UPDATED_SUFFIX.sub('', original_path.stem)
+    new_name = f"{stem}_обновленный_{timestamp}{original_path.suffix}"
     return original_path.parent / new_name
 
-def process_analytics_files(analytics_files):
-    """Корректная обработка одного или двух analytics файлов"""
-    all_analytics_data = {}
+def sku_rows(df, start_row, sku_col):
+    """
+    Строки таблицы начиная с start_row, в которых заполнен столбец SKU,
+    и список SKU этих строк, приведённых к строке
+    """
+    rows = df[df.index >= start_row]
+    if sku_col not in rows.columns:
+        return rows.iloc[0:0], []
+    rows = rows[rows[sku_col].notna()]
+    return rows, rows[sku_col].map(str).str.strip().tolist()
 
-    for file_idx, file_path in enumerate(analytics_files):
-        print(f"   Чтение файла {file_idx+1}: {Path(file_path).name}")
-        df_analytics = read_excel_with_error_handling(file_path, header=None)
+def column_divided_by_100(values):
+    """Столбец, делённый на 100: числовой - целиком, смешанный - по значениям через divide_by_100"""
+    values = values.infer_objects()
+    if pd.api.types.is_numeric_dtype(values):
+        return values / 100
+    return values.map(divide_by_100)
 
-        if df_analytics is None:
-            continue
+# Преобразования значений полей, на которые ссылается SOURCE_FIELDS
+TRANSFORMS = {
+    'divide_by_100': column_divided_by_100,
+}
 
-        for idx, row in df_analytics.iterrows():
-            if idx >= 13:  # с 14-й строки
-                sku = row[7] if len(row) > 7 else None
-                if pd.isna(sku):
-                    continue
+# ========== КАРТА СТОЛБЦОВ ==========
+# Отчёты: название в отчёте об изменениях, столбец SKU, первая строка данных
+# и поля: имя -> (столбец отчёта, преобразование). Номера столбцов и строк - с 0
+SOURCE_FIELDS = {
+    'mark': {                                     # Таблица A: SKU в столбце D, с 10-й строки
+        'label': 'MARK', 'sku': 3, 'start_row': 9,
+        'fields': {'col_a': (0, None), 'col_p': (15, None)},
+    },
+    'analytics': {                                # Таблица B: SKU в столбце H, с 14-й строки
+        'label': 'analytics', 'sku': 7, 'start_row': 13,
+        'fields': {'bl': (63, None), 'br': (69, None)},
+    },
+    'dimensions': {                               # Таблица C: SKU в столбце A, со 2-й строки
+        'label': 'dimensions', 'sku': 0, 'start_row': 1,
+        'fields': {'length': (5, None), 'width': (3, None), 'height': (4, None),
+                   'col_g': (6, 'divide_by_100'), 'col_h': (7, 'divide_by_100')},
+    },
+    'prices': {                                   # Таблица D: SKU в столбце A, со 2-й строки
+        'label': 'prices', 'sku': 0, 'start_row': 1,
+        'fields': {'price': (2, None)},
+    },
+}
+
+# Таблица F: столбец SKU и заполняемые столбцы (номера с 1) в порядке заполнения:
+# (столбец, отчёт, поле, условие). Условие (столбец, значение) - заполнять,
+# только если в этом столбце строки стоит такое значение
+UNIT_SKU_COLUMN = 1                               # A
+UNIT_MAPPING = [
+    (2, 'mark', 'col_a', None),                   # B
+    (3, 'mark', 'col_p', None),                   # C
+    (5, 'dimensions', 'length', None),            # E
+    (6, 'dimensions', 'width', None),             # F
+    (7, 'dimensions', 'height', None),            # G
+    (16, 'dimensions', 'col_g', (20, 'FBO')),     # P: схема FBO в столбце T
+    (16, 'dimensions', 'col_h', (20, 'FBS')),     # P: схема FBS в столбце T
+    (15, 'analytics', 'bl', None),                # O
+    (34, 'analytics', 'br', None),                # AH
+    (37, 'prices', 'price', None),                # AK
+]
+
+def source_columns(kind):
+    """Столбцы отчёта, которые нужно прочитать"""
+    config = SOURCE_FIELDS[kind]
+    return [config['sku']] + [col for col, _ in config['fields'].values()]
+
+def load_source_table(df, kind):
+    """
+    Таблица одного файла отчёта: индекс - SKU строкой, столбцы - поля из SOURCE_FIELDS
+
+    Полей, столбцов которых нет в файле, в таблице нет. При повторе SKU остаются
+    значения из последней строки (как при построчном заполнении словаря),
+    порядок SKU - по первому появлению
+    """
+    config = SOURCE_FIELDS[kind]
+    rows, skus = sku_rows(df, config['start_row'], config['sku'])
+    columns = {}
+    for field, (col, transform) in config['fields'].items():
+        if col in rows.columns:
+            values = rows[col]
+            if transform:
+                values = TRANSFORMS[transform](values)
+            columns[field] = values.to_numpy(dtype=object)
+    index = pd.Index(skus, dtype=object)
+    table = pd.DataFrame(columns, index=index, dtype=object)
+    table = table[~index.duplicated(keep='last')]
+    return table.reindex(index.unique())
+
+def merge_source_tables(tables, kind):
+    """
+    Объединение таблиц одного отчёта из нескольких файлов (analytics - два последних)
+
+    Значение следующего файла заменяет предыдущее, если столбец поля в нём есть.
+    Поле, которого нет ни в одном файле, - None: такие ячейки таблицы F не трогаем
+    """
+    tables = [table for table in tables if table is not None]
+    index = pd.Index([], dtype=object)
+    for table in tables:
+        index = index.append(table.index)
+    index = index.unique()
+
+    merged = {}
+    for field in SOURCE_FIELDS[kind]['fields']:
+        column = np.full(len(index), None, dtype=object)
+        for table in tables:
+            if field in table.columns:
+                column[index.get_indexer(table.index)] = table[field].to_numpy(dtype=object)
+        merged[field] = column
+    return pd.DataFrame(merged, index=index, dtype=object)
+
+# ========== ОБЩИЙ ИНДЕКС SKU ==========
+# SKU, записанный как целое число без ведущих нулей (до 18 цифр), хранится как int64,
+# остальные ('0123', 'A-100') - строками. Запись числом однозначна, поэтому
+# сопоставление SKU то же, что и по строкам
+SKU_INT_PATTERN = r'-?(?:0|[1-9]\d{0,17})'
+SKU_INT_LIMIT = 10 ** 18
+
+def unit_sku_text(sku):
+    """SKU ячейки таблицы F строкой"""
+    return str(int(sku)) if isinstance(sku, float) else str(sku).strip()
+
+def split_sku_keys(skus):
+    """SKU строками -> (маска целых, их коды int64, остальные SKU строками)"""
+    keys = pd.Series(list(skus), dtype=object)
+    is_int = keys.str.fullmatch(SKU_INT_PATTERN).fillna(False).to_numpy(dtype=bool)
+    return is_int, keys[is_int].astype('int64').to_numpy(), keys[~is_int].to_numpy(dtype=object)
+
+class SkuIndex:
+    """
+    Общий индекс SKU всех отчётов и их поля столбцами, выровненными по нему
+
+    Строки индекса - сначала SKU-числа (int64), затем SKU-строки. Поиск SKU
+    таблицы F - один для всех отчётов: номер строки индекса сразу даёт значения
+    всех полей. None в столбце поля - для SKU нет значения в этом отчёте
+    """
+
+    def __init__(self, tables):
+        """tables - таблицы отчётов по видам (merge_source_tables)"""
+        keys = pd.Index([], dtype=object)
+        for table in tables.values():
+            keys = keys.append(table.index)
+        is_int, codes, strings = split_sku_keys(keys.unique())
+        self.int_keys = pd.Index(codes, dtype='int64')
+        self.str_keys = pd.Index(strings, dtype=object)
+
+        self.columns = {}
+        for kind, table in tables.items():
+            rows = self._rows_for_keys(table.index)
+            for field in table.columns:
+                column = np.full(len(self), None, dtype=object)
+                column[rows] = table[field].to_numpy(dtype=object)
+                self.columns[(kind, field)] = column
+
+    def __len__(self):
+        return len(self.int_keys) + len(self.str_keys)
+
+    def _rows(self, is_int, codes, strings):
+        rows = np.full(len(is_int), -1, dtype=np.int64)
+        rows[is_int] = self.int_keys.get_indexer(codes)
+        str_rows = self.str_keys.get_indexer(strings)
+        rows[~is_int] = np.where(str_rows >= 0, str_rows + len(self.int_keys), -1)
+        return rows
+
+    def _rows_for_keys(self, skus):
+        return self._rows(*split_sku_keys(skus))
+
+    def lookup(self, unit_skus):
+        """
+        Строки индекса для SKU из ячеек таблицы F (значения как есть), -1 - SKU нет
+        ни в одном отчёте. Числа переводятся в код без промежуточной строки
+        """
+        numbers, codes = [], []
+        texts, strings = [], []
+        for idx, sku in enumerate(unit_skus):
+            if isinstance(sku, (int, float)) and not isinstance(sku, bool) and abs(sku) < SKU_INT_LIMIT:
+                numbers.append(idx)
+                codes.append(int(sku))
+            else:
+                texts.append(idx)
+                strings.append(unit_sku_text(sku))
+
+        rows = np.full(len(unit_skus), -1, dtype=np.int64)
+        rows[numbers] = self.int_keys.get_indexer(np.array(codes, dtype=np.int64))
+        # Текст '123' в ячейке - тоже SKU-число
+        rows[texts] = self._rows_for_keys(strings)
+        return rows
+
+    def column(self, kind, field):
+        """Значения поля по строкам индекса; None - поля нет в отчёте"""
+        return self.columns.get((kind, field))
+
+# ========== КЭШ РАЗОБРАННЫХ ОТЧЁТОВ ==========
+# Увеличить при любом изменении загрузчиков, столбцов или чтения файлов
+PARSER_VERSION = 2
+CACHE_DIR = BASE_DIR / "cache"
+CACHE_INDEX = "index.json"
+# Сколько последних записей хранить для каждого вида отчёта и сколько дней без обращений
+CACHE_KEEP_PER_SOURCE = 4
+CACHE_MAX_AGE_DAYS = 30
+
+def file_content_hash(file_path, index):
+    """
+    SHA-1 содержимого файла; если размер и время изменения не менялись
+    с прошлого раза, берётся из индекса кэша без чтения файла
+    """
+    stat = os.stat(file_path)
+    known = index.get(str(Path(file_path).resolve()))
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha1']
+
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    index[str(Path(file_path).resolve())] = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': digest.hexdigest(),
+    }
+    return digest.hexdigest()
+
+def _load_cache_index():
+    try:
+        with open(CACHE_DIR / CACHE_INDEX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache_index(index):
+    # Записи о файлах, которых больше нет, не храним
+    index = {path: item for path, item in index.items() if os.path.exists(path)}
+    with open(CACHE_DIR / CACHE_INDEX, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
 
-                sku = str(sku).strip()
+def evict_cache():
+    """Удаление записей другой версии, давно не использованных и сверх лимита на вид отчёта"""
+    if not CACHE_DIR.exists():
+        return
+    now = datetime.now().timestamp()
+    by_source = {}
+    for cache_file in CACHE_DIR.glob('*.pkl'):
+        source, _, rest = cache_file.stem.partition('_v')
+        version = rest.split('_')[0]
+        age_days = (now - cache_file.stat().st_mtime) / 86400
+        if version != str(PARSER_VERSION) or age_days > CACHE_MAX_AGE_DAYS:
+            cache_file.unlink(missing_ok=True)
+        else:
+            by_source.setdefault(source, []).append(cache_file)
+    for files in by_source.values():
+        files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+        for cache_file in files[CACHE_KEEP_PER_SOURCE:]:
+            cache_file.unlink(missing_ok=True)
 
-                avg_price = row[63] if len(row) > 63 else None  # BL
-                total_ddr = row[69] if len(row) > 69 else None  # BR
+def parse_source(kind, file_path):
+    """Чтение отчёта вида kind (см. SOURCE_FIELDS) в таблицу без кэша; None - файл не прочитан"""
+    df = read_excel_columns(file_path, source_columns(kind), start_row=SOURCE_FIELDS[kind]['start_row'])
+    if df is None:
+        return None
+    return load_source_table(df, kind)
+
+def _cache_file_for(jobs):
+    """Файлы кэша для списка (вид, путь); None, если кэш недоступен"""
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        index = _load_cache_index()
+        keys = [file_content_hash(file_path, index) for _, file_path in jobs]
+        _save_cache_index(index)
+    except OSError as e:
+        print(f"   ⚠ Кэш недоступен: {e}")
+        return [None] * len(jobs)
+    return [CACHE_DIR / f"{kind}_v{PARSER_VERSION}_{key}.pkl" for (kind, _), key in zip(jobs, keys)]
+
+def _read_cache(cache_file, file_path):
+    if not cache_file or not cache_file.exists():
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            data = pickle.load(f)
+        os.utime(cache_file)
+        print(f"   Из кэша: {Path(file_path).name}")
+        return data
+    except Exception as e:
+        print(f"   ⚠ Не удалось прочитать кэш {cache_file.name}: {e}")
+        return None
+
+def _write_cache(cache_file, data):
+    try:
+        tmp_file = cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"   ⚠ Не удалось сохранить кэш: {e}")
+
+def load_sources(jobs, parallel=True):
+    """
+    Таблицы нескольких отчётов: jobs - список (вид, путь), результат - в том же порядке
 
-                # ===== КЛЮЧЕВОЕ ИСПРАВЛЕНИЕ =====
-                if sku not in all_analytics_data:
-                    all_analytics_data[sku] = {
-                        'bl': avg_price,
-                        'br': total_ddr
-                    }
-                else:
-                    if avg_price is not None:
-                        all_analytics_data[sku]['bl'] = avg_price
-                    if total_ddr is not None:
-                        all_analytics_data[sku]['br'] = total_ddr
-                # =================================
+    Ключ записи кэша - содержимое файла и PARSER_VERSION: неизменившийся отчёт
+    не перечитывается. Остальные разбираются одновременно в отдельных процессах
+    (разбор xlsx упирается в процессор), так что чтение занимает примерно
+    столько, сколько самый медленный файл. None - файл не удалось прочитать
+    """
+    cache_files = _cache_file_for(jobs)
+    results = [_read_cache(cache_file, file_path) for cache_file, (_, file_path) in zip(cache_files, jobs)]
+    pending = [idx for idx, data in enumerate(results) if data is None]
 
-        print(f"   Обработано строк из файла {file_idx+1}")
+    if parallel and len(pending) > 1 and (os.cpu_count() or 1) > 1:
+        print(f"   Параллельное чтение файлов: {len(pending)}")
+        try:
+            with ProcessPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1)) as pool:
+                futures = {idx: pool.submit(parse_source, *jobs[idx]) for idx in pending}
+                for idx, future in futures.items():
+                    results[idx] = future.result()
+            pending = []
+        except Exception as e:
+            # Например, запрет на запуск процессов - читаем по очереди
+            print(f"   ⚠ Параллельное чтение недоступно ({e}), файлы читаются по очереди")
+    for idx in pending:
+        results[idx] = parse_source(*jobs[idx])
 
-    return all_analytics_data
+    for idx, data in enumerate(results):
+        if data is not None and cache_files[idx] and not cache_files[idx].exists():
+            _write_cache(cache_files[idx], data)
+    evict_cache()
+    return results
+
+def load_source(kind, file_path):
+    """Таблица одного отчёта с кэшированием (см. load_sources)"""
+    return load_sources([(kind, file_path)])[0]
+
+def process_analytics_files(analytics_files, file_results=None):
+    """
+    Корректная обработка одного или двух analytics файлов
+
+    file_results - уже прочитанные таблицы этих файлов (load_sources), иначе файлы читаются здесь
+    """
+    if file_results is None:
+        file_results = load_sources([('analytics', file_path) for file_path in analytics_files])
+
+    for file_idx, (file_path, table) in enumerate(zip(analytics_files, file_results)):
+        print(f"   Файл {file_idx+1}: {Path(file_path).name}")
+        if table is not None:
+            print(f"   Обработано строк из файла {file_idx+1}")
+
+    return merge_source_tables(file_results, 'analytics')
 
 def divide_by_100(value):
     """Делит значение на 100, если оно является числом"""
@@ -97,7 +500,99 @@ def divide_by_100(value):
         # Если не удалось преобразовать, возвращаем оригинальное значение
         return value
 
-def update_unit_file():
+def same_cell_value(old, new):
+    """
+    Значение в ячейке уже такое же
+
+    Числа сравниваются по значению (в xlsx 5 и 5.0 хранятся одинаково),
+    остальное - с учётом типа: строка "5" и число 5 - разные значения
+    """
+    if isinstance(old, Number) and isinstance(new, Number) \
+            and not isinstance(old, bool) and not isinstance(new, bool):
+        return old == new or (old != old and new != new)
+    return type(old) == type(new) and old == new
+
+def build_write_plan(ws, sku_index):
+    """
+    План обновления таблицы F по UNIT_MAPPING
+
+    sku_index - SkuIndex отчётов: каждый SKU таблицы F ищется в нём один раз,
+    значения всех столбцов берутся по найденной строке. Возвращает
+    (plan, total_rows, updated_rows). plan - список изменений (строка, столбец,
+    старое значение, новое значение, SKU, источник) только для ячеек, значение
+    которых действительно меняется; updated_rows - строки, для которых
+    в отчётах нашлись данные
+    """
+    last_column = max([UNIT_SKU_COLUMN] + [column for column, _, _, _ in UNIT_MAPPING] +
+                      [condition[0] for _, _, _, condition in UNIT_MAPPING if condition])
+
+    row_numbers = []
+    unit_rows = []
+    for row, values in enumerate(ws.iter_rows(min_row=2, max_col=last_column, values_only=True), start=2):
+        if values[UNIT_SKU_COLUMN - 1] is not None:
+            row_numbers.append(row)
+            unit_rows.append(values)
+    if not unit_rows:
+        return [], 0, 0
+    unit_columns = list(zip(*unit_rows))
+
+    skus = unit_columns[UNIT_SKU_COLUMN - 1]
+    positions = sku_index.lookup(skus)
+    found = positions >= 0
+
+    has_data = np.zeros(len(skus), dtype=bool)
+    conditions = {}
+    changes = []
+    for order, (column, kind, field, condition) in enumerate(UNIT_MAPPING):
+        field_values = sku_index.column(kind, field)
+        if field_values is None:
+            continue
+        values = np.where(found, field_values[positions], None) if len(field_values) else np.full(len(skus), None)
+        # None - для SKU нет значения ни в одном файле отчёта, такие ячейки не трогаем
+        mask = np.not_equal(values, None)
+        if condition:
+            if condition not in conditions:
+                condition_column, expected = condition
+                conditions[condition] = np.array(
+                    [bool(value) and str(value).strip().upper() == expected
+                     for value in unit_columns[condition_column - 1]], dtype=bool)
+            mask &= conditions[condition]
+        has_data |= mask
+
+        old_values = unit_columns[column - 1]
+        source = SOURCE_FIELDS[kind]['label']
+        for idx in np.flatnonzero(mask):
+            if not same_cell_value(old_values[idx], values[idx]):
+                changes.append((row_numbers[idx], order, column, old_values[idx], values[idx],
+                                unit_sku_text(skus[idx]), source))
+
+    # Порядок записи - по строкам, внутри строки - как в UNIT_MAPPING
+    changes.sort(key=lambda change: change[:2])
+    plan = [(row, column, old, new, sku, source) for row, _, column, old, new, sku, source in changes]
+    return plan, len(skus), int(has_data.sum())
+
+def apply_write_plan(ws, plan):
+    """Запись только изменившихся ячеек"""
+    for row, column, old, new, sku, source in plan:
+        ws.cell(row=row, column=column, value=new)
+
+def export_change_report(plan, report_path):
+    """Отчёт об изменениях (CSV для Excel): что и откуда поменялось в каждой ячейке"""
+    from openpyxl.utils import get_column_letter
+    report = pd.DataFrame(
+        [(row, get_column_letter(column), sku, source, old, new)
+         for row, column, old, new, sku, source in plan],
+        columns=['Строка', 'Столбец', 'SKU', 'Источник', 'Было', 'Стало']
+    )
+    report.to_csv(report_path, index=False, sep=';', encoding='utf-8-sig')
+
+def find_input_files():
+    """
+    Самые свежие отчёты и Unit-файл из папок проекта
+
+    Возвращает словарь путей ('mark', 'analytics', 'dimensions', 'prices', 'unit')
+    или None, если какого-то файла нет
+    """
     # Пути к папкам (ОТНОСИТЕЛЬНЫЕ ОТ РАБОЧЕЙ ДИРЕКТОРИИ)
     base_dir = BASE_DIR
     mark_folder = base_dir / "MARK_ozon_report"
@@ -157,219 +652,192 @@ def update_unit_file():
             else:
                 print(f"\n  {name}: папка не существует")
         
+        return None
+    
+    return {'mark': mark_file, 'analytics': analytics_files, 'dimensions': dimensions_file,
+            'prices': prices_file, 'unit': unit_file}
+
+def load_input_tables(files):
+    """
+    Чтение таблиц A-D (файлы - из find_input_files)
+
+    Возвращает словарь таблиц по видам для build_write_plan или None при ошибке чтения
+    """
+    mark_file, analytics_files = files['mark'], files['analytics']
+
+    # Все отчёты независимы - читаем их одновременно
+    print("\nЧтение таблиц A-D...")
+    jobs = [('mark', mark_file)] + [('analytics', file_path) for file_path in analytics_files] + \
+           [('dimensions', files['dimensions']), ('prices', files['prices'])]
+    results = load_sources(jobs)
+    mark_data = results[0]
+    analytics_results = results[1:1 + len(analytics_files)]
+    dimensions_data, prices_data = results[-2:]
+
+    # ============================================
+    # 1. Чтение таблицы A (MARK_ozon_report)
+    # ============================================
+    print("\n1. Чтение таблицы A (MARK_ozon_report)...")
+    if mark_data is None:
+        return None
+
+    print(f"   Найдено {len(mark_data)} SKU в таблице A")
+
+    
+    # ============================================
+    # 2. Чтение таблицы B (analytics_report) - ОБНОВЛЁННЫЙ БЛОК
+    # ============================================
+    print("2. Чтение таблицы B (analytics_report)...")
+    analytics_data = process_analytics_files(analytics_files, analytics_results)
+    
+    if analytics_data.empty:
+        print("   ⚠ Не удалось получить данные из файлов analytics")
+    
+    print(f"   Всего найдено {len(analytics_data)} уникальных SKU в таблице B")
+    
+    # ============================================
+    # 3. Чтение таблицы C (ozon_dimensions) - ОБНОВЛЁННЫЙ БЛОК
+    # ============================================
+    print("3. Чтение таблицы C (ozon_dimensions)...")
+    if dimensions_data is None:
+        return None
+    print(f"   Найдено {len(dimensions_data)} SKU в таблице C")
+    print(f"   Дополнительно извлечены столбцы G и H (значения разделены на 100)")
+    
+    # ============================================
+    # 4. Чтение таблицы D (prices_with_co-investment)
+    # ============================================
+    print("4. Чтение таблицы D (prices_with_co-investment)...")
+    if prices_data is None:
+        return None
+    print(f"   Найдено {len(prices_data)} SKU в таблице D")
+
+    return {'mark': mark_data, 'analytics': analytics_data,
+            'dimensions': dimensions_data, 'prices': prices_data}
+
+# Запись Unit-файла: 'openpyxl' - загрузка и сохранение всей книги, 'patch' - правка
+# XML листа внутри архива без загрузки книги (xlsm_patch), 'auto' - patch для больших файлов.
+# По умолчанию openpyxl, пока правка XML не проверена на рабочих файлах; patch включается ключом --patch
+UNIT_WRITE_MODE = 'openpyxl'
+UNIT_PATCH_MIN_MB = 20
+WRITE_MODE_LABELS = {
+    'openpyxl': 'openpyxl (загрузка и сохранение книги)',
+    'patch': 'правка XML листа без загрузки книги',
+}
+
+def use_patch_mode(unit_file, write_mode=None):
+    write_mode = write_mode or UNIT_WRITE_MODE
+    if write_mode == 'auto':
+        return os.path.getsize(unit_file) >= UNIT_PATCH_MIN_MB * 1024 * 1024
+    return write_mode == 'patch'
+
+def _write_unit_openpyxl(unit_file, new_unit_file, sku_index):
+    # Загружаем оригинальный файл с сохранением макросов
+    wb = load_workbook(filename=unit_file, keep_vba=True)
+    ws = wb.active
+    
+    # Изменения считаются за один проход, записываются только изменившиеся ячейки
+    plan, total_rows, updated_count = build_write_plan(ws, sku_index)
+    apply_write_plan(ws, plan)
+    
+    # Сохраняем обновлённую копию
+    wb.save(new_unit_file)
+    return plan, total_rows, updated_count
+
+def _write_unit_patch(unit_file, new_unit_file, sku_index):
+    # Лист читается потоком, книга целиком в память не загружается
+    wb = load_workbook(filename=unit_file, read_only=True, keep_links=False)
+    try:
+        ws = wb.active
+        # Размер листа из файла может быть неверным - читаем все строки
+        ws.reset_dimensions()
+        plan, total_rows, updated_count = build_write_plan(ws, sku_index)
+    finally:
+        wb.close()
+    patch_workbook(unit_file, new_unit_file, plan)
+    return plan, total_rows, updated_count
+
+def update_unit_workbook(unit_file, sku_index, write_mode=None):
+    """
+    Обновлённая копия одного Unit-файла и отчёт об изменениях к ней
+
+    Оригинал не меняется. sku_index - SkuIndex таблиц A-D, write_mode - см. UNIT_WRITE_MODE; если книгу нельзя
+    обновить правкой XML, она сохраняется через openpyxl. Возвращает сводку:
+    пути копии и отчёта, строки с SKU, обновлённые строки, изменённые ячейки и строки
+    """
+    # Создаем имя для обновлённой копии
+    new_unit_file = create_backup_filename(unit_file)
+    
+    mode = 'openpyxl'
+    if use_patch_mode(unit_file, write_mode):
+        try:
+            plan, total_rows, updated_count = _write_unit_patch(unit_file, new_unit_file, sku_index)
+            mode = 'patch'
+        except PatchNotSupported as e:
+            print(f"   ⚠ {Path(unit_file).name}: правка XML невозможна ({e}), книга сохраняется через openpyxl")
+    if mode == 'openpyxl':
+        plan, total_rows, updated_count = _write_unit_openpyxl(unit_file, new_unit_file, sku_index)
+    
+    report_file = new_unit_file.with_name(f"{new_unit_file.stem}_изменения.csv")
+    export_change_report(plan, report_file)
+
+    return {
+        'file': str(unit_file),
+        'copy': str(new_unit_file),
+        'report': str(report_file),
+        'total_rows': total_rows,
+        'updated_rows': updated_count,
+        'cells': len(plan),
+        'changed_rows': len({change[0] for change in plan}),
+        'mode': mode,
+    }
+
+def update_unit_file(write_mode=None):
+    files = find_input_files()
+    if files is None:
         return False
+    mark_file, analytics_files = files['mark'], files['analytics']
+    unit_file = files['unit']
     
     print(f"\nИспользуемые файлы:")
     print(f"  Таблица A (MARK): {Path(mark_file).name}")
     print(f"  Таблица B (analytics):")
     for i, file_path in enumerate(analytics_files):
         print(f"    Файл {i+1}: {Path(file_path).name}")
-    print(f"  Таблица C (dimensions): {Path(dimensions_file).name}")
-    print(f"  Таблица D (prices): {Path(prices_file).name}")
+    print(f"  Таблица C (dimensions): {Path(files['dimensions']).name}")
+    print(f"  Таблица D (prices): {Path(files['prices']).name}")
     print(f"  Таблица F (unit): {Path(unit_file).name}")
 
     try:
-        # ============================================
-        # 1. Чтение таблицы A (MARK_ozon_report)
-        # ============================================
-        print("\n1. Чтение таблицы A (MARK_ozon_report)...")
-        df_mark = read_excel_with_error_handling(mark_file, header=None)
-        if df_mark is None:
-            return False
-
-        mark_data = {}
-        for idx, row in df_mark.iterrows():
-            if idx >= 9:  # С 10-й строки (индекс 9)
-                sku = row[3] if len(row) > 3 else None  # ← СТОЛБЕЦ D
-                if pd.notna(sku):
-                    sku = str(sku).strip()
-                    col_a_value = row[0] if 0 in row else None  # Столбец A
-                    cost_value = row[15] if len(row) > 15 else None  # Столбец P
-                    mark_data[sku] = {
-                        'col_a': col_a_value,
-                        'col_p': cost_value
-                    }
-
-        print(f"   Найдено {len(mark_data)} SKU в таблице A")
-
-        
-        # ============================================
-        # 2. Чтение таблицы B (analytics_report) - ОБНОВЛЁННЫЙ БЛОК
-        # ============================================
-        print("2. Чтение таблицы B (analytics_report)...")
-        analytics_data = process_analytics_files(analytics_files)
-        
-        if not analytics_data:
-            print("   ⚠ Не удалось получить данные из файлов analytics")
-        
-        print(f"   Всего найдено {len(analytics_data)} уникальных SKU в таблице B")
-        
-        # ============================================
-        # 3. Чтение таблицы C (ozon_dimensions) - ОБНОВЛЁННЫЙ БЛОК
-        # ============================================
-        print("3. Чтение таблицы C (ozon_dimensions)...")
-        df_dimensions = read_excel_with_error_handling(dimensions_file, header=None)
-        if df_dimensions is None:
+        tables = load_input_tables(files)
+        if tables is None:
             return False
-            
-        dimensions_data = {}
-        for idx, row in df_dimensions.iterrows():
-            if idx >= 1:  # Со 2-й строки (индекс 1)
-                sku = row[0] if 0 in row else None  # Столбец A
-                if pd.notna(sku):
-                    sku = str(sku).strip()
-                    length = row[5] if len(row) > 5 else None  # Столбец F (Длина)
-                    width = row[3] if len(row) > 3 else None   # Столбец D (Ширина)
-                    height = row[4] if len(row) > 4 else None  # Столбец E (Высота)
-                    # НОВОЕ: добавлены столбцы G и H
-                    col_g_raw = row[6] if len(row) > 6 else None   # Столбец G
-                    col_h_raw = row[7] if len(row) > 7 else None   # Столбец H
-                    
-                    # Делим значения из G и H на 100 сразу при чтении
-                    col_g = divide_by_100(col_g_raw)
-                    col_h = divide_by_100(col_h_raw)
-                    
-                    dimensions_data[sku] = {
-                        'length': length,
-                        'width': width,
-                        'height': height,
-                        'col_g': col_g,  # Уже разделено на 100
-                        'col_h': col_h   # Уже разделено на 100
-                    }
-        print(f"   Найдено {len(dimensions_data)} SKU в таблице C")
-        print(f"   Дополнительно извлечены столбцы G и H (значения разделены на 100)")
-        
-        # ============================================
-        # 4. Чтение таблицы D (prices_with_co-investment)
-        # ============================================
-        print("4. Чтение таблицы D (prices_with_co-investment)...")
-        df_prices = read_excel_with_error_handling(prices_file, header=None)
-        if df_prices is None:
-            return False
-            
-        prices_data = {}
-        for idx, row in df_prices.iterrows():
-            if idx >= 1:  # Со 2-й строки (индекс 1)
-                sku = row[0] if 0 in row else None  # Столбец A
-                if pd.notna(sku):
-                    sku = str(sku).strip()
-                    price = row[2] if len(row) > 2 else None  # Столбец C
-                    prices_data[sku] = price
-        print(f"   Найдено {len(prices_data)} SKU в таблице D")
         
         # ============================================
         # 5. Создание обновлённой копии таблицы F (Unit.xlsm)
         # ============================================
         print("\n5. Создание обновлённой копии таблицы F...")
-        
-        # Создаем имя для обновлённой копии
-        new_unit_file = create_backup_filename(unit_file)
-        
-        # Загружаем оригинальный файл с сохранением макросов
-        wb = load_workbook(filename=unit_file, keep_vba=True)
-        ws = wb.active
-        
-        updated_count = 0
-        total_rows = 0
-        
-        # Проходим по строкам начиная со второй
-        for row in range(2, ws.max_row + 1):
-            sku_cell = ws.cell(row=row, column=1)  # Колонка A
-            sku = sku_cell.value
-
-            if sku is not None:
-                # ===== ИСПРАВЛЕНИЕ =====
-                if isinstance(sku, float):
-                    sku_str = str(int(sku))
-                else:
-                    sku_str = str(sku).strip()
-                # =======================
-
-                total_rows += 1
-                updated = False
-
-                # Обновляем из таблицы A
-                if sku_str in mark_data:
-                    col_a_value = mark_data[sku_str].get('col_a')
-                    if col_a_value is not None:
-                        ws.cell(row=row, column=2, value=col_a_value)
-                        updated = True
-
-                    col_p_value = mark_data[sku_str].get('col_p')
-                    if col_p_value is not None:
-                        ws.cell(row=row, column=3, value=col_p_value)
-                        updated = True
-
-                # Обновляем из таблицы C
-                if sku_str in dimensions_data:
-                    dim = dimensions_data[sku_str]
-                    if dim.get('length') is not None:
-                        ws.cell(row=row, column=5, value=dim['length'])
-                        updated = True
-                    if dim.get('width') is not None:
-                        ws.cell(row=row, column=6, value=dim['width'])
-                        updated = True
-                    if dim.get('height') is not None:
-                        ws.cell(row=row, column=7, value=dim['height'])
-                        updated = True
-                    
-                    # НОВОЕ: обновление столбца P в зависимости от значения в столбце T
-                    # Читаем значение из столбца T (20-й столбец)
-                    col_t_value = ws.cell(row=row, column=20).value
-                    if col_t_value:
-                        col_t_str = str(col_t_value).strip().upper()
-                        
-                        # Если в столбце T "FBO", заполняем столбец P данными из столбца G таблицы C (уже разделено на 100)
-                        if col_t_str == "FBO" and dim.get('col_g') is not None:
-                            ws.cell(row=row, column=16, value=dim['col_g'])  # Столбец P
-                            updated = True
-                            # print(f"   Строка {row}: Заполнен столбец P (FBO) значением {dim['col_g']}")
-                        
-                        # Если в столбце T "FBS", заполняем столбец P данными из столбца H таблицы C (уже разделено на 100)
-                        elif col_t_str == "FBS" and dim.get('col_h') is not None:
-                            ws.cell(row=row, column=16, value=dim['col_h'])  # Столбец P
-                            updated = True
-                            # print(f"   Строка {row}: Заполнен столбец P (FBS) значением {dim['col_h']}")
-
-                # Обновляем из таблицы B
-                if sku_str in analytics_data:
-                    analytics = analytics_data[sku_str]
-                    if analytics.get('bl') is not None:
-                        ws.cell(row=row, column=15, value=analytics['bl'])
-                        updated = True
-                    if analytics.get('br') is not None:
-                        ws.cell(row=row, column=34, value=analytics['br'])
-                        updated = True
-
-                # Обновляем из таблицы D
-                if sku_str in prices_data:
-                    price = prices_data[sku_str]
-                    if price is not None:
-                        ws.cell(row=row, column=37, value=price)
-                        updated = True
-
-                if updated:
-                    updated_count += 1
-
-        
-        # Сохраняем обновлённую копию
-        wb.save(new_unit_file)
-        print(f"   Создана обновлённая копия: {new_unit_file.name}")
+        summary = update_unit_workbook(unit_file, SkuIndex(tables), write_mode)
+        print(f"   Запись: {WRITE_MODE_LABELS[summary['mode']]}")
+        print(f"   Изменено ячеек: {summary['cells']} в {summary['changed_rows']} строках")
+        print(f"   Создана обновлённая копия: {Path(summary['copy']).name}")
         print(f"   Оригинальный файл остался без изменений: {Path(unit_file).name}")
-        print(f"   Обновлено {updated_count} строк из {total_rows} всего")
+        print(f"   Обновлено {summary['updated_rows']} строк из {summary['total_rows']} всего")
+        print(f"   Отчёт об изменениях: {Path(summary['report']).name}")
         
         # Выводим сводку
         print("\n" + "=" * 60)
         print("СВОДКА:")
         print("=" * 60)
-        print(f"Таблица A (MARK): {len(mark_data)} SKU")
-        print(f"Таблица B (analytics): {len(analytics_data)} уникальных SKU из {len(analytics_files)} файлов")
-        print(f"Таблица C (dimensions): {len(dimensions_data)} SKU (столбцы G и H разделены на 100)")
-        print(f"Таблица D (prices): {len(prices_data)} SKU")
-        print(f"Таблица F (unit): {total_rows} строк с SKU, {updated_count} обновлено")
+        print(f"Таблица A (MARK): {len(tables['mark'])} SKU")
+        print(f"Таблица B (analytics): {len(tables['analytics'])} уникальных SKU из {len(analytics_files)} файлов")
+        print(f"Таблица C (dimensions): {len(tables['dimensions'])} SKU (столбцы G и H разделены на 100)")
+        print(f"Таблица D (prices): {len(tables['prices'])} SKU")
+        print(f"Таблица F (unit): {summary['total_rows']} строк с SKU, {summary['updated_rows']} обновлено, "
+              f"{summary['cells']} ячеек изменено в {summary['changed_rows']} строках")
         print(f"\nФайлы:")
         print(f"  Оригинал: {Path(unit_file).name}")
-        print(f"  Обновлённая копия: {new_unit_file.name}")
+        print(f"  Обновлённая копия: {Path(summary['copy']).name}")
         print("=" * 60)
         
         return True
@@ -380,7 +848,202 @@ def update_unit_file():
         traceback.print_exc()
         return False
 
+# ========== ПАКЕТНОЕ ОБНОВЛЕНИЕ ==========
+
+def find_unit_files(unit_folder=None):
+    """
+    Все Unit-файлы папки для пакетного обновления: .xlsm и .xlsx, кроме
+    обновлённых копий прошлых запусков и временных файлов Excel (~$...)
+    """
+    unit_folder = Path(unit_folder or BASE_DIR / "unit_folder")
+    files = [f for f in sorted(unit_folder.glob('*.xls[mx]'))
+             if not f.name.startswith('~$') and not UPDATED_SUFFIX.search(f.stem)]
+    return [str(f) for f in files]
+
+def _update_unit_worker(unit_file, sku_index, write_mode=None):
+    """Обновление одного файла в процессе пакета: ошибка файла не останавливает остальные"""
+    try:
+        return update_unit_workbook(unit_file, sku_index, write_mode)
+    except Exception as e:
+        return {'file': str(unit_file), 'error': str(e)}
+
+def update_unit_files(unit_files=None, parallel=True, write_mode=None):
+    """
+    Пакетное обновление нескольких Unit-файлов (по брендам, менеджерам)
+
+    Таблицы A-D читаются один раз и применяются к каждому файлу unit_files
+    (по умолчанию - все Unit-файлы unit_folder, см. find_unit_files). Файлы
+    обновляются одновременно в отдельных процессах, в конце - сводка по каждому
+    """
+    files = find_input_files()
+    if files is None:
+        return False
+    if unit_files is None:
+        unit_files = find_unit_files()
+    if not unit_files:
+        print("\n❌ Нет Unit-файлов для обновления")
+        return False
+
+    print(f"\nUnit-файлов для обновления: {len(unit_files)}")
+    for unit_file in unit_files:
+        print(f"  - {Path(unit_file).name}")
+
+    try:
+        tables = load_input_tables(files)
+    except Exception as e:
+        print(f"\nОшибка при чтении таблиц A-D: {e}")
+        return False
+    if tables is None:
+        return False
+    # Индекс строится один раз и передаётся всем процессам вместо таблиц
+    sku_index = SkuIndex(tables)
+
+    print(f"\n5. Создание обновлённых копий, файлов: {len(unit_files)}...")
+    summaries = [None] * len(unit_files)
+    pending = list(range(len(unit_files)))
+    if parallel and len(unit_files) > 1 and (os.cpu_count() or 1) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(len(unit_files), os.cpu_count() or 1)) as pool:
+                futures = {idx: pool.submit(_update_unit_worker, unit_files[idx], sku_index, write_mode) for idx in pending}
+                for idx, future in futures.items():
+                    summaries[idx] = future.result()
+                    print(f"   Готово: {Path(unit_files[idx]).name}")
+            pending = []
+        except Exception as e:
+            print(f"   ⚠ Параллельное обновление недоступно ({e}), файлы обновляются по очереди")
+    for idx in pending:
+        if summaries[idx] is None:
+            summaries[idx] = _update_unit_worker(unit_files[idx], sku_index, write_mode)
+            print(f"   Готово: {Path(unit_files[idx]).name}")
+
+    print("\n" + "=" * 60)
+    print("СВОДКА ПО ФАЙЛАМ:")
+    print("=" * 60)
+    failed = 0
+    for summary in summaries:
+        print(f"{Path(summary['file']).name}:")
+        if 'error' in summary:
+            failed += 1
+            print(f"  ✗ Ошибка: {summary['error']}")
+            continue
+        print(f"  {summary['total_rows']} строк с SKU, {summary['updated_rows']} обновлено, "
+              f"{summary['cells']} ячеек изменено в {summary['changed_rows']} строках")
+        print(f"  Обновлённая копия: {Path(summary['copy']).name}")
+        print(f"  Запись: {WRITE_MODE_LABELS[summary['mode']]}")
+    print("-" * 60)
+    print(f"Обновлено файлов: {len(summaries) - failed} из {len(summaries)}")
+    print("=" * 60)
+
+    return failed == 0
+
+# ========== НАБЛЮДЕНИЕ ЗА ПАПКАМИ ОТЧЁТОВ ==========
+# Папки отчётов по видам (см. SOURCE_FIELDS)
+WATCH_FOLDERS = {
+    'mark': "MARK_ozon_report",
+    'analytics': "analytics_report",
+    'dimensions': "ozon_dimensions",
+    'prices': "prices_with_co-investment",
+}
+WATCH_INTERVAL = 2   # секунд между проверками папок
+WATCH_SETTLE = 5     # файл считается дописанным, если столько секунд не менялся
+
+def _folder_snapshot(folder):
+    """Файлы .xlsx папки: путь -> (размер, время изменения); временные файлы Excel (~$...) не считаются"""
+    snapshot = {}
+    for f in Path(folder).glob('*.xlsx'):
+        if f.name.startswith('~$'):
+            continue
+        try:
+            stat = f.stat()
+        except OSError:
+            continue
+        snapshot[str(f)] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+def apply_source_update(kind, write_mode=None):
+    """
+    Обновление Unit-файла по одному отчёту: перечитывается только он
+    (analytics - два последних файла, неизменившийся берётся из кэша),
+    в копию Unit-файла записываются только его столбцы из UNIT_MAPPING.
+    Основой служит последняя копия, поэтому обновления по разным отчётам
+    накапливаются; имя новой копии строится от имени исходного Unit-файла
+    """
+    folder = BASE_DIR / WATCH_FOLDERS[kind]
+    if kind == 'analytics':
+        analytics_files = find_latest_files(folder, count=2)
+        table = process_analytics_files(analytics_files) if analytics_files else None
+    else:
+        source_file = find_latest_files(folder)
+        table = load_source(kind, source_file) if source_file else None
+    if table is None:
+        print(f"   ✗ Не удалось прочитать отчёт {WATCH_FOLDERS[kind]}")
+        return False
+
+    unit_folder = BASE_DIR / "unit_folder"
+    unit_file = find_latest_files(unit_folder, '.xlsm') or find_latest_files(unit_folder, '.xlsx')
+    if not unit_file:
+        print("   ✗ Не найден файл в папке unit_folder")
+        return False
+
+    summary = update_unit_workbook(unit_file, SkuIndex({kind: table}), write_mode)
+    print(f"   {SOURCE_FIELDS[kind]['label']}: {len(table)} SKU, {summary['cells']} ячеек изменено "
+          f"в {summary['changed_rows']} строках")
+    print(f"   Обновлённая копия: {Path(summary['copy']).name} (из {Path(unit_file).name})")
+    print(f"   Запись: {WRITE_MODE_LABELS[summary['mode']]}")
+    return True
+
+def watch_unit_updates(write_mode=None, interval=WATCH_INTERVAL, settle=WATCH_SETTLE):
+    """
+    Наблюдение за папками отчётов: новый или изменённый отчёт, как только он
+    дописан, применяется к последнему Unit-файлу (см. apply_source_update).
+    Файлы, которые уже лежат в папках при запуске, не обрабатываются.
+    Остановка - Ctrl+C
+    """
+    folders = {kind: BASE_DIR / name for kind, name in WATCH_FOLDERS.items()}
+    known = {kind: _folder_snapshot(folder) for kind, folder in folders.items()}
+    # Изменившиеся файлы: путь -> (вид, размер и время, когда изменение замечено)
+    pending = {}
+
+    print(f"Наблюдение за папками (проверка каждые {interval} с, остановка - Ctrl+C):")
+    for kind, folder in folders.items():
+        print(f"  {WATCH_FOLDERS[kind]}: {'✓' if folder.exists() else '✗'}")
+
+    try:
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            for kind, folder in folders.items():
+                snapshot = _folder_snapshot(folder)
+                for path, stat in snapshot.items():
+                    if known[kind].get(path) != stat:
+                        # Файл ещё пишется - отсчёт начинается заново
+                        pending[path] = (kind, stat, now)
+                known[kind] = snapshot
+
+            ready = set()
+            for path, (kind, stat, since) in list(pending.items()):
+                if path not in known[kind]:
+                    del pending[path]
+                elif now - since >= settle and zipfile.is_zipfile(path):
+                    ready.add(kind)
+                    del pending[path]
+
+            for kind in WATCH_FOLDERS:
+                if kind not in ready:
+                    continue
+                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Новый отчёт в {WATCH_FOLDERS[kind]}")
+                try:
+                    apply_source_update(kind, write_mode)
+                except Exception as e:
+                    print(f"   ✗ Ошибка при обновлении: {e}")
+    except KeyboardInterrupt:
+        print("\nНаблюдение остановлено")
+    return True
+
 if __name__ == "__main__":
+    # Нужно для пула процессов при чтении отчётов в собранном exe
+    multiprocessing.freeze_support()
+
     print("=" * 60)
     print("СКРИПТ ОБНОВЛЕНИЯ ТАБЛИЦЫ UNIT")
     print("=" * 60)
@@ -391,7 +1054,16 @@ if __name__ == "__main__":
     print("Новое: Значения из столбцов G и H делятся на 100 перед занесением в столбец P")
     print("=" * 60)
     
-    success = update_unit_file()
+    # --all: все Unit-файлы папки unit_folder, таблицы A-D читаются один раз
+    # --patch: правка XML листа без загрузки книги при любом размере файла
+    # --watch: обновление по каждому новому отчёту в папках, до Ctrl+C
+    write_mode = 'patch' if '--patch' in sys.argv[1:] else None
+    if '--watch' in sys.argv[1:]:
+        success = watch_unit_updates(write_mode)
+    elif '--all' in sys.argv[1:]:
+        success = update_unit_files(write_mode=write_mode)
+    else:
+        success = update_unit_file(write_mode)
     
     if success:
         print("\n✓ ОБНОВЛЕНИЕ ЗАВЕРШЕНО УСПЕШНО!")
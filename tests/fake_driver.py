@@ -0,0 +1,96 @@
+"""Браузер без Selenium для тестов: вкладки, заголовки страниц и капча"""
+import itertools
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+CAPTCHA_TITLE = 'Antibot Captcha'
+PAGE_TITLE = 'Ozon'
+
+
+class FakeElement:
+    def __init__(self, text=''):
+        self.text = text
+
+    def is_displayed(self):
+        return True
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        assert handle in self.driver.titles
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """
+    Вкладки браузера: handle -> заголовок страницы
+
+    captcha=True - любая загрузка страницы попадает на капчу, пока не вызван solve()
+    """
+
+    def __init__(self, titles=None, current='main', captcha=False):
+        self.titles = dict(titles or {current: PAGE_TITLE})
+        self.current_window_handle = current
+        self.switch_to = FakeSwitch(self)
+        self.captcha = captcha
+        self.visited = []
+        self.quit_called = False
+        self._tab_ids = itertools.count(1)
+
+    @property
+    def window_handles(self):
+        return list(self.titles)
+
+    @property
+    def title(self):
+        return self.titles[self.current_window_handle]
+
+    @property
+    def current_url(self):
+        return self.visited[-1] if self.visited else 'https://www.ozon.ru/'
+
+    page_source = ''
+
+    def find_elements(self, by, value):
+        return []
+
+    def find_element(self, by, value):
+        if by == By.TAG_NAME and value == 'body':
+            return FakeElement()
+        raise NoSuchElementException(value)
+
+    def execute_script(self, script, *args):
+        # Фоновые вкладки предзагрузки: window.open и смена адреса вкладки
+        if script.startswith('window.open'):
+            handle = f'tab{next(self._tab_ids)}'
+            self.titles[handle] = PAGE_TITLE
+            self.visited.append(args[0])
+        elif script.startswith('window.location.href'):
+            self.visited.append(args[0])
+        elif script == 'return document.readyState':
+            return 'complete'
+        return None
+
+    def get(self, url):
+        self.visited.append(url)
+        self.titles[self.current_window_handle] = CAPTCHA_TITLE if self.captcha else PAGE_TITLE
+
+    def solve(self):
+        """Капча решена в браузере: Ozon перенаправляет на страницу"""
+        self.captcha = False
+        for handle, title in self.titles.items():
+            if title == CAPTCHA_TITLE:
+                self.titles[handle] = PAGE_TITLE
+
+    def close(self):
+        del self.titles[self.current_window_handle]
+
+    def quit(self):
+        self.quit_called = True
+
+    def save_screenshot(self, path):
+        pass
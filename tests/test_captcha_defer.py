@@ -0,0 +1,49 @@
+import pytest
+
+from fake_driver import CAPTCHA_TITLE, FakeDriver
+from parser import OzonSellerParser
+
+
+@pytest.fixture
+def parser(tmp_path):
+    parser = OzonSellerParser(None, output_folder=str(tmp_path), trace=False, settings={'captcha_mode': 'defer'})
+    parser.driver = FakeDriver({'main': CAPTCHA_TITLE}, 'main')
+    parser._set_captcha_pending(True)
+    return parser
+
+
+def test_no_navigation_while_captcha_pending(parser):
+    assert parser.captcha_handle == 'main'
+    assert parser.safe_get('https://www.ozon.ru/product/tovar-1001/') is False
+    assert parser.driver.visited == []
+    assert parser.captcha_pending
+
+
+def test_captcha_cleared_after_solution(parser):
+    assert not parser._captcha_cleared()
+    parser.driver.titles['main'] = 'Ozon'
+    assert parser._captcha_cleared()
+    assert not parser.captcha_pending
+    assert parser.captcha_handle is None
+
+
+def test_captcha_checked_in_its_own_tab(parser):
+    # Капча во вкладке предзагрузки, текущая - основная
+    parser.driver.titles = {'main': 'Ozon', 'tab': CAPTCHA_TITLE}
+    parser.captcha_handle = 'tab'
+    parser.captcha_tab_owned = True
+
+    assert not parser._captcha_cleared()
+    assert parser.driver.current_window_handle == 'main'
+
+    parser.driver.titles['tab'] = 'Ozon'
+    assert parser._captcha_cleared()
+    # Вкладка, оставленная ради капчи, закрыта
+    assert parser.driver.window_handles == ['main']
+    assert parser.driver.current_window_handle == 'main'
+
+
+def test_closed_captcha_window_counts_as_cleared(parser):
+    parser.captcha_handle = 'closed'
+    assert parser._captcha_cleared()
+    assert not parser.captcha_pending
@@ -0,0 +1,55 @@
+import pytest
+
+from parser import OzonSellerParser
+
+SELLER = 'https://www.ozon.ru/seller/shop-1/'
+URLS = [
+    'https://www.ozon.ru/product/tovar-1-1001/',
+    'https://www.ozon.ru/product/tovar-2-1002/',
+]
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    parser = OzonSellerParser(None, output_folder=str(tmp_path), trace=False)
+    parser.current_seller_url = SELLER
+    monkeypatch.setattr(parser, 'human_like_pause', lambda *args: None)
+    monkeypatch.setattr(parser, 'check_and_solve_captcha', lambda require_solution: True)
+    return parser
+
+
+def test_refresh_failures_not_counted(parser, monkeypatch):
+    # Режим обновления цен: артикулы известны из прошлой выгрузки
+    for sku in ['1001', '1002']:
+        parser.known_products[sku] = {'sku': sku, 'name': 'Товар', 'seller_url': SELLER}
+    parser.planned_products = 2
+
+    monkeypatch.setattr(parser, 'safe_get', lambda url: url == URLS[0])
+    monkeypatch.setattr(parser, '_extract_price', lambda: '100')
+    parser.parse_product_page(URLS[0])
+    parser.parse_product_page(URLS[1])
+
+    # Строка неудачного обновления сохраняет артикул, но товар не обработан
+    assert [row['sku'] for row in parser.products_data] == ['1001', '1002']
+    parser.coverage_report()
+    assert parser.coverage['Обработано товаров'] == 1
+    assert parser.coverage['Покрытие, %'] == 50.0
+
+
+def test_carried_rows_not_counted(parser, monkeypatch):
+    parser.planned_products = 1
+    # Строка, перенесённая из прошлой выгрузки по отпечатку каталога
+    parser.products_data.append({'sku': '1002', 'name': 'Товар', 'price': '100',
+                                 'seller_url': SELLER, 'product_url': URLS[1]})
+    parser.priority_map = {'1001': 3.0, '1002': 1.0}
+    parser.planned_weight = 3.0
+
+    monkeypatch.setattr(parser, 'safe_get', lambda url: True)
+    monkeypatch.setattr(parser, '_extract_product_data',
+                        lambda: {'sku': '1001', 'name': 'Товар', 'price': '', 'seller_url': SELLER})
+    parser.parse_product_page(URLS[0])
+
+    parser.coverage_report()
+    assert parser.coverage['Обработано товаров'] == 1
+    assert parser.coverage['Покрытие, %'] == 100.0
+    assert parser.coverage['Покрыто выручки, %'] == 100.0
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+import crawl_scheduler
+from crawl_scheduler import BrowserWorker, CrawlScheduler, UrlFrontier, RETRY_BASE_DELAY
+from fake_driver import FakeDriver
+from parser import DEFAULT_SETTINGS, OzonSellerParser, canonical_product_id
+
+SELLER = 'https://www.ozon.ru/seller/shop-1/'
+PRODUCT = 'https://www.ozon.ru/product/tovar-1-1001/'
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = UrlFrontier(str(tmp_path / 'frontier.sqlite'))
+    yield frontier
+    frontier.close()
+
+
+def test_seller_before_products(frontier):
+    assert frontier.add(PRODUCT, 'product', seller_url=SELLER)
+    assert frontier.add(SELLER, 'seller', seller_url=SELLER)
+    assert frontier.claim()['kind'] == 'seller'
+    assert frontier.claim()['kind'] == 'product'
+    assert frontier.claim() is None
+
+
+def test_product_deduplicated_by_id(frontier):
+    assert frontier.add(PRODUCT, 'product', seller_url=SELLER)
+    # Другой slug и параметры, тот же id товара
+    assert not frontier.add('https://www.ozon.ru/product/drugoe-nazvanie-1001/?at=abc', 'product',
+                            seller_url='https://www.ozon.ru/seller/shop-2/')
+    assert frontier.counts() == {'pending': 1}
+
+    task = frontier.claim()
+    frontier.save_result(task['key'], task['url'], SELLER, {'sku': '1001', 'name': 'Товар', 'price': '100'})
+    frontier.complete(task['key'])
+    [result] = frontier.results()
+    assert set(result['seller_url'].split('; ')) == {SELLER, 'https://www.ozon.ru/seller/shop-2/'}
+
+
+def test_retry_backoff(frontier, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(crawl_scheduler.time, 'time', lambda: now)
+    frontier.add(PRODUCT, 'product', seller_url=SELLER)
+
+    task = frontier.claim()
+    frontier.retry(task['key'], 'ошибка', max_attempts=3)
+    # Задача отложена и до истечения паузы не выдаётся
+    assert frontier.claim() is None
+    assert frontier.next_ready_time() == now + RETRY_BASE_DELAY
+
+    now += RETRY_BASE_DELAY
+    task = frontier.claim()
+    assert task['attempts'] == 1
+    frontier.retry(task['key'], 'ошибка', max_attempts=3)
+    # Пауза удваивается с каждой попыткой
+    assert frontier.next_ready_time() == now + RETRY_BASE_DELAY * 2
+
+    now += RETRY_BASE_DELAY * 2
+    task = frontier.claim()
+    frontier.retry(task['key'], 'последняя ошибка', max_attempts=3)
+    assert frontier.counts() == {'failed': 1}
+    assert frontier.claim() is None
+    assert frontier.next_ready_time() is None
+
+
+def test_interrupted_task_returns_to_queue(tmp_path):
+    path = str(tmp_path / 'frontier.sqlite')
+    frontier = UrlFrontier(path)
+    frontier.add(SELLER, 'seller', seller_url=SELLER)
+    assert frontier.claim() is not None
+    frontier.close()
+
+    frontier = UrlFrontier(path)
+    try:
+        assert frontier.counts() == {'pending': 1}
+        assert frontier.claim()['url'] == SELLER
+    finally:
+        frontier.close()
+
+
+def test_several_browsers_defer_captcha(tmp_path):
+    settings = {'browser_workers': 2, 'captcha_mode': 'wait'}
+    worker = crawl_scheduler.BrowserWorker(1, str(tmp_path), settings)
+    assert worker.parser.settings['captcha_mode'] == 'defer'
+    assert worker.parser.settings['warm_browser'] is False
+    # Настройки вызывающего не меняются
+    assert settings['captcha_mode'] == 'wait'
+
+    single = crawl_scheduler.BrowserWorker(1, str(tmp_path), {'browser_workers': 1, 'captcha_mode': 'wait'})
+    assert single.parser.settings['captcha_mode'] == 'wait'
+
+
+@pytest.fixture
+def captcha_crawl(tmp_path, monkeypatch):
+    """Два браузера, которые попадают на капчу; возвращает (frontier, drivers, settings)"""
+    drivers = []
+
+    def setup_driver(self):
+        self.driver = FakeDriver(captcha=True)
+        drivers.append(self.driver)
+    monkeypatch.setattr(OzonSellerParser, 'setup_driver', setup_driver)
+    monkeypatch.setattr(OzonSellerParser, 'human_like_pause', lambda self, *args: None)
+    monkeypatch.setattr(OzonSellerParser, '_extract_product_data', lambda self: {
+        'sku': canonical_product_id(self.driver.current_url), 'name': 'Товар', 'price': '100',
+        'seller_url': self.current_seller_url})
+
+    settings = dict(DEFAULT_SETTINGS, browser_workers=2, captcha_retry_interval=0)
+    frontier = UrlFrontier(str(tmp_path / 'frontier.sqlite'))
+    for i in range(10):
+        frontier.add(f'https://www.ozon.ru/product/tovar-{1000 + i}/', 'product', seller_url=SELLER)
+    yield frontier, drivers, settings
+    frontier.close()
+
+
+def run_crawl(frontier, settings, output_folder):
+    workers = [BrowserWorker(i + 1, output_folder, settings) for i in range(settings['browser_workers'])]
+    asyncio.run(CrawlScheduler(frontier, workers, politeness_delay=0).run())
+
+
+def test_captcha_does_not_use_attempts(captcha_crawl, tmp_path):
+    frontier, drivers, settings = captcha_crawl
+    settings['captcha_max_wait'] = 0
+    run_crawl(frontier, settings, str(tmp_path))
+
+    # Каждый браузер загрузил одну страницу и остановился на капче, задачи ждут в очереди
+    assert [len(driver.visited) for driver in drivers] == [1, 1]
+    assert frontier.counts() == {'pending': 10}
+    assert frontier.conn.execute("SELECT MAX(attempts), MAX(not_before) FROM tasks").fetchone() == (0, 0)
+
+
+def test_crawl_resumes_after_captcha_solved(captcha_crawl, tmp_path, monkeypatch):
+    frontier, drivers, settings = captcha_crawl
+    checks = {}
+    captcha_cleared = OzonSellerParser._captcha_cleared
+
+    def solve_on_third_check(self):
+        checks[id(self)] = checks.get(id(self), 0) + 1
+        if checks[id(self)] == 3:
+            self.driver.solve()
+        return captcha_cleared(self)
+    monkeypatch.setattr(OzonSellerParser, '_captcha_cleared', solve_on_third_check)
+
+    run_crawl(frontier, settings, str(tmp_path))
+
+    assert frontier.counts() == {'done': 10}
+    assert sorted(row['sku'] for row in frontier.results()) == [str(1000 + i) for i in range(10)]
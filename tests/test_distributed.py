@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+import distributed
+from distributed import QueueBackend, SQLiteQueue
+from fake_driver import FakeDriver
+from parser import DEFAULT_SETTINGS, OzonSellerParser, canonical_product_id
+
+SELLER = 'https://www.ozon.ru/seller/shop-1/'
+URLS = [
+    'https://www.ozon.ru/product/tovar-1-1001/',
+    'https://www.ozon.ru/product/tovar-2-1002/',
+]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / 'queue.sqlite'))
+    yield queue
+    queue.close()
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        QueueBackend()
+
+
+def test_claim_complete(queue):
+    assert queue.put_products(URLS, SELLER) == 2
+    # Повторное добавление не создаёт задач
+    assert queue.put_products(URLS, SELLER) == 0
+
+    first = queue.claim('w1')
+    second = queue.claim('w2')
+    assert {first['url'], second['url']} == set(URLS)
+    assert queue.claim('w3') is None
+    assert queue.stats()['in_progress'] == 2
+
+    queue.complete(first, {'sku': '1001', 'name': 'Товар', 'price': '100'}, 'w1')
+    queue.fail(second, 'ошибка', max_attempts=1)
+    assert queue.stats() == {'pending': 0, 'in_progress': 0, 'done': 1, 'failed': 1}
+    assert queue.results() == [{'sku': '1001', 'name': 'Товар', 'price': '100',
+                                'seller_url': SELLER, 'product_url': first['url']}]
+
+
+def test_fail_returns_task_until_max_attempts(queue):
+    queue.put_products(URLS[:1], SELLER)
+    task = queue.claim('w1')
+    queue.fail(task, 'ошибка', max_attempts=2)
+    assert queue.stats()['pending'] == 1
+    task = queue.claim('w1')
+    queue.fail(task, 'ошибка', max_attempts=2)
+    assert queue.stats()['failed'] == 1
+
+
+def test_expired_lease_is_pending_again(queue, monkeypatch):
+    queue.put_products(URLS[:1], SELLER)
+    monkeypatch.setattr(distributed, 'LEASE_SECONDS', -1)
+    task = queue.claim('w1')
+    assert task is not None
+    # Воркер пропал: задача снова в очереди и её может взять другой
+    assert queue.stats()['pending'] == 1
+    assert queue.claim('w2')['key'] == task['key']
+
+
+def test_failed_transaction_is_rolled_back(queue):
+    queue.put_products(URLS[:1], SELLER)
+    task = queue.claim('w1')
+    with pytest.raises(Exception):
+        queue.complete(task, {'sku': object()}, 'w1')
+    # Соединение не осталось внутри транзакции
+    queue.complete(task, {'sku': '1001'}, 'w1')
+    assert queue.stats()['done'] == 1
+
+
+def test_clear_before_rerun(queue):
+    queue.put_products(URLS, SELLER)
+    while (task := queue.claim('w1')) is not None:
+        queue.complete(task, {'sku': task['key']}, 'w1')
+    queue.set_enumeration_done(True)
+
+    queue.clear()
+    assert not queue.is_enumeration_done()
+    assert queue.results() == []
+    assert queue.put_products(URLS, SELLER) == 2
+    assert queue.stats()['pending'] == 2
+
+
+def test_release_keeps_attempts(queue):
+    queue.put_products(URLS[:1], SELLER)
+    task = queue.claim('w1')
+    queue.release(task)
+    assert queue.stats()['pending'] == 1
+    # Возвращённая задача не приближается к max_attempts
+    task = queue.claim('w1')
+    queue.fail(task, 'ошибка', max_attempts=2)
+    assert queue.stats()['pending'] == 1
+
+
+@pytest.fixture
+def captcha_worker(tmp_path, monkeypatch):
+    """Воркер с браузером, который попадает на капчу; возвращает (settings, driver, queue)"""
+    driver = FakeDriver(captcha=True)
+    monkeypatch.setattr(OzonSellerParser, 'setup_driver', lambda self: setattr(self, 'driver', driver))
+    monkeypatch.setattr(OzonSellerParser, 'human_like_pause', lambda self, *args: None)
+    monkeypatch.setattr(OzonSellerParser, '_extract_product_data', lambda self: {
+        'sku': canonical_product_id(self.driver.current_url), 'name': 'Товар', 'price': '100',
+        'seller_url': self.current_seller_url})
+
+    settings = dict(DEFAULT_SETTINGS, captcha_mode='defer', captcha_retry_interval=0,
+                    queue_path=str(tmp_path / 'queue.sqlite'))
+    queue = SQLiteQueue(settings['queue_path'])
+    urls = [f'https://www.ozon.ru/product/tovar-{1000 + i}/' for i in range(50)]
+    queue.put_products(urls, SELLER)
+    queue.set_enumeration_done(True)
+    yield settings, driver, queue
+    queue.close()
+
+
+def test_worker_stops_claiming_on_captcha(captcha_worker, tmp_path):
+    settings, driver, queue = captcha_worker
+    settings['captcha_max_wait'] = 0
+    distributed.run_worker(settings, output_folder=str(tmp_path))
+
+    # Загружена одна карточка, она и остальные задачи остались в очереди без потраченных попыток
+    assert len(driver.visited) == 1
+    assert queue.stats() == {'pending': 50, 'in_progress': 0, 'done': 0, 'failed': 0}
+    assert queue.conn.execute("SELECT MAX(attempts) FROM tasks").fetchone()[0] == 0
+
+
+def test_worker_resumes_after_captcha_solved(captcha_worker, tmp_path, monkeypatch):
+    settings, driver, queue = captcha_worker
+    polls = []
+
+    def sleep(seconds):
+        # Капчу решают в браузере после нескольких проверок
+        polls.append(seconds)
+        if len(polls) == 3:
+            driver.solve()
+    monkeypatch.setattr(distributed.time, 'sleep', sleep)
+
+    distributed.run_worker(settings, output_folder=str(tmp_path))
+
+    assert len(polls) >= 3
+    assert queue.stats() == {'pending': 0, 'in_progress': 0, 'done': 50, 'failed': 0}
+    assert len(queue.results()) == 50
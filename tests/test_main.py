@@ -0,0 +1,15 @@
+import parser
+from parser import DEFAULT_SETTINGS, OzonSellerParser
+
+
+def test_refresh_error_reported(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(parser, 'load_parser_settings', lambda: dict(DEFAULT_SETTINGS, mode='refresh'))
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'y')
+
+    def fail(self):
+        raise RuntimeError('нет прошлой выгрузки')
+    monkeypatch.setattr(OzonSellerParser, 'run_refresh', fail)
+
+    parser.main()
+    assert 'Ошибка при запуске парсера: нет прошлой выгрузки' in capsys.readouterr().out
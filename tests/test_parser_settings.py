@@ -0,0 +1,46 @@
+from parser import DEFAULT_SETTINGS, load_parser_settings
+
+
+def test_missing_file_gives_defaults(tmp_path):
+    assert load_parser_settings(str(tmp_path / 'нет.txt')) == DEFAULT_SETTINGS
+
+
+def test_values_converted_to_default_types(tmp_path):
+    path = tmp_path / 'parser_settings.txt'
+    path.write_text(
+        "# комментарий\n"
+        "\n"
+        "mode = scheduled\n"
+        "browser_workers = 4\n"
+        "politeness_delay = 1.5\n"
+        "warm_browser = да\n"
+        "canary_abort = false\n"
+        "redis_url = redis://host:6379/1?a=b\n",
+        encoding='utf-8'
+    )
+    settings = load_parser_settings(str(path))
+    assert settings['mode'] == 'scheduled'
+    assert settings['browser_workers'] == 4
+    assert settings['politeness_delay'] == 1.5
+    assert settings['warm_browser'] is True
+    assert settings['canary_abort'] is False
+    # Значение делится только по первому "="
+    assert settings['redis_url'] == 'redis://host:6379/1?a=b'
+    assert settings['max_attempts'] == DEFAULT_SETTINGS['max_attempts']
+
+
+def test_unknown_and_invalid_values_ignored(tmp_path, capsys):
+    path = tmp_path / 'parser_settings.txt'
+    path.write_text("unknown_key = 1\nbrowser_workers = много\nбез знака равенства\n", encoding='utf-8')
+    settings = load_parser_settings(str(path))
+    assert settings == DEFAULT_SETTINGS
+    out = capsys.readouterr().out
+    assert 'unknown_key' in out
+    assert 'browser_workers' in out
+
+
+def test_defaults_not_modified(tmp_path):
+    path = tmp_path / 'parser_settings.txt'
+    path.write_text("browser_workers = 7\n", encoding='utf-8')
+    load_parser_settings(str(path))
+    assert DEFAULT_SETTINGS['browser_workers'] == 2
@@ -0,0 +1,48 @@
+import pytest
+
+from fake_driver import FakeDriver
+from parser import OzonSellerParser, canonical_product_id
+
+SELLER = 'https://www.ozon.ru/seller/shop-1/'
+URLS = [f'https://www.ozon.ru/product/tovar-{1000 + i}/' for i in range(7)]
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    """Парсер с предзагрузкой в 2 вкладки и перезапуском браузера каждые 3 страницы"""
+    drivers = []
+
+    def setup_driver(self):
+        # Перезапуск допустим только когда все вкладки предзагрузки закрыты
+        assert not drivers or drivers[-1].window_handles == ['main']
+        drivers.append(FakeDriver())
+        self.driver = drivers[-1]
+
+    monkeypatch.setattr(OzonSellerParser, 'setup_driver', setup_driver)
+    monkeypatch.setattr(OzonSellerParser, 'human_like_pause', lambda self, *args: None)
+    monkeypatch.setattr(OzonSellerParser, '_extract_product_data', lambda self: {
+        'sku': canonical_product_id(self.driver.current_url), 'name': 'Товар', 'price': '100',
+        'seller_url': self.current_seller_url})
+
+    parser = OzonSellerParser(None, output_folder=str(tmp_path), trace=False,
+                              settings={'prefetch_tabs': 2, 'recycle_after_pages': 3})
+    parser.setup_driver()
+    parser.drivers = drivers
+    return parser
+
+
+def test_recycle_between_prefetch_batches(parser):
+    parser.parse_products([(url, SELLER) for url in URLS])
+
+    # 4 страницы первой партии, затем перезапуск; на оставшиеся 3 очереди уже нет
+    assert parser.recycles == 1
+    assert all(driver.quit_called for driver in parser.drivers[:-1])
+    assert sorted(row['product_url'] for row in parser.products_data) == URLS
+
+
+def test_metrics_collected_for_prefetched_tabs(parser, monkeypatch):
+    collected = []
+    monkeypatch.setattr(parser.page_metrics, 'collect', lambda driver, url, seller_url: collected.append(url))
+    parser.parse_products([(url, SELLER) for url in URLS])
+
+    assert sorted(collected) == URLS
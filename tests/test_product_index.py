@@ -0,0 +1,73 @@
+import pytest
+
+from fake_driver import FakeDriver
+from parser import OzonSellerParser, ProductIndex, canonical_product_id, product_key
+
+SELLER_1 = 'https://www.ozon.ru/seller/shop-1/'
+SELLER_2 = 'https://www.ozon.ru/seller/shop-2/'
+
+
+@pytest.mark.parametrize('url, product_id', [
+    ('https://www.ozon.ru/product/nazvanie-tovara-123456789/', '123456789'),
+    ('https://www.ozon.ru/product/123456789/', '123456789'),
+    ('https://www.ozon.ru/product/nazvanie-123456789', '123456789'),
+    ('https://www.ozon.ru/product/nazvanie-123456789/?at=abc&sh=1', '123456789'),
+    ('https://www.ozon.ru/product/nazvanie-123456789/#reviews', '123456789'),
+    # Страница записи на локальном сервере replay.py
+    ('http://127.0.0.1:8000/www.ozon.ru/product/nazvanie-123456789/', '123456789'),
+    ('https://www.ozon.ru/product/nazvanie-123456789/reviews/', None),
+    ('https://www.ozon.ru/seller/shop-172995/', None),
+    ('https://www.ozon.ru/product/nazvanie/', None),
+])
+def test_canonical_product_id(url, product_id):
+    assert canonical_product_id(url) == product_id
+
+
+def test_product_key_without_id():
+    assert product_key('https://www.ozon.ru/product/nazvanie/?at=abc#x') == 'https://www.ozon.ru/product/nazvanie/'
+    assert product_key('https://www.ozon.ru/product/nazvanie-42/?at=abc') == '42'
+
+
+def test_product_index_merges_slugs_and_sellers():
+    index = ProductIndex()
+    assert index.add('https://www.ozon.ru/product/tovar-1001/', SELLER_1)
+    assert not index.add('https://www.ozon.ru/product/drugoe-imya-1001/?at=x', SELLER_2)
+    assert not index.add('https://www.ozon.ru/product/1001/', SELLER_1)
+    assert index.add('https://www.ozon.ru/product/tovar-1002/', SELLER_2)
+
+    # Первый встреченный URL товара сохраняется, продавцы - без повторов, в порядке появления
+    assert index.urls == {'1001': 'https://www.ozon.ru/product/tovar-1001/',
+                          '1002': 'https://www.ozon.ru/product/tovar-1002/'}
+    assert index.sellers_for('https://www.ozon.ru/product/1001/') == [SELLER_1, SELLER_2]
+    assert index.sellers_for('https://www.ozon.ru/product/tovar-9999/') == []
+
+
+def test_product_index_without_seller():
+    index = ProductIndex()
+    assert index.add('https://www.ozon.ru/product/tovar-1001/', None)
+    assert index.sellers_for('https://www.ozon.ru/product/tovar-1001/') == []
+
+
+def test_failed_extraction_can_be_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def extract(self):
+        calls.append(self.driver.current_url)
+        if len(calls) == 1:
+            raise RuntimeError('страница не дорисовалась')
+        return {'sku': '123456789', 'name': 'Товар', 'price': '100', 'seller_url': self.current_seller_url}
+
+    monkeypatch.setattr(OzonSellerParser, '_extract_product_data', extract)
+    monkeypatch.setattr(OzonSellerParser, 'human_like_pause', lambda self, *args: None)
+    parser = OzonSellerParser(None, output_folder=str(tmp_path), trace=False)
+    parser.driver = FakeDriver()
+    parser.current_seller_url = SELLER_1
+    url = 'https://www.ozon.ru/product/nazvanie-123456789/'
+
+    assert parser.parse_product_page(url) is None
+    assert product_key(url) not in parser.product_index.fetched
+
+    assert parser.parse_product_page(url)['name'] == 'Товар'
+    assert len(calls) == 2
+    assert product_key(url) in parser.product_index.fetched
+    assert parser.parse_product_page(url) is None
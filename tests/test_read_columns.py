@@ -0,0 +1,38 @@
+from openpyxl import Workbook
+
+import script
+
+
+def make_report(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Заголовок', None, None])
+    ws.append(['SKU', 'Цена', 'Лишнее'])
+    ws.append([1001, 100, 'x'])
+    ws.append([1002, 200, 'y'])
+    wb.save(path)
+
+
+def test_streaming_without_calamine(tmp_path, monkeypatch):
+    path = tmp_path / 'report.xlsx'
+    make_report(path)
+    monkeypatch.setattr(script, 'python_calamine', None)
+    df = script.read_excel_columns(path, {0, 1}, start_row=2)
+    assert list(df.columns) == [0, 1]
+    assert list(df.index) == [2, 3]
+    assert df[0].tolist() == [1001, 1002]
+
+
+def test_calamine_failure_falls_back_to_streaming(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'report.xlsx'
+    make_report(path)
+
+    def broken_read_excel(*args, **kwargs):
+        raise ValueError('неподдерживаемый файл')
+    monkeypatch.setattr(script, 'python_calamine', object())
+    monkeypatch.setattr(script.pd, 'read_excel', broken_read_excel)
+
+    df = script.read_excel_columns(path, {0, 1}, start_row=2)
+    assert df is not None
+    assert df[1].tolist() == [100, 200]
+    assert 'calamine' in capsys.readouterr().out
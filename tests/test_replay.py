@@ -0,0 +1,87 @@
+import json
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from replay import MANIFEST_FILE, ReplayServer, load_labels, product_expected
+
+PRODUCT = 'https://www.ozon.ru/product/chashka-123456789/'
+SELLER = 'https://www.ozon.ru/seller/shop-42/'
+
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    (tmp_path / 'pages').mkdir()
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'assets' / 'a.png').write_bytes(b'png')
+    (tmp_path / 'pages' / 'product.html').write_text('<html><title>Чашка</title></html>', encoding='utf-8')
+    (tmp_path / 'pages' / 'seller.html').write_text(
+        f'<a href="{PRODUCT}">1</a><a href="/product/blyudce-987/">2</a><a href="/info/">3</a>', encoding='utf-8')
+    manifest = {
+        'pages': {
+            '/www.ozon.ru/product/chashka-123456789/': {'url': PRODUCT, 'type': 'product', 'file': 'pages/product.html'},
+            '/www.ozon.ru/seller/shop-42/': {'url': SELLER, 'type': 'seller', 'file': 'pages/seller.html'},
+        },
+        'captcha': ['/www.ozon.ru/product/chashka-123456789/'],
+    }
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest), encoding='utf-8')
+    return tmp_path
+
+
+@pytest.fixture
+def server(replay_dir):
+    server = ReplayServer(str(replay_dir)).start()
+    yield server
+    server.stop()
+
+
+def fetch(server, path):
+    try:
+        with urllib.request.urlopen(server.base_url + path, timeout=5) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, ''
+
+
+def test_captcha_served_once(server):
+    status, body = fetch(server, '/www.ozon.ru/product/chashka-123456789/')
+    assert status == 200 and 'Antibot Captcha' in body
+    # Повторный запрос того же ключа (без слэша и с параметрами) - записанная страница
+    assert fetch(server, '/www.ozon.ru/product/chashka-123456789?from=seller')[1] == '<html><title>Чашка</title></html>'
+    assert server.captcha_served == 1
+    assert server.requests_count == 2
+
+
+def test_page_routing(server):
+    assert fetch(server, '/www.ozon.ru/seller/shop-42/')[0] == 200
+    assert fetch(server, '/www.ozon.ru/seller/other/')[0] == 404
+    assert fetch(server, '/assets/a.png') == (200, 'png')
+    assert fetch(server, '/assets/missing.png')[0] == 404
+
+
+def test_links_rewritten(server):
+    body = fetch(server, '/www.ozon.ru/seller/shop-42/')[1]
+    local = server.base_url + '/www.ozon.ru'
+    assert f'href="{local}/product/chashka-123456789/"' in body
+    assert f'href="{local}/product/blyudce-987/"' in body
+    assert 'href="/info/"' in body
+    assert 'https://www.ozon.ru' not in body
+
+
+def test_expected_without_labels_is_url_id():
+    assert product_expected(PRODUCT) == {'sku': '123456789'}
+
+
+def test_expected_from_labels(tmp_path):
+    labels_file = tmp_path / 'labels.xlsx'
+    pd.DataFrame([
+        {'SKU': '123456789', 'Название': 'Чашка', 'Цена с соинвестом': '', 'URL товара': PRODUCT},
+        {'SKU': '555', 'Название': 'Без ссылки', 'Цена с соинвестом': '99', 'URL товара': ''},
+    ]).to_excel(labels_file, index=False)
+
+    labels = load_labels(str(labels_file))
+    # Пустая цена - не эталон
+    assert product_expected(PRODUCT, labels) == {'sku': '123456789', 'name': 'Чашка'}
+    assert labels['555'] == {'sku': '555', 'name': 'Без ссылки', 'price': '99'}
@@ -0,0 +1,36 @@
+import pytest
+
+from parser import OzonSellerParser, PRODUCT_SELECTORS
+
+
+class FakeElement:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeDriver:
+    """Текст элементов по селектору"""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    def find_elements(self, by, selector):
+        return [FakeElement(text) for text in self.texts.get(selector, [])]
+
+
+@pytest.fixture
+def parser(tmp_path):
+    return OzonSellerParser(None, output_folder=str(tmp_path), trace=False)
+
+
+def test_short_name_from_primary_selector(parser):
+    primary = PRODUCT_SELECTORS['name']['primary'][0][1]
+    parser.driver = FakeDriver({primary: ['Чай'], 'h1': ['Чай']})
+    assert parser._extract_field('name') == 'Чай'
+
+
+def test_short_name_from_fallback_rejected(parser):
+    parser.driver = FakeDriver({'h1': ['Чай', 'Чай зелёный']})
+    assert parser._extract_field('name', ['fallback']) == 'Чай зелёный'
+    parser.driver = FakeDriver({'h1': ['Чай']})
+    assert parser._extract_field('name', ['fallback']) == ''
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from script import SkuIndex, split_sku_keys, unit_sku_text
+
+
+def table(rows, fields=('price',)):
+    """Таблица отчёта: SKU строкой -> значения полей"""
+    return pd.DataFrame([values for _, values in rows], columns=list(fields),
+                        index=pd.Index([sku for sku, _ in rows], dtype=object), dtype=object)
+
+
+def test_split_sku_keys():
+    is_int, codes, strings = split_sku_keys(['123', '-5', '0', '0123', 'A1', ' 7', '1234567890123456789'])
+    assert is_int.tolist() == [True, True, True, False, False, False, False]
+    assert codes.tolist() == [123, -5, 0]
+    assert strings.tolist() == ['0123', 'A1', ' 7', '1234567890123456789']
+
+
+def test_unit_sku_text():
+    assert unit_sku_text(123.0) == '123'
+    assert unit_sku_text(' 123 ') == '123'
+    assert unit_sku_text(123) == '123'
+
+
+def test_lookup_numbers_and_text():
+    index = SkuIndex({'prices': table([('123', (1,)), ('0123', (2,)), ('A1', (3,)), ('-5', (4,)),
+                                       ('1234567890123456789', (5,))])})
+    assert len(index) == 5
+    prices = index.column('prices', 'price')
+
+    skus = [123, 123.0, '123', ' 123 ', '0123', 'A1', -5, '-5', 1234567890123456789,
+            '1234567890123456789', 'нет', 99, True, 10 ** 19]
+    rows = index.lookup(skus)
+    found = [prices[row] if row >= 0 else None for row in rows]
+    # Число и текст '123' - один SKU, '0123' - отдельный SKU-строка; True - не SKU 1
+    assert found == [1, 1, 1, 1, 2, 3, 4, 4, 5, 5, None, None, None, None]
+
+
+def test_columns_aligned_across_reports():
+    mark = table([('1', ('a', 'p')), ('2', ('b', None))], fields=('col_a', 'col_p'))
+    prices = table([('2', (20,)), ('X', (30,))])
+    index = SkuIndex({'mark': mark, 'prices': prices})
+    assert len(index) == 3
+
+    rows = index.lookup([1, 2, 'X'])
+    assert index.column('mark', 'col_a')[rows].tolist() == ['a', 'b', None]
+    assert index.column('mark', 'col_p')[rows].tolist() == ['p', None, None]
+    assert index.column('prices', 'price')[rows].tolist() == [None, 20, 30]
+    assert index.column('prices', 'нет такого поля') is None
+
+
+def test_empty_index():
+    index = SkuIndex({'prices': table([])})
+    assert len(index) == 0
+    assert index.lookup([1, 'A']).tolist() == [-1, -1]
+    assert isinstance(index.lookup([]), np.ndarray)
@@ -0,0 +1,36 @@
+import re
+from pathlib import Path
+
+import script
+from script import create_backup_filename
+
+NAME = re.compile(r'Unit_обновленный_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}\.xlsm$')
+
+
+def test_copy_name_from_original(tmp_path):
+    assert NAME.match(create_backup_filename(tmp_path / 'Unit.xlsm').name)
+
+
+def test_copy_of_copy_does_not_grow(tmp_path):
+    previous = tmp_path / 'Unit_обновленный_2026-01-02_03-04-05_обновленный_2026-01-02_03-05-00.xlsm'
+    new = create_backup_filename(previous)
+    assert new.parent == tmp_path
+    assert NAME.match(new.name)
+
+
+def test_other_suffixes_kept(tmp_path):
+    # Похожий, но не служебный суффикс - часть имени пользователя
+    assert create_backup_filename(tmp_path / 'Unit_обновленный_вручную.xlsx').name.startswith(
+        'Unit_обновленный_вручную_обновленный_')
+
+
+def test_updated_copies_not_batch_inputs(tmp_path):
+    for name in ['Unit.xlsm', 'Unit_обновленный_2026-01-02_03-04-05.xlsm', '~$Unit.xlsm']:
+        (tmp_path / name).write_bytes(b'')
+    assert [Path(f).name for f in script.find_unit_files(tmp_path)] == ['Unit.xlsm']
+
+
+def test_user_suffix_is_batch_input(tmp_path):
+    for name in ['Unit_обновленный_вручную.xlsx', 'Unit_обновленный_вручную_обновленный_2026-01-02_03-04-05.xlsx']:
+        (tmp_path / name).write_bytes(b'')
+    assert [Path(f).name for f in script.find_unit_files(tmp_path)] == ['Unit_обновленный_вручную.xlsx']
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from script import SOURCE_FIELDS, SkuIndex, apply_write_plan, build_write_plan
+
+
+def legacy_update(ws, mark_data, dimensions_data, analytics_data, prices_data):
+    """Построчное заполнение таблицы F, как до UNIT_MAPPING; возвращает (total_rows, updated_rows)"""
+    updated_count = 0
+    total_rows = 0
+    for row in range(2, ws.max_row + 1):
+        sku = ws.cell(row=row, column=1).value
+        if sku is None:
+            continue
+        sku_str = str(int(sku)) if isinstance(sku, float) else str(sku).strip()
+        total_rows += 1
+        updated = False
+
+        if sku_str in mark_data:
+            for field, column in (('col_a', 2), ('col_p', 3)):
+                if mark_data[sku_str].get(field) is not None:
+                    ws.cell(row=row, column=column, value=mark_data[sku_str][field])
+                    updated = True
+
+        if sku_str in dimensions_data:
+            dim = dimensions_data[sku_str]
+            for field, column in (('length', 5), ('width', 6), ('height', 7)):
+                if dim.get(field) is not None:
+                    ws.cell(row=row, column=column, value=dim[field])
+                    updated = True
+            col_t_value = ws.cell(row=row, column=20).value
+            if col_t_value:
+                col_t_str = str(col_t_value).strip().upper()
+                if col_t_str == "FBO" and dim.get('col_g') is not None:
+                    ws.cell(row=row, column=16, value=dim['col_g'])
+                    updated = True
+                elif col_t_str == "FBS" and dim.get('col_h') is not None:
+                    ws.cell(row=row, column=16, value=dim['col_h'])
+                    updated = True
+
+        if sku_str in analytics_data:
+            for field, column in (('bl', 15), ('br', 34)):
+                if analytics_data[sku_str].get(field) is not None:
+                    ws.cell(row=row, column=column, value=analytics_data[sku_str][field])
+                    updated = True
+
+        if sku_str in prices_data and prices_data[sku_str] is not None:
+            ws.cell(row=row, column=37, value=prices_data[sku_str])
+            updated = True
+
+        if updated:
+            updated_count += 1
+    return total_rows, updated_count
+
+
+def make_tables(seed):
+    rng = np.random.default_rng(seed)
+    keys = ['1001', '1002', '1003', '1004', 'A-5', '0007']
+    values = [1.5, 7, 'x', None, 0, '']
+    tables = {}
+    for kind, config in SOURCE_FIELDS.items():
+        kind_keys = list(rng.choice(keys, size=4, replace=False))
+        tables[kind] = pd.DataFrame(
+            {field: [values[i] for i in rng.integers(0, len(values), size=len(kind_keys))]
+             for field in config['fields']},
+            index=pd.Index(kind_keys, dtype=object), dtype=object)
+    return tables
+
+
+def as_dicts(table):
+    return {sku: dict(zip(table.columns, values)) for sku, values in zip(table.index, table.to_numpy(dtype=object))}
+
+
+def make_unit(seed):
+    rng = np.random.default_rng(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['SKU'])
+    skus = [1001, 1002.0, ' 1003 ', '1004', 'A-5', '0007', 7, 'нет в отчётах', None, 1001]
+    for row, sku in enumerate(skus, start=2):
+        ws.cell(row, 1, sku)
+        ws.cell(row, 20, ['FBO', ' fbs', 'FBS', None, 'другое'][rng.integers(0, 5)])
+        # Часть ячеек уже содержит те же значения, что и в отчётах
+        for column in (2, 5, 16, 37):
+            ws.cell(row, column, [1.5, 7, 'x', None][rng.integers(0, 4)])
+    return wb
+
+
+def test_plan_matches_row_by_row_update():
+    for seed in range(20):
+        tables = make_tables(seed)
+        expected_wb = make_unit(seed)
+        total_rows, updated_rows = legacy_update(
+            expected_wb.active,
+            as_dicts(tables['mark']), as_dicts(tables['dimensions']), as_dicts(tables['analytics']),
+            {sku: row['price'] for sku, row in as_dicts(tables['prices']).items()})
+
+        wb = make_unit(seed)
+        before = [[cell.value for cell in row] for row in wb.active.iter_rows(max_col=37)]
+        plan, plan_total, plan_updated = build_write_plan(wb.active, SkuIndex(tables))
+        apply_write_plan(wb.active, plan)
+
+        assert (plan_total, plan_updated) == (total_rows, updated_rows)
+        assert [[cell.value for cell in row] for row in wb.active.iter_rows(max_col=37)] == \
+            [[cell.value for cell in row] for row in expected_wb.active.iter_rows(max_col=37)]
+        # В плане только действительно изменившиеся ячейки, со старым значением
+        for row, column, old, new, sku, source in plan:
+            assert old == before[row - 1][column - 1]
+            assert old != new or type(old) != type(new)
+
+
+def test_plan_without_sku_rows():
+    wb = Workbook()
+    wb.active.append(['SKU'])
+    assert build_write_plan(wb.active, SkuIndex(make_tables(0))) == ([], 0, 0)
@@ -0,0 +1,118 @@
+import io
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from xlsm_patch import PatchNotSupported, cell_xml, patch_row, patch_sheet, patch_workbook
+
+SHEET_HEAD = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+              b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+SHEET_TAIL = b'</sheetData></worksheet>'
+
+
+def test_cell_xml_like_openpyxl():
+    assert cell_xml('B2', 5) == b'<c r="B2" t="n"><v>5</v></c>'
+    assert cell_xml('C3', 'текст', '4') == '<c r="C3" t="inlineStr" s="4"><is><t>текст</t></is></c>'.encode('utf-8')
+
+
+def test_patch_row_replaces_and_inserts():
+    row = b'<row r="2" spans="1:3"><c r="A2" t="n"><v>1</v></c><c r="C2" s="3" t="n"><v>3</v></c></row>'
+    patched, formula_replaced = patch_row(row, 2, {3: 30, 2: 20, 5: 50})
+    assert patched == (b'<row r="2"><c r="A2" t="n"><v>1</v></c><c r="B2" t="n"><v>20</v></c>'
+                       b'<c r="C2" t="n" s="3"><v>30</v></c><c r="E2" t="n"><v>50</v></c></row>')
+    assert not formula_replaced
+
+
+def test_patch_row_empty_row():
+    patched, _ = patch_row(b'<row r="4"/>', 4, {1: 'x'})
+    assert patched == b'<row r="4"><c r="A4" t="inlineStr"><is><t>x</t></is></c></row>'
+
+
+def test_patch_row_formula():
+    row = b'<row r="2"><c r="A2"><f>B2*2</f><v>4</v></c></row>'
+    patched, formula_replaced = patch_row(row, 2, {1: 7})
+    assert patched == b'<row r="2"><c r="A2" t="n"><v>7</v></c></row>'
+    assert formula_replaced
+
+
+def test_patch_row_shared_formula_master():
+    row = b'<row r="2"><c r="A2"><f t="shared" ref="A2:A5" si="0">B2*2</f><v>4</v></c></row>'
+    with pytest.raises(PatchNotSupported):
+        patch_row(row, 2, {1: 7})
+    # Ячейки правее главной ячейки общей формулы менять можно
+    patched, _ = patch_row(row, 2, {2: 1})
+    assert patched.endswith(b'<c r="B2" t="n"><v>1</v></c></row>')
+
+
+def sheet(rows):
+    return SHEET_HEAD + b''.join(rows) + SHEET_TAIL
+
+
+@pytest.mark.parametrize('chunk_size', [7, 1024 * 1024])
+def test_patch_sheet_streaming(monkeypatch, chunk_size):
+    import xlsm_patch
+    monkeypatch.setattr(xlsm_patch, 'CHUNK_SIZE', chunk_size)
+    rows = [b'<row r="%d"><c r="A%d" t="n"><v>%d</v></c></row>' % (i, i, i) for i in range(1, 6)]
+    target = io.BytesIO()
+    formula_replaced = patch_sheet(io.BytesIO(sheet(rows)), target, {3: {1: 33}, 5: {2: 'b'}})
+
+    expected = list(rows)
+    expected[2] = b'<row r="3"><c r="A3" t="n"><v>33</v></c></row>'
+    expected[4] = b'<row r="5"><c r="A5" t="n"><v>5</v></c><c r="B5" t="inlineStr"><is><t>b</t></is></c></row>'
+    assert target.getvalue() == sheet(expected)
+    assert not formula_replaced
+
+
+def test_patch_sheet_missing_row():
+    rows = [b'<row r="1"><c r="A1" t="n"><v>1</v></c></row>']
+    with pytest.raises(PatchNotSupported, match='нет строк'):
+        patch_sheet(io.BytesIO(sheet(rows)), io.BytesIO(), {1: {1: 2}, 7: {1: 2}})
+
+
+def test_patch_sheet_prefixed_namespace():
+    data = b'<x:worksheet xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><x:sheetData/></x:worksheet>'
+    with pytest.raises(PatchNotSupported):
+        patch_sheet(io.BytesIO(data), io.BytesIO(), {})
+
+
+def test_patch_workbook_matches_openpyxl(tmp_path):
+    source = tmp_path / 'unit.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    for row in range(1, 6):
+        ws.append([f"SKU{row}", row, row * 2])
+    ws['D2'] = '=B2*2'
+    wb.create_sheet('Другой')['A1'] = 'без изменений'
+    wb.save(source)
+
+    # План в формате script.build_write_plan: (строка, столбец, старое, новое, sku, источник)
+    plan = [(2, 2, 2, 20, 'SKU2', 'mark'), (2, 4, '=B2*2', 5, 'SKU2', 'mark'), (4, 5, None, 'новое', 'SKU4', 'prices')]
+    target = tmp_path / 'patched.xlsx'
+    patch_workbook(source, target, plan)
+
+    result = load_workbook(target)
+    assert [[cell.value for cell in row] for row in result.active.iter_rows()] == [
+        ['SKU1', 1, 2, None, None],
+        ['SKU2', 20, 4, 5, None],
+        ['SKU3', 3, 6, None, None],
+        ['SKU4', 4, 8, None, 'новое'],
+        ['SKU5', 5, 10, None, None],
+    ]
+    assert result['Другой']['A1'].value == 'без изменений'
+
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(target) as patched:
+        assert [info.filename for info in patched.infolist()] == [info.filename for info in original.infolist()]
+        # Небольшие части пишутся без расширенных полей ZIP64
+        assert all(not info.extra for info in patched.infolist())
+
+
+def test_patch_workbook_missing_row_leaves_no_file(tmp_path):
+    source = tmp_path / 'unit.xlsx'
+    wb = Workbook()
+    wb.active['A1'] = 'SKU1'
+    wb.save(source)
+    target = tmp_path / 'patched.xlsx'
+    with pytest.raises(PatchNotSupported):
+        patch_workbook(source, target, [(9, 1, None, 'x', 'SKU9', 'mark')])
+    assert list(tmp_path.iterdir()) == [source]
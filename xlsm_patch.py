@@ -0,0 +1,309 @@
+"""
+Правка значений ячеек Unit-файла (.xlsm/.xlsx) без загрузки всей книги
+
+Книга - zip-архив. XML активного листа читается и пишется потоком, по одной
+строке <row>: строки без изменений и все остальные части архива (макросы,
+стили, другие листы) копируются как есть, в изменённых строках заменяются
+только нужные ячейки. Ячейки записываются так же, как их записывает openpyxl
+(строки - inline string), стиль ячейки сохраняется.
+
+Если заменяется ячейка с формулой, цепочка вычислений (calcChain.xml)
+удаляется - Excel построит её заново, как и после сохранения через openpyxl.
+"""
+import os
+import re
+import shutil
+import posixpath
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import Cell
+from openpyxl.cell._writer import etree_write_cell
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string, get_column_letter
+from openpyxl.xml.functions import tostring
+
+CHUNK_SIZE = 1024 * 1024
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CALC_CHAIN_TYPE = NS_REL + '/calcChain'
+
+ROW_START = re.compile(rb'<row[\s>/]')
+ROW_END = b'</row>'
+CELL = re.compile(rb'<c[\s>/][^>]*?(?:/>|>.*?</c>)', re.S)
+ATTR = re.compile(rb'\s([\w:]+)="([^"]*)"')
+PREFIXED_SHEET_DATA = re.compile(rb'<\w+:sheetData[\s>/]')
+
+
+class PatchNotSupported(Exception):
+    """Книгу нельзя обновить правкой XML - нужно сохранять через openpyxl"""
+
+
+# ===== Части архива =====
+
+def _part_path(base, target):
+    """Путь части архива по ссылке из .rels (относительной или от корня)"""
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+
+def _rels_path(part):
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, '_rels', name + '.rels')
+
+
+def _relationships(archive, part):
+    """Связи части: Id -> (Type, путь части)"""
+    root = ET.fromstring(archive.read(_rels_path(part)))
+    return {rel.get('Id'): (rel.get('Type'), _part_path(part, rel.get('Target')))
+            for rel in root.iter(f'{{{NS_PKG_REL}}}Relationship')
+            if rel.get('TargetMode') != 'External'}
+
+
+def active_sheet_path(archive):
+    """Путь XML активного листа - того же, что wb.active в openpyxl"""
+    workbook_part = next(path for rel_type, path in _relationships(archive, '').values()
+                         if rel_type.endswith('/officeDocument'))
+    root = ET.fromstring(archive.read(workbook_part))
+    view = root.find(f'{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView')
+    active = int(view.get('activeTab', 0)) if view is not None else 0
+    sheets = root.findall(f'{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet')
+    rel_id = sheets[active].get(f'{{{NS_REL}}}id')
+    rel_type, path = _relationships(archive, workbook_part)[rel_id]
+    if not rel_type.endswith('/worksheet'):
+        raise PatchNotSupported("активный лист - не таблица")
+    return workbook_part, path
+
+
+# ===== Ячейки =====
+
+_cell_sheet = None
+
+
+class _Collector:
+    """Приёмник элементов для etree_write_cell вместо xmlfile"""
+    def __init__(self):
+        self.elements = []
+
+    def write(self, element):
+        self.elements.append(element)
+
+
+def cell_xml(coordinate, value, style=None):
+    """XML ячейки со значением value - как его записывает openpyxl при сохранении"""
+    global _cell_sheet
+    if _cell_sheet is None:
+        _cell_sheet = Workbook().active
+    column, row = coordinate_from_string(coordinate)
+    cell = Cell(_cell_sheet, row=row, column=column_index_from_string(column), value=value)
+    if cell.data_type == 'd':
+        # Дате нужен числовой формат из styles.xml
+        raise PatchNotSupported(f"дата в ячейке {coordinate}")
+
+    collector = _Collector()
+    etree_write_cell(collector, _cell_sheet, cell)
+    element = collector.elements[0]
+    if style is not None:
+        element.set('s', style)
+    return tostring(element, encoding='unicode').encode('utf-8')
+
+
+def _attributes(tag):
+    return {name.decode(): value.decode() for name, value in ATTR.findall(tag)}
+
+
+def patch_row(row_xml, row, changes):
+    """
+    Замена ячеек одной строки: changes - {столбец: значение}
+
+    Возвращает (новый XML строки, была ли заменена ячейка с формулой)
+    """
+    start_end = row_xml.index(b'>') + 1
+    start_tag = row_xml[:start_end]
+    self_closing = start_tag.endswith(b'/>')
+    body = b'' if self_closing else row_xml[start_end:-len(ROW_END)]
+
+    parts = []
+    pending = dict(changes)
+    inserted = False
+    formula_replaced = False
+    column = 0
+    position = 0
+    for match in CELL.finditer(body):
+        cell = match.group(0)
+        attrs = _attributes(cell[:cell.index(b'>') + 1])
+        column = column_index_from_string(coordinate_from_string(attrs['r'])[0]) if 'r' in attrs else column + 1
+
+        parts.append(body[position:match.start()])
+        position = match.end()
+        # Новые ячейки - перед первой ячейкой правее них
+        for new_column in sorted(c for c in pending if c < column):
+            parts.append(cell_xml(_coordinate(row, new_column), pending.pop(new_column)))
+            inserted = True
+        if column in pending:
+            if b'<f' in cell:
+                if re.search(rb'<f[^>]*\sref="', cell):
+                    # Главная ячейка общей формулы: остальные ячейки группы ссылаются на её текст
+                    raise PatchNotSupported(f"общая формула в ячейке {_coordinate(row, column)}")
+                formula_replaced = True
+            parts.append(cell_xml(_coordinate(row, column), pending.pop(column), attrs.get('s')))
+        else:
+            parts.append(cell)
+
+    parts.append(body[position:])
+    for new_column in sorted(pending):
+        parts.append(cell_xml(_coordinate(row, new_column), pending[new_column]))
+
+    if inserted or pending:
+        # spans - подсказка о диапазоне ячеек строки, после вставки ячеек может быть неверной
+        start_tag = re.sub(rb'\sspans="[^"]*"', b'', start_tag)
+    if self_closing:
+        start_tag = start_tag[:-2].rstrip() + b'>'
+    return start_tag + b''.join(parts) + ROW_END, formula_replaced
+
+
+def _coordinate(row, column):
+    return f"{get_column_letter(column)}{row}"
+
+
+# ===== Лист =====
+
+def patch_sheet(source, target, changes):
+    """
+    Потоковая правка XML листа: source и target - файловые объекты,
+    changes - {строка: {столбец: значение}}. Возвращает, была ли заменена формула
+    """
+    buffer = b''
+    pos = 0
+    eof = False
+    formula_replaced = False
+    last_row = 0
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = source.read(CHUNK_SIZE)
+        if not buffer and not pos:
+            if chunk.startswith((b'\xff\xfe', b'\xfe\xff')):
+                raise PatchNotSupported("XML листа не в UTF-8")
+            if PREFIXED_SHEET_DATA.search(chunk):
+                raise PatchNotSupported("XML листа с префиксами пространств имён")
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    read_more()
+    while True:
+        match = ROW_START.search(buffer, pos)
+        if match is None:
+            if eof:
+                target.write(buffer[pos:])
+                break
+            # Начало тега <row может оказаться на границе блоков
+            keep = max(pos, len(buffer) - 5)
+            target.write(buffer[pos:keep])
+            pos = keep
+            read_more()
+            continue
+
+        target.write(buffer[pos:match.start()])
+        pos = match.start()
+        while buffer.find(b'>', pos) < 0 and not eof:
+            read_more()
+        start_end = buffer.find(b'>', pos) + 1
+        if not start_end:
+            raise PatchNotSupported("XML листа оборван")
+        if buffer[start_end - 2:start_end] == b'/>':
+            end = start_end
+        else:
+            while buffer.find(ROW_END, start_end) < 0 and not eof:
+                read_more()
+                start_end = buffer.find(b'>') + 1
+            found = buffer.find(ROW_END, start_end)
+            if found < 0:
+                raise PatchNotSupported("XML листа оборван")
+            end = found + len(ROW_END)
+
+        attrs = _attributes(buffer[pos:start_end])
+        last_row = int(attrs['r']) if 'r' in attrs else last_row + 1
+        if last_row in changes:
+            row_xml, replaced = patch_row(buffer[pos:end], last_row, changes.pop(last_row))
+            formula_replaced = formula_replaced or replaced
+            target.write(row_xml)
+        else:
+            target.write(buffer[pos:end])
+        pos = end
+
+    if changes:
+        # План строится по строкам с SKU, такие строки в XML есть всегда
+        raise PatchNotSupported(f"в XML листа нет строк {sorted(changes)[:5]}")
+    return formula_replaced
+
+
+# ===== Книга =====
+
+def _drop_calc_chain(data, name, calc_chain):
+    """Удаление ссылок на calcChain.xml из [Content_Types].xml и связей книги"""
+    if name == '[Content_Types].xml':
+        return re.sub(rb'<Override[^>]*PartName="/' + re.escape(calc_chain.encode()) + rb'"[^>]*/>', b'', data)
+    return re.sub(rb'<Relationship[^>]*Type="' + re.escape(CALC_CHAIN_TYPE.encode()) + rb'"[^>]*/>', b'', data)
+
+
+def _copy_info(info, file_size=None):
+    copy = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    copy.compress_type = info.compress_type
+    copy.external_attr = info.external_attr
+    # По размеру zipfile решает, нужны ли записи ZIP64: только для частей около 4 ГБ и больше
+    copy.file_size = info.file_size if file_size is None else file_size
+    return copy
+
+
+def patch_workbook(source_path, target_path, plan):
+    """
+    Копия книги source_path с изменениями plan (см. script.build_write_plan) в target_path
+
+    Порядок и содержимое остальных частей архива не меняются. Поднимает
+    PatchNotSupported, если книгу так обновить нельзя (target_path не создаётся)
+    """
+    changes = {}
+    for row, column, old, new, sku, source in plan:
+        changes.setdefault(row, {})[column] = new
+
+    tmp_path = f"{target_path}.tmp"
+    # Лист правится во временный файл: от него зависит, нужна ли цепочка вычислений
+    with tempfile.TemporaryFile() as sheet_file:
+        try:
+            with zipfile.ZipFile(source_path) as archive:
+                workbook_part, sheet_path = active_sheet_path(archive)
+                workbook_rels = _rels_path(workbook_part)
+                calc_chain = next((path for rel_type, path in _relationships(archive, workbook_part).values()
+                                   if rel_type == CALC_CHAIN_TYPE), None)
+
+                with archive.open(sheet_path) as src:
+                    formula_replaced = patch_sheet(src, sheet_file, changes)
+                sheet_size = sheet_file.seek(0, os.SEEK_END)
+                sheet_file.seek(0)
+                drop_calc_chain = formula_replaced and calc_chain is not None
+
+                with zipfile.ZipFile(tmp_path, 'w', allowZip64=True) as output:
+                    for info in archive.infolist():
+                        if drop_calc_chain and info.filename == calc_chain:
+                            continue
+                        if drop_calc_chain and info.filename in ('[Content_Types].xml', workbook_rels):
+                            output.writestr(_copy_info(info),
+                                            _drop_calc_chain(archive.read(info), info.filename, calc_chain))
+                            continue
+                        if info.filename == sheet_path:
+                            src, copy = sheet_file, _copy_info(info, sheet_size)
+                        else:
+                            src, copy = archive.open(info), _copy_info(info)
+                        with src, output.open(copy, 'w') as dst:
+                            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)